@@ -0,0 +1,355 @@
+"""ASGI entry point for read-heavy traffic.
+
+Serves the blog read endpoints (GET /api/blog/posts, /posts/<id>,
+/categories and /stats) with async handlers over aiosqlite, so thousands
+of idle keep-alive readers cost one process rather than one worker each.
+Responses, validators and status codes match blog_bp. Every other route,
+including all writes, is handed to the regular Flask app in a thread.
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5000
+
+Needs starlette, uvicorn, aiosqlite, a2wsgi and SQLAlchemy's asyncio extra
+(greenlet): pip install -r requirements-asgi.txt. See bench_readers.py for a
+comparison with the sync server.
+"""
+import os
+import sys
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import contextlib
+import functools
+import math
+import time
+from datetime import timezone
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+from starlette.applications import Starlette
+from starlette.responses import RedirectResponse, Response
+from starlette.routing import Mount, Route
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+from src.main import app as flask_app
+from src.models.blog_post import BlogPost, db
+from src.models.blog_stats import BlogStat, posts_version_query
+from src.models.related import RELATED_FIELDS, related_posts_query
+from src.models.search import apply_search
+from src.models.slugs import SlugHistory, slug_map
+from src.models.tags import tagged
+from src.models.view_counter import view_counter
+from src.utils.fragment_cache import fragment_cache
+from src.utils.http_cache import make_etag
+from src.utils.metrics import request_metrics
+from src.utils.sqlite_profile import sqlite_profile
+
+flask_app.config.setdefault('ASGI_POOL_SIZE', int(os.environ.get('ASGI_POOL_SIZE', 8)))
+
+engine = create_async_engine(
+    flask_app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite://', 'sqlite+aiosqlite://', 1),
+    pool_size=flask_app.config['ASGI_POOL_SIZE'],
+    max_overflow=0,
+    pool_pre_ping=True
+)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+@event.listens_for(engine.sync_engine, 'connect')
+def _configure_connection(dbapi_connection, connection_record):
+    # Same pragmas as the sync engine; this pool only ever reads
+    cursor = dbapi_connection.cursor()
+    for name, value in sqlite_profile.pragmas.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.execute('PRAGMA query_only=ON')
+    cursor.close()
+
+
+def jsonify(data, status=200):
+    """Serialize exactly like Flask's jsonify outside debug mode"""
+    body = flask_app.json.dumps(data, separators=(',', ':')) + '\n'
+    return Response(body, status_code=status, media_type='application/json')
+
+
+def timed(endpoint):
+    """Record a handler in request_metrics under the same endpoint label as its Flask twin.
+
+    Latency, status and size only: statements run on aiosqlite's threads are
+    not attributed to a request.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            started = time.perf_counter()
+            response = await handler(request)
+            request_metrics.observe(
+                (request.method, endpoint), response.status_code, time.perf_counter() - started, len(response.body)
+            )
+            return response
+        return wrapper
+    return decorator
+
+
+def int_arg(request, name, default):
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """Async-side twin of http_cache.is_not_modified"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        return parse_etags(if_none_match).contains(etag)
+    if_modified_since = parse_date(request.headers.get('if-modified-since'))
+    if if_modified_since and last_modified:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        return last_modified <= if_modified_since
+    return False
+
+
+def add_validators(response, etag, last_modified=None):
+    response.headers['ETag'] = quote_etag(etag)
+    if last_modified:
+        response.headers['Last-Modified'] = http_date(last_modified.replace(tzinfo=timezone.utc))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def request_fingerprint(request):
+    # Same normalization as the Flask side, so both servers hand out the same ETags
+    return sorted(request.query_params.multi_items())
+
+
+async def paginate(session, statement, page, per_page, scalars=True):
+    """Flask-SQLAlchemy's paginate(error_out=False), returning (rows, pagination dict)"""
+    page = page if page >= 1 else 1
+    per_page = per_page if per_page >= 1 else 20
+    total = await session.scalar(db.select(db.func.count()).select_from(statement.order_by(None).subquery()))
+    result = await session.execute(statement.limit(per_page).offset((page - 1) * per_page))
+    rows = result.scalars().all() if scalars else result.all()
+    pages = math.ceil(total / per_page) if total else 0
+    return rows, {
+        'page': page,
+        'pages': pages,
+        'per_page': per_page,
+        'total': total,
+        'has_next': page < pages,
+        'has_prev': page > 1
+    }
+
+
+@timed('/api/blog/posts')
+async def get_posts(request):
+    """Get all blog posts with optional filtering"""
+    try:
+        args = request.query_params
+        page = int_arg(request, 'page', 1)
+        per_page = int_arg(request, 'per_page', 10)
+        status = args.get('status', 'published')
+        category = args.get('category')
+        search = args.get('search')
+
+        try:
+            fields = BlogPost.resolve_fields(args.get('view'), args.get('fields'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}, 400)
+
+        filters = []
+        if status:
+            filters.append(BlogPost.status == status)
+        if category:
+            filters.append(BlogPost.category == category)
+        filters.extend(tagged(tag) for tag in args.getlist('tag'))
+
+        if search and 'cursor' in args:
+            return jsonify({'success': False, 'error': 'Cursor pagination is not supported with search'}, 400)
+
+        cursor = None
+        if args.get('cursor'):
+            try:
+                cursor = BlogPost.decode_cursor(args['cursor'])
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}, 400)
+
+        async with Session() as session:
+            etag = make_etag(request_fingerprint(request), await session.scalar(posts_version_query()) or 0)
+            if is_not_modified(request, etag):
+                return add_validators(Response(status_code=304), etag)
+
+            query = db.select(BlogPost).where(*filters).options(BlogPost.load_fields(fields))
+
+            if search:
+                # The LIKE fallback checks for the index through the Flask session
+                with flask_app.app_context():
+                    query = apply_search(query, search)
+                rows, pagination = await paginate(
+                    session, query.order_by(*BlogPost.listing_order()), page, per_page, scalars=False
+                )
+                posts = []
+                for post, snippet in rows:
+                    post_data = post.to_dict(fields)
+                    post_data['snippet'] = snippet
+                    posts.append(post_data)
+                response = jsonify({'success': True, 'posts': posts, 'pagination': pagination})
+                return add_validators(response, etag)
+
+            query = query.order_by(*BlogPost.listing_order())
+
+            if 'cursor' in args:
+                query_page = query.where(BlogPost.after_cursor(cursor)) if cursor else query
+                posts = (await session.execute(query_page.limit(per_page + 1))).scalars().all()
+                has_next = len(posts) > per_page
+                posts = posts[:per_page]
+                pagination = {
+                    'per_page': per_page,
+                    'has_next': has_next,
+                    'next_cursor': posts[-1].encode_cursor() if has_next else None
+                }
+                if args.get('with_total', 'false').lower() in ('1', 'true', 'yes'):
+                    pagination['total'] = await session.scalar(
+                        db.select(db.func.count()).select_from(query.order_by(None).subquery())
+                    )
+                response = jsonify({
+                    'success': True,
+                    'posts': fragment_cache.posts(posts, fields),
+                    'pagination': pagination
+                })
+                return add_validators(response, etag)
+
+            posts, pagination = await paginate(session, query, page, per_page)
+            response = jsonify({
+                'success': True,
+                'posts': fragment_cache.posts(posts, fields),
+                'pagination': pagination
+            })
+            return add_validators(response, etag)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}, 500)
+
+
+async def resolve_slug(session, slug):
+    """Async twin of SlugMap.resolve for slugs this process has not seen yet"""
+    post_id = await session.scalar(db.select(BlogPost.id).where(BlogPost.slug == slug))
+    if post_id is not None:
+        slug_map.set_current(slug, post_id)
+        return post_id
+    post_id = await session.scalar(db.select(SlugHistory.post_id).where(SlugHistory.slug == slug))
+    if post_id is not None:
+        slug_map.retire(slug, post_id)
+    return post_id
+
+
+@timed('/api/blog/posts/<post_id>')
+async def get_post(request):
+    """Get a single blog post by ID or slug"""
+    try:
+        post_id = request.path_params['post_id']
+        try:
+            includes = BlogPost.resolve_includes(request.query_params.get('include'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}, 400)
+
+        # The render row comes with the post, as async sessions cannot lazy load it
+        # and a detached post would render its content on every request instead
+        load_rendered = [selectinload(BlogPost.rendered)]
+        async with Session() as session:
+            resolved_id, _ = slug_map.lookup(post_id)
+            post = await session.get(BlogPost, resolved_id or post_id, options=load_rendered)
+            if not post and resolved_id is None:
+                resolved_id = await resolve_slug(session, post_id)
+                post = await session.get(BlogPost, resolved_id, options=load_rendered) if resolved_id else None
+
+            if not post:
+                return jsonify({'success': False, 'error': 'Post not found'}, 404)
+
+            if resolved_id is not None and post.slug != post_id:
+                slug_map.retire(post_id, post.id)
+                slug_map.set_current(post.slug, post.id)
+                location = request.url_for('get_post', post_id=post.slug).include_query_params(**request.query_params)
+                return RedirectResponse(location.path + (f'?{location.query}' if location.query else ''), status_code=301)
+
+            related = []
+            if 'related' in includes:
+                related = (await session.scalars(related_posts_query(post.id))).all()
+
+            if post.status == 'published':
+                view_counter.increment(post.id)
+
+            etag = make_etag(post.id, post.updated_at, *(f'{other.id}:{other.updated_at}' for other in related))
+            last_modified = max([post.updated_at] + [other.updated_at for other in related])
+            if is_not_modified(request, etag, last_modified):
+                return add_validators(Response(status_code=304), etag, last_modified)
+
+            post_data = post.to_dict()
+            post_data['views'] = view_counter.views(post)
+            if 'related' in includes:
+                post_data['related'] = [other.to_dict(RELATED_FIELDS) for other in related]
+        return add_validators(jsonify({'success': True, 'post': post_data}), etag, last_modified)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}, 500)
+
+
+async def get_stat_values(dimension):
+    async with Session() as session:
+        rows = await session.execute(
+            db.select(BlogStat.key, BlogStat.value).where(BlogStat.dimension == dimension, BlogStat.value > 0)
+        )
+        return dict(rows.all())
+
+
+@timed('/api/blog/categories')
+async def get_categories(request):
+    """Get all unique categories"""
+    try:
+        category_list = sorted(await get_stat_values('category'))
+        return jsonify({'success': True, 'categories': category_list})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}, 500)
+
+
+@timed('/api/blog/stats')
+async def get_stats(request):
+    """Get blog statistics"""
+    try:
+        totals = await get_stat_values('total')
+        statuses = await get_stat_values('status')
+        return jsonify({
+            'success': True,
+            'stats': {
+                'total_posts': totals.get('posts', 0),
+                'published_posts': statuses.get('published', 0),
+                'draft_posts': statuses.get('draft', 0),
+                'total_views': totals.get('views', 0)
+            }
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}, 500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+    view_counter.flush()
+
+
+# Writes, exports and everything else keep running through the sync Flask app
+wsgi_app = WSGIMiddleware(flask_app)
+
+app = Starlette(
+    routes=[
+        Route('/api/blog/posts', get_posts, methods=['GET']),
+        Route('/api/blog/posts/export', wsgi_app),
+        Route('/api/blog/posts/trending', wsgi_app),
+        Route('/api/blog/posts/{post_id}', get_post, methods=['GET']),
+        Route('/api/blog/categories', get_categories, methods=['GET']),
+        Route('/api/blog/stats', get_stats, methods=['GET']),
+        Mount('/', app=wsgi_app),
+    ],
+    lifespan=lifespan
+)
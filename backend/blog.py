@@ -1,11 +1,30 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, redirect, stream_with_context, url_for
 from src.models.blog_post import BlogPost, db
+from src.models.blog_stats import get_stat_values, posts_version
+from src.models.related import RELATED_FIELDS, related_posts_query
+from src.models.search import apply_search
+from src.models.slugs import slug_map
+from src.models.tags import tag_counts, tagged
+from src.models.trending import WINDOWS, trending
+from src.models.view_counter import view_counter
+from src.models.view_history import GRANULARITIES, view_history
+from src.utils.http_cache import add_validators, is_not_modified, make_etag, not_modified_response, request_fingerprint
+from src.utils.response_cache import response_cache
+from src.utils.export import EXPORT_FORMATS, iter_export
+from src.utils.fragment_cache import fragment_cache
 from datetime import datetime
 import json
 
 blog_bp = Blueprint('blog', __name__)
 
+def invalidate_post_caches(post, *old_slugs):
+    """Drop cached responses a write to this post may have made stale"""
+    namespaces = ['posts', 'categories', 'stats', 'tags', 'related', f'post:{post.id}', f'post:{post.slug}']
+    namespaces.extend(f'post:{slug}' for slug in old_slugs)
+    response_cache.invalidate(*namespaces)
+
 @blog_bp.route('/posts', methods=['GET'])
+@response_cache.cached('posts')
 def get_posts():
     """Get all blog posts with optional filtering"""
     try:
@@ -15,6 +34,12 @@ def get_posts():
         category = request.args.get('category')
         search = request.args.get('search')
         
+        # Listings default to the summary view so post bodies are never read
+        try:
+            fields = BlogPost.resolve_fields(request.args.get('view'), request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
         query = BlogPost.query
         
         # Filter by status
@@ -25,21 +50,40 @@ def get_posts():
         if category:
             query = query.filter(BlogPost.category == category)
         
-        # Search in title and content
+        # Filter by tag; repeated ?tag= arguments must all match
+        for tag in request.args.getlist('tag'):
+            query = query.filter(tagged(tag))
+        
+        if search and 'cursor' in request.args:
+            return jsonify({'success': False, 'error': 'Cursor pagination is not supported with search'}), 400
+        
+        cursor = None
+        if request.args.get('cursor'):
+            try:
+                cursor = BlogPost.decode_cursor(request.args['cursor'])
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Every write to blog_posts bumps the posts version, so revalidating
+        # costs one primary key lookup rather than a scan of the filtered set
+        etag = make_etag(request_fingerprint(), posts_version(db.session.connection()))
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        query = query.options(BlogPost.load_fields(fields))
+        
+        # Full-text search in title, excerpt, content and tags, ranked by relevance
         if search:
-            query = query.filter(
-                db.or_(
-                    BlogPost.title.contains(search),
-                    BlogPost.content.contains(search),
-                    BlogPost.excerpt.contains(search)
-                )
-            )
+            response = search_posts(query, search, page, per_page, fields)
+            return add_validators(response, etag)
         
         # Order by published date or created date
-        query = query.order_by(
-            BlogPost.published_at.desc().nullslast(),
-            BlogPost.created_at.desc()
-        )
+        query = query.order_by(*BlogPost.listing_order())
+        
+        # Cursor mode: seek past the last seen post instead of OFFSET scanning
+        if 'cursor' in request.args:
+            response = get_posts_after_cursor(query, cursor, per_page, fields)
+            return add_validators(response, etag)
         
         # Paginate results
         posts = query.paginate(
@@ -48,9 +92,9 @@ def get_posts():
             error_out=False
         )
         
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'posts': [post.to_dict() for post in posts.items],
+            'posts': fragment_cache.posts(posts.items, fields),
             'pagination': {
                 'page': posts.page,
                 'pages': posts.pages,
@@ -60,30 +104,168 @@ def get_posts():
                 'has_prev': posts.has_prev
             }
         })
+        return add_validators(response, etag)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def search_posts(query, search, page, per_page, fields=None):
+    """Paginate full-text matches, attaching a highlighted snippet to each post"""
+    results = apply_search(query, search).order_by(*BlogPost.listing_order())
+    results = results.paginate(
+        page=page, 
+        per_page=per_page, 
+        error_out=False
+    )
+    
+    posts = []
+    for post, snippet in results.items:
+        post_data = post.to_dict(fields)
+        post_data['snippet'] = snippet
+        posts.append(post_data)
+    
+    return jsonify({
+        'success': True,
+        'posts': posts,
+        'pagination': {
+            'page': results.page,
+            'pages': results.pages,
+            'per_page': results.per_page,
+            'total': results.total,
+            'has_next': results.has_next,
+            'has_prev': results.has_prev
+        }
+    })
+
+def get_posts_after_cursor(query, cursor, per_page, fields=None):
+    """Keyset-paginate an ordered post query; a None cursor starts at the first page"""
+    query_page = query.filter(BlogPost.after_cursor(cursor)) if cursor else query
+    
+    # Fetch one extra row to learn whether another page exists without counting
+    posts = query_page.limit(per_page + 1).all()
+    has_next = len(posts) > per_page
+    posts = posts[:per_page]
+    
+    pagination = {
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': posts[-1].encode_cursor() if has_next else None
+    }
+    
+    # The total needs a full COUNT(*), so only run it on request
+    if request.args.get('with_total', 'false').lower() in ('1', 'true', 'yes'):
+        pagination['total'] = query.order_by(None).count()
+    
+    return jsonify({
+        'success': True,
+        'posts': fragment_cache.posts(posts, fields),
+        'pagination': pagination
+    })
+
+@blog_bp.route('/posts/export', methods=['GET'])
+def export_posts():
+    """Stream every matching post as NDJSON or CSV"""
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f'Unknown format: {export_format}'}), 400
+        
+        # Exports are snapshots, so they include every field unless projected
+        try:
+            fields = BlogPost.resolve_fields(request.args.get('view', 'full'), request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        fields = fields or BlogPost.FIELDS
+        
+        query = db.select(BlogPost).options(BlogPost.load_fields(fields)).order_by(BlogPost.id)
+        
+        # Same filters as the post listing
+        if request.args.get('status'):
+            query = query.where(BlogPost.status == request.args['status'])
+        if request.args.get('category'):
+            query = query.where(BlogPost.category == request.args['category'])
+        
+        def generate():
+            # yield_per streams rows off the cursor in batches, so memory stays flat
+            posts = db.session.execute(query.execution_options(yield_per=500)).scalars()
+            yield from iter_export(posts, fields, export_format)
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={'Content-Disposition': f'attachment; filename=posts.{export_format}'}
+        )
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @blog_bp.route('/posts/<post_id>', methods=['GET'])
 def get_post(post_id):
-    """Get a single blog post by ID or slug"""
+    """Get a single blog post by ID or slug
+    
+    `include=related` adds the most related published posts, from the
+    precomputed related_posts table.
+    """
     try:
-        # Try to find by ID first, then by slug
-        post = BlogPost.query.filter(
-            db.or_(BlogPost.id == post_id, BlogPost.slug == post_id)
-        ).first()
+        try:
+            includes = BlogPost.resolve_includes(request.args.get('include'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Related lists change when other posts do, so those responses share
+        # a namespace that every write drops
+        namespace = 'related' if 'related' in includes else f'post:{post_id}'
+        
+        # Cache hits still count the view, but never touch the database
+        cached = response_cache.get(namespace)
+        if cached is not None:
+            if cached.meta.get('published'):
+                view_counter.increment(cached.meta['id'])
+            return cached.to_response()
+        
+        # Known slugs are a dict hit, then everything is a primary key fetch;
+        # only unknown slugs (e.g. written by another worker) cost a slug query
+        resolved_id, _ = slug_map.lookup(post_id)
+        post = db.session.get(BlogPost, resolved_id or post_id)
+        if not post and resolved_id is None:
+            resolved_id, _ = slug_map.resolve(post_id)
+            post = db.session.get(BlogPost, resolved_id) if resolved_id else None
         
         if not post:
             return jsonify({'success': False, 'error': 'Post not found'}), 404
         
-        # Increment view count for published posts
+        # Old slugs redirect permanently to the current one
+        if resolved_id is not None and post.slug != post_id:
+            slug_map.retire(post_id, post.id)
+            slug_map.set_current(post.slug, post.id)
+            return redirect(url_for('blog.get_post', post_id=post.slug, **request.args), code=301)
+        
+        # Count the view for published posts; views are buffered and written
+        # in batches, so reading a post never takes the write lock
         if post.status == 'published':
-            post.views += 1
-            db.session.commit()
+            view_counter.increment(post.id)
         
-        return jsonify({
+        related = db.session.scalars(related_posts_query(post.id)).all() if 'related' in includes else []
+        
+        # Revalidated reads still count as views, but skip serialization
+        etag = make_etag(post.id, post.updated_at, *(f'{other.id}:{other.updated_at}' for other in related))
+        last_modified = max([post.updated_at] + [other.updated_at for other in related])
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        
+        post_data = post.to_dict()
+        post_data['views'] = view_counter.views(post)
+        if 'related' in includes:
+            post_data['related'] = [other.to_dict(RELATED_FIELDS) for other in related]
+        
+        response = jsonify({
             'success': True,
-            'post': post.to_dict()
+            'post': post_data
+        })
+        add_validators(response, etag, last_modified)
+        return response_cache.set(namespace, response, {
+            'id': post.id,
+            'published': post.status == 'published'
         })
     
     except Exception as e:
@@ -98,14 +280,8 @@ def create_post():
         if not data or not data.get('title') or not data.get('content'):
             return jsonify({'success': False, 'error': 'Title and content are required'}), 400
         
-        # Create slug from title
-        slug = BlogPost.create_slug(data['title'])
-        
-        # Check if slug already exists
-        existing_post = BlogPost.query.filter_by(slug=slug).first()
-        if existing_post:
-            # Add timestamp to make slug unique
-            slug = f"{slug}-{int(datetime.utcnow().timestamp())}"
+        # Create slug from title, suffixed if another post has (or had) it
+        slug = slug_map.unique_slug(BlogPost.create_slug(data['title']))
         
         # Calculate reading time
         reading_time = BlogPost.calculate_reading_time(data['content'])
@@ -132,6 +308,7 @@ def create_post():
         
         db.session.add(post)
         db.session.commit()
+        invalidate_post_caches(post)
         
         return jsonify({
             'success': True,
@@ -143,6 +320,32 @@ def create_post():
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@blog_bp.route('/posts/bulk', methods=['POST'])
+def bulk_create_posts():
+    """Create many blog posts from an NDJSON body, one post per line"""
+    from src.models.bulk_import import import_posts, DEFAULT_CHUNK_SIZE
+    try:
+        chunk_size = request.args.get('chunk_size', DEFAULT_CHUNK_SIZE, type=int)
+        
+        # Rows are validated as the body streams in and inserted chunk by chunk
+        results = sorted(
+            import_posts(request.stream, chunk_size=max(1, chunk_size)),
+            key=lambda result: result['line']
+        )
+        response_cache.invalidate('posts', 'categories', 'stats', 'tags', 'related')
+        
+        created = sum(1 for result in results if result['status'] == 'created')
+        return jsonify({
+            'success': created > 0,
+            'message': f'{created} posts created, {len(results) - created} failed',
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }), 201 if created else 400
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @blog_bp.route('/posts/<post_id>', methods=['PUT'])
 def update_post(post_id):
     """Update an existing blog post"""
@@ -155,20 +358,16 @@ def update_post(post_id):
         if not data:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
         
+        old_slug = post.slug
+        
         # Update fields if provided
         if 'title' in data:
             post.title = data['title']
             # Update slug if title changed
+            # The old slug is kept in the slug history and redirects here
             new_slug = BlogPost.create_slug(data['title'])
             if new_slug != post.slug:
-                # Check if new slug already exists
-                existing_post = BlogPost.query.filter(
-                    BlogPost.slug == new_slug,
-                    BlogPost.id != post_id
-                ).first()
-                if existing_post:
-                    new_slug = f"{new_slug}-{int(datetime.utcnow().timestamp())}"
-                post.slug = new_slug
+                post.slug = slug_map.unique_slug(new_slug, post.id)
         
         if 'content' in data:
             post.content = data['content']
@@ -205,6 +404,7 @@ def update_post(post_id):
         
         post.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_post_caches(post, old_slug)
         
         return jsonify({
             'success': True,
@@ -226,6 +426,7 @@ def delete_post(post_id):
         
         db.session.delete(post)
         db.session.commit()
+        invalidate_post_caches(post)
         
         return jsonify({
             'success': True,
@@ -237,11 +438,12 @@ def delete_post(post_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @blog_bp.route('/categories', methods=['GET'])
+@response_cache.cached('categories')
 def get_categories():
     """Get all unique categories"""
     try:
-        categories = db.session.query(BlogPost.category).distinct().all()
-        category_list = [cat[0] for cat in categories if cat[0]]
+        # Categories with at least one post, from the materialized aggregates
+        category_list = sorted(get_stat_values('category'))
         
         return jsonify({
             'success': True,
@@ -251,14 +453,34 @@ def get_categories():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@blog_bp.route('/tags', methods=['GET'])
+@response_cache.cached('tags')
+def get_tags():
+    """Get every tag with its number of published posts"""
+    try:
+        # Counted through the post_tags index rather than by parsing every post's tags
+        counts = tag_counts(db.session.connection())
+        
+        return jsonify({
+            'success': True,
+            'tags': [{'name': name, 'count': count} for name, count in counts]
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @blog_bp.route('/stats', methods=['GET'])
+@response_cache.cached('stats')
 def get_stats():
     """Get blog statistics"""
     try:
-        total_posts = BlogPost.query.count()
-        published_posts = BlogPost.query.filter_by(status='published').count()
-        draft_posts = BlogPost.query.filter_by(status='draft').count()
-        total_views = db.session.query(db.func.sum(BlogPost.views)).scalar() or 0
+        # Read from the materialized aggregates instead of scanning blog_posts
+        totals = get_stat_values('total')
+        statuses = get_stat_values('status')
+        total_posts = totals.get('posts', 0)
+        published_posts = statuses.get('published', 0)
+        draft_posts = statuses.get('draft', 0)
+        total_views = totals.get('views', 0)
         
         return jsonify({
             'success': True,
@@ -273,3 +495,72 @@ def get_stats():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+
+@blog_bp.route('/stats/views', methods=['GET'])
+def get_view_history():
+    """Views per hour or day, site-wide or for one post, oldest bucket first"""
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return jsonify({'success': False, 'error': f'Unknown granularity: {granularity}'}), 400
+        buckets = request.args.get('buckets', 30, type=int)
+        if not 1 <= buckets <= 1000:
+            return jsonify({'success': False, 'error': 'buckets must be between 1 and 1000'}), 400
+        
+        until = datetime.utcnow()
+        history = view_history(
+            db.session.connection(), granularity,
+            since=until - (buckets - 1) * GRANULARITIES[granularity], until=until,
+            post_id=request.args.get('post_id')
+        )
+        
+        return jsonify({
+            'success': True,
+            'granularity': granularity,
+            'views': [{'start': start.isoformat(), 'views': views} for start, views in history]
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@blog_bp.route('/posts/trending', methods=['GET'])
+def get_trending_posts():
+    """Get the published posts with the highest time-decayed view score in a window"""
+    try:
+        window = request.args.get('window', '7d')
+        if window not in WINDOWS:
+            return jsonify({'success': False, 'error': f'Unknown window: {window}. Use one of: {", ".join(WINDOWS)}'}), 400
+        try:
+            fields = BlogPost.resolve_fields(request.args.get('view'), request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # A few precomputed rows; the ranking itself is rebuilt in the background
+        entries, refreshed_at = trending.leaderboard(window, request.args.get('limit', type=int))
+        posts = {
+            post.id: post
+            # updated_at is loaded whatever the projection, it versions the response
+            for post in BlogPost.query.options(BlogPost.load_fields(set(fields) | {'updated_at'}))
+            .filter(BlogPost.id.in_([post_id for post_id, _, _ in entries]))
+        }
+        entries = [entry for entry in entries if entry[0] in posts]
+        
+        etag = make_etag(request_fingerprint(), refreshed_at, *(
+            f'{post_id}:{posts[post_id].updated_at}' for post_id, _, _ in entries
+        ))
+        if is_not_modified(etag, refreshed_at):
+            return not_modified_response(etag, refreshed_at)
+        
+        response = jsonify({
+            'success': True,
+            'window': window,
+            'refreshed_at': refreshed_at.isoformat() if refreshed_at else None,
+            'posts': [
+                dict(posts[post_id].to_dict(fields), trending={'score': round(score, 3), 'views': views})
+                for post_id, score, views in entries
+            ]
+        })
+        return add_validators(response, etag, refreshed_at)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,11 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import base64
+import json
 import uuid
 
 db = SQLAlchemy()
 
 class BlogPost(db.Model):
     __tablename__ = 'blog_posts'
+    __table_args__ = (
+        # Matches the listing order (published_at DESC NULLS LAST, created_at DESC, id DESC)
+        # so filtered listings and keyset seeks are served straight from the index
+        db.Index('ix_blog_posts_listing', 'status', 'published_at', 'created_at', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     title = db.Column(db.String(200), nullable=False)
@@ -28,26 +35,164 @@ class BlogPost(db.Model):
     def __repr__(self):
         return f'<BlogPost {self.title}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'slug': self.slug,
-            'content': self.content,
-            'excerpt': self.excerpt,
-            'author': self.author,
-            'category': self.category,
-            'tags': self.tags,
-            'featured_image': self.featured_image,
-            'meta_description': self.meta_description,
-            'meta_keywords': self.meta_keywords,
-            'status': self.status,
-            'published_at': self.published_at.isoformat() if self.published_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'views': self.views,
-            'reading_time': self.reading_time
-        }
+    # Every field exposed by to_dict, in response order
+    FIELDS = (
+        'id', 'title', 'slug', 'content', 'content_html', 'toc', 'excerpt', 'author',
+        'category', 'tags', 'featured_image', 'meta_description', 'meta_keywords',
+        'status', 'published_at', 'created_at', 'updated_at', 'views', 'reading_time'
+    )
+    
+    # Listing cards never show the body or SEO metadata, so summaries leave them out
+    SUMMARY_FIELDS = tuple(
+        field for field in FIELDS
+        if field not in ('content', 'content_html', 'toc', 'meta_description', 'meta_keywords')
+    )
+    
+    # Fields served from the render cache (models.rendered_content) rather than a column;
+    # excerpt falls back to the rendered one when the author left it empty
+    RENDERED_FIELDS = ('content_html', 'toc', 'excerpt')
+    
+    DATETIME_FIELDS = ('published_at', 'created_at', 'updated_at')
+    
+    # Optional extras of the single-post response, requested with include=
+    INCLUDES = ('related',)
+    
+    def to_dict(self, fields=None):
+        """Serialize the post, optionally limited to the given fields"""
+        data = {}
+        for field in fields or self.FIELDS:
+            value = self.summary if field == 'excerpt' else getattr(self, field)
+            if field in self.DATETIME_FIELDS:
+                value = value.isoformat() if value else None
+            data[field] = value
+        return data
+    
+    def _rendered(self):
+        from src.models.rendered_content import rendered_for
+        return rendered_for(self)
+    
+    @property
+    def content_html(self):
+        """Content rendered from markdown and sanitized"""
+        rendered = self._rendered()
+        return rendered.html if rendered else None
+    
+    @property
+    def toc(self):
+        """Table of contents as [{'level', 'id', 'title'}], one entry per heading"""
+        rendered = self._rendered()
+        return rendered.toc if rendered else []
+    
+    @property
+    def summary(self):
+        """The author's excerpt, or one taken from the rendered content"""
+        if self.excerpt:
+            return self.excerpt
+        rendered = self._rendered()
+        return rendered.excerpt if rendered else None
+    
+    @classmethod
+    def resolve_fields(cls, view=None, fields=None):
+        """Work out which fields a listing should return; None means every field
+        
+        An explicit comma-separated `fields` list wins over `view`, which is
+        either 'summary' (the default) or 'full'. Raises ValueError for
+        unknown names.
+        """
+        if fields:
+            requested = [field.strip() for field in fields.split(',') if field.strip()]
+            unknown = [field for field in requested if field not in cls.FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            return tuple(field for field in cls.FIELDS if field == 'id' or field in requested)
+        if view in (None, '', 'summary'):
+            return cls.SUMMARY_FIELDS
+        if view == 'full':
+            return None
+        raise ValueError(f'Unknown view: {view}')
+    
+    @classmethod
+    def resolve_includes(cls, include=None):
+        """Extras requested with a comma-separated `include`; raises ValueError for unknown names"""
+        requested = {name.strip() for name in (include or '').split(',') if name.strip()}
+        unknown = sorted(requested - set(cls.INCLUDES))
+        if unknown:
+            raise ValueError(f"Unknown include: {', '.join(unknown)}")
+        return requested
+    
+    @classmethod
+    def load_fields(cls, fields):
+        """Loader option that only SELECTs the columns needed for the given fields
+        
+        The listing keys are always loaded so cursors can be built from any row,
+        and rendered fields bring in just the parts of the render row they use.
+        """
+        from src.models.rendered_content import RenderedContent
+        fields = set(fields or cls.FIELDS)
+        columns = fields | {'published_at', 'created_at'}
+        option = db.Load(cls).load_only(*(
+            getattr(cls, column) for column in cls.FIELDS if column in columns and column in cls.__table__.c
+        ))
+        rendered = {'content_html': 'html', 'toc': 'toc', 'excerpt': 'excerpt'}
+        needed = [getattr(RenderedContent, rendered[field]) for field in cls.RENDERED_FIELDS if field in fields]
+        if needed:
+            option = option.selectinload(cls.rendered).load_only(RenderedContent.content_hash, *needed)
+        return option
+    
+    @classmethod
+    def fingerprint(cls, query):
+        """Cheap version of a filtered post query: (row count, latest updated_at)"""
+        return tuple(query.order_by(None).with_entities(
+            db.func.count(cls.id),
+            db.func.max(cls.updated_at)
+        ).one())
+    
+    @classmethod
+    def listing_order(cls):
+        """Ordering used by post listings, with id as a unique tie-breaker"""
+        return (
+            cls.published_at.desc().nullslast(),
+            cls.created_at.desc(),
+            cls.id.desc()
+        )
+    
+    def encode_cursor(self):
+        """Create an opaque cursor pointing just past this post in listing order"""
+        key = [
+            self.published_at.isoformat() if self.published_at else None,
+            self.created_at.isoformat() if self.created_at else None,
+            self.id
+        ]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor created by encode_cursor, raising ValueError if malformed"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            published_at, created_at, post_id = json.loads(base64.urlsafe_b64decode(padded))
+            return (
+                datetime.fromisoformat(published_at) if published_at else None,
+                datetime.fromisoformat(created_at),
+                post_id
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError('Invalid cursor') from e
+    
+    @classmethod
+    def after_cursor(cls, cursor):
+        """Filter selecting posts that come after the decoded cursor in listing order"""
+        published_at, created_at, post_id = cursor
+        if published_at is None:
+            # Already in the trailing block of unpublished posts
+            return db.and_(
+                cls.published_at.is_(None),
+                db.tuple_(cls.created_at, cls.id) < db.tuple_(created_at, post_id)
+            )
+        return db.or_(
+            db.tuple_(cls.published_at, cls.created_at, cls.id) < db.tuple_(published_at, created_at, post_id),
+            cls.published_at.is_(None)
+        )
     
     @staticmethod
     def create_slug(title):
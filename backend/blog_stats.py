@@ -0,0 +1,168 @@
+from collections import Counter
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from src.models.blog_post import BlogPost, db
+
+
+class BlogStat(db.Model):
+    """Materialized post aggregates, kept current by every write to blog_posts.
+
+    Rows are (dimension, key) -> value, e.g. ('status', 'published') -> 12,
+    ('category', 'SEO') -> 4, ('total', 'posts') and ('total', 'views').
+    ('version', 'posts') counts writes to blog_posts, so listings can be
+    versioned with one primary key lookup instead of scanning the posts.
+    """
+    __tablename__ = 'blog_stats'
+
+    dimension = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+VERSION_ROW = ('version', 'posts')
+
+
+def post_contribution(status, category, views):
+    """What a single post adds to each aggregate row"""
+    contribution = Counter({('total', 'posts'): 1, ('total', 'views'): views or 0})
+    if status:
+        contribution[('status', status)] += 1
+    if category:
+        contribution[('category', category)] += 1
+    return contribution
+
+
+def apply_deltas(connection, deltas):
+    """Add the given per-row deltas to the aggregates in the current transaction"""
+    deltas = {row: delta for row, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = BlogStat.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.dimension, table.c.key],
+        set_={'value': table.c.value + statement.excluded.value}
+    )
+    connection.execute(statement, [
+        {'dimension': dimension, 'key': key, 'value': delta}
+        for (dimension, key), delta in deltas.items()
+    ])
+
+
+def posts_version_query():
+    table = BlogStat.__table__
+    return db.select(table.c.value).where(table.c.dimension == VERSION_ROW[0], table.c.key == VERSION_ROW[1])
+
+
+def posts_version(connection):
+    """Counter bumped by every write to blog_posts"""
+    return connection.execute(posts_version_query()).scalar() or 0
+
+
+def compute_stats(connection):
+    """Recompute every aggregate row from blog_posts"""
+    posts = BlogPost.__table__
+    stats = Counter()
+    totals = connection.execute(
+        db.select(db.func.count(), db.func.coalesce(db.func.sum(posts.c.views), 0))
+    ).one()
+    stats[('total', 'posts')], stats[('total', 'views')] = totals
+    for dimension in ('status', 'category'):
+        column = posts.c[dimension]
+        rows = connection.execute(
+            db.select(column, db.func.count()).where(column.isnot(None)).group_by(column)
+        )
+        for key, count in rows:
+            stats[(dimension, key)] = count
+    return stats
+
+
+def rebuild_stats(connection):
+    """Repair any drift between the aggregates and blog_posts.
+
+    Returns {(dimension, key): (stored, actual)} for every row that was wrong.
+    """
+    table = BlogStat.__table__
+    actual = compute_stats(connection)
+    # The version counter is not an aggregate; it only ever moves forward
+    aggregates = table.c.dimension != VERSION_ROW[0]
+    stored = {
+        (row.dimension, row.key): row.value
+        for row in connection.execute(db.select(table).where(aggregates))
+    }
+    drift = {
+        row: (stored.get(row, 0), actual.get(row, 0))
+        for row in set(actual) | set(stored)
+        if stored.get(row, 0) != actual.get(row, 0)
+    }
+    connection.execute(table.delete().where(aggregates))
+    if actual:
+        connection.execute(table.insert(), [
+            {'dimension': dimension, 'key': key, 'value': value}
+            for (dimension, key), value in actual.items()
+        ])
+    if drift:
+        apply_deltas(connection, {VERSION_ROW: 1})
+    return drift
+
+
+def get_stat_values(dimension):
+    """All aggregate values for one dimension, as {key: value}"""
+    rows = BlogStat.query.filter(BlogStat.dimension == dimension, BlogStat.value > 0)
+    return {row.key: row.value for row in rows}
+
+
+def _committed_value(post, attribute):
+    history = inspect(post).attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(post, attribute)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_stat_deltas(session, flush_context, instances):
+    deltas = session.info.setdefault('blog_stat_deltas', Counter())
+    written = False
+    for post in session.new:
+        if isinstance(post, BlogPost):
+            deltas.update(post_contribution(post.status, post.category, post.views))
+            written = True
+    for post in session.deleted:
+        if isinstance(post, BlogPost):
+            deltas.subtract(post_contribution(
+                _committed_value(post, 'status'),
+                _committed_value(post, 'category'),
+                _committed_value(post, 'views')
+            ))
+            written = True
+    for post in session.dirty:
+        if isinstance(post, BlogPost) and session.is_modified(post):
+            deltas.subtract(post_contribution(
+                _committed_value(post, 'status'),
+                _committed_value(post, 'category'),
+                _committed_value(post, 'views')
+            ))
+            deltas.update(post_contribution(post.status, post.category, post.views))
+            written = True
+    if written:
+        deltas[VERSION_ROW] += 1
+
+
+@event.listens_for(Session, 'after_flush')
+def _write_stat_deltas(session, flush_context):
+    deltas = session.info.pop('blog_stat_deltas', None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_stat_deltas(session, previous_transaction):
+    session.info.pop('blog_stat_deltas', None)
+
+
+@event.listens_for(BlogStat.__table__, 'after_create')
+def _backfill_stats(target, connection, **kwargs):
+    # Databases that predate the aggregates table already have posts to count
+    if inspect(connection).has_table(BlogPost.__tablename__):
+        rebuild_stats(connection)
@@ -0,0 +1,154 @@
+import json
+from collections import Counter
+from datetime import datetime
+from src.models.blog_post import BlogPost, db
+from src.models.blog_stats import VERSION_ROW, apply_deltas, post_contribution
+from src.models.related import refresh_related
+from src.models.rendered_content import render_row, store_renders
+from src.models.slugs import SlugHistory, slug_map
+from src.models.tags import parse_tags, serialize_tags, set_post_tags
+
+DEFAULT_CHUNK_SIZE = 500
+
+TEXT_FIELDS = ('featured_image', 'meta_description', 'meta_keywords')
+DATETIME_FIELDS = ('published_at', 'created_at', 'updated_at')
+
+
+def build_row(data, now):
+    """Validate one imported post and turn it into an insertable row.
+
+    Raises ValueError with a message suitable for the import report.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Each line must be a JSON object')
+    for field in ('title', 'content'):
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            raise ValueError(f'{field} is required')
+
+    tags = data.get('tags')
+    if tags is not None and not isinstance(tags, list):
+        raise ValueError('tags must be a list')
+
+    row = {
+        'title': data['title'],
+        'slug': data.get('slug') or BlogPost.create_slug(data['title']),
+        'content': data['content'],
+        'excerpt': data.get('excerpt', ''),
+        'author': data.get('author', 'Marlon Palomares'),
+        'category': data.get('category', 'Google Ads'),
+        'tags': serialize_tags(parse_tags(tags)),
+        'status': data.get('status', 'draft'),
+        'views': int(data.get('views') or 0),
+        'reading_time': BlogPost.calculate_reading_time(data['content']),
+    }
+    for field in TEXT_FIELDS:
+        row[field] = data.get(field)
+    for field in DATETIME_FIELDS:
+        value = data.get(field)
+        row[field] = datetime.fromisoformat(value) if value else None
+
+    row['created_at'] = row['created_at'] or now
+    row['updated_at'] = row['updated_at'] or row['created_at']
+    if row['status'] == 'published' and row['published_at'] is None:
+        row['published_at'] = now
+    return row
+
+
+def resolve_slugs(connection, rows, seen_slugs):
+    """Make every slug in the chunk unique, against the table and the batch so far.
+
+    Taken slugs, current or retired (old links to a renamed post keep
+    redirecting to it), are found with one IN query per round; collisions
+    get a numeric suffix and are checked again, which rarely takes a second
+    round.
+    """
+    pending = rows
+    suffixes = Counter()
+    while pending:
+        slugs = {row['slug'] for row in pending}
+        existing = {
+            slug for (slug,) in connection.execute(db.union(
+                db.select(BlogPost.slug).where(BlogPost.slug.in_(slugs)),
+                db.select(SlugHistory.slug).where(SlugHistory.slug.in_(slugs))
+            ))
+        }
+        collided = []
+        for row in pending:
+            if row['slug'] in existing or row['slug'] in seen_slugs:
+                base = row.setdefault('_base_slug', row['slug'])
+                suffixes[base] += 1
+                row['slug'] = f'{base}-{suffixes[base] + 1}'
+                collided.append(row)
+            else:
+                seen_slugs.add(row['slug'])
+        pending = collided
+    for row in rows:
+        row.pop('_base_slug', None)
+
+
+def insert_chunk(entries, seen_slugs):
+    """Insert (line, row) entries in one transaction and report on each row"""
+    rows = [row for _, row in entries]
+    table = BlogPost.__table__
+    try:
+        with db.engine.begin() as connection:
+            resolve_slugs(connection, rows, seen_slugs)
+            inserted = connection.execute(
+                table.insert().returning(table.c.id, table.c.slug, sort_by_parameter_order=True),
+                rows
+            ).all()
+            # Core inserts skip the ORM flush hooks, so keep the render cache, tags and aggregates current here
+            store_renders(connection, [
+                render_row(post_id, row['content']) for (post_id, _), row in zip(inserted, rows)
+            ])
+            set_post_tags(connection, [(post_id, parse_tags(row['tags'])) for (post_id, _), row in zip(inserted, rows)])
+            deltas = Counter()
+            for row in rows:
+                deltas.update(post_contribution(row['status'], row['category'], row['views']))
+            deltas[VERSION_ROW] += 1
+            apply_deltas(connection, deltas)
+    except Exception as e:
+        for row in rows:
+            seen_slugs.discard(row['slug'])
+        return [{'line': line, 'status': 'error', 'error': str(e)} for line, _ in entries]
+    for post_id, slug in inserted:
+        slug_map.set_current(slug, post_id)
+    return [
+        {'line': line, 'status': 'created', 'id': post_id, 'slug': slug}
+        for (line, _), (post_id, slug) in zip(entries, inserted)
+    ]
+
+
+def import_posts(lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import posts from NDJSON lines, yielding one result per non-blank line.
+
+    Rows are validated as they stream in and written with one executemany
+    INSERT per chunk, each chunk in its own transaction.
+    """
+    now = datetime.utcnow()
+    seen_slugs = set()
+    created = []
+    chunk = []
+    for line_number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            chunk.append((line_number, build_row(json.loads(line), now)))
+        except (TypeError, ValueError) as e:
+            yield {'line': line_number, 'status': 'error', 'error': str(e)}
+            continue
+        if len(chunk) >= chunk_size:
+            results = insert_chunk(chunk, seen_slugs)
+            created.extend(result['id'] for result in results if result['status'] == 'created')
+            yield from results
+            chunk = []
+    if chunk:
+        results = insert_chunk(chunk, seen_slugs)
+        created.extend(result['id'] for result in results if result['status'] == 'created')
+        yield from results
+    if created:
+        # Related posts are refreshed once for the whole import rather than per chunk
+        with db.engine.begin() as connection:
+            refresh_related(connection, created)
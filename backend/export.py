@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Rows are buffered into chunks of this size before being handed to the server
+ROWS_PER_CHUNK = 100
+
+
+def _chunked(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def iter_ndjson(posts, fields):
+    """Encode posts as newline-delimited JSON, one post at a time"""
+    return _chunked(json.dumps(post.to_dict(fields), default=str) + '\n' for post in posts)
+
+
+def iter_csv(posts, fields):
+    """Encode posts as CSV with a header row; lists such as tags become JSON"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def lines():
+        writer.writerow(fields)
+        for post in posts:
+            data = post.to_dict(fields)
+            writer.writerow([
+                json.dumps(value) if isinstance(value, (list, dict)) else value
+                for value in (data[field] for field in fields)
+            ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    return _chunked(lines())
+
+
+def iter_export(posts, fields, export_format):
+    if export_format == 'csv':
+        return iter_csv(posts, fields)
+    return iter_ndjson(posts, fields)
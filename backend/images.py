@@ -0,0 +1,310 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import send_file
+from src.utils.static_manifest import IMMUTABLE_MAX_AGE
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # optional; /img/ answers 501 without it
+    Image = None
+
+# Widths derivatives are made at; requested widths round up to the next one
+DEFAULT_WIDTHS = (320, 480, 640, 768, 1024, 1280, 1600, 1920)
+
+SOURCE_TYPES = ('image/png', 'image/jpeg', 'image/webp', 'image/gif')
+
+# Output format -> (Pillow format, mimetype, default quality)
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', 55),
+    'webp': ('WEBP', 'image/webp', 78),
+    'jpeg': ('JPEG', 'image/jpeg', 82),
+    'png': ('PNG', 'image/png', None),
+}
+
+# Picked from the Accept header, best first, when no fmt is given
+NEGOTIATED_FORMATS = ('avif', 'webp')
+
+
+class ImageError(ValueError):
+    """A derivative request that cannot be served; carries the HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def render_derivative(source_path, target_path, width, fmt, quality):
+    """Resize and encode one derivative; runs in a pool worker. Returns the bytes written."""
+    pillow_format, _, _ = FORMATS[fmt]
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image = image.resize((width, max(round(image.height * width / image.width), 1)), Image.LANCZOS)
+        if fmt == 'jpeg' and image.mode != 'RGB':
+            # JPEG has no alpha; flatten transparent screenshots onto white
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        options = {'optimize': True} if fmt in ('jpeg', 'png') else {}
+        if quality is not None:
+            options['quality'] = quality
+        if fmt == 'jpeg':
+            options['progressive'] = True
+
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        # Write next to the target and rename, so readers never see a half-written file
+        temporary = f'{target_path}.{os.getpid()}.tmp'
+        try:
+            image.save(temporary, pillow_format, **options)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+    os.replace(temporary, target_path)
+    return os.path.getsize(target_path)
+
+
+class ImageService:
+    """Resized, re-encoded derivatives of static images, served from /img/<path>.
+
+    Derivatives are keyed by the source's content hash (from the static
+    manifest) and the output parameters, and stored once on disk under that
+    key. Misses are encoded on a process pool; at most IMAGE_MAX_PENDING
+    encodes are queued per process (more get a 503), and concurrent requests
+    for the same derivative wait on one encode. When the cache grows past
+    IMAGE_CACHE_MAX_BYTES the oldest files are evicted.
+    """
+
+    def __init__(self, app=None, manifest=None):
+        self.app = None
+        self.manifest = manifest
+        self.cache_dir = None
+        self.max_bytes = 512 * 1024 * 1024
+        self.widths = DEFAULT_WIDTHS
+        self.workers = None
+        self.max_pending = 32
+        self._cache_bytes = None
+        self._inflight = {}  # cache key -> Future of the encode producing it
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._slots = None
+        self._pool = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app, manifest)
+
+    def init_app(self, app, manifest=None):
+        app.config.setdefault('IMAGE_CACHE_DIR', os.environ.get('IMAGE_CACHE_DIR', os.path.join(app.instance_path, 'images')))
+        app.config.setdefault('IMAGE_CACHE_MAX_BYTES', int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024)))
+        app.config.setdefault('IMAGE_WIDTHS', DEFAULT_WIDTHS)
+        app.config.setdefault('IMAGE_WORKERS', int(os.environ.get('IMAGE_WORKERS', 0)) or None)
+        app.config.setdefault('IMAGE_MAX_PENDING', int(os.environ.get('IMAGE_MAX_PENDING', 32)))
+        self.app = app
+        self.manifest = manifest or self.manifest
+        self.cache_dir = app.config['IMAGE_CACHE_DIR']
+        self.max_bytes = app.config['IMAGE_CACHE_MAX_BYTES']
+        self.widths = tuple(sorted(app.config['IMAGE_WIDTHS']))
+        self.workers = app.config['IMAGE_WORKERS']
+        self.max_pending = app.config['IMAGE_MAX_PENDING']
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['image_service'] = self
+
+    def available_formats(self):
+        if Image is None:
+            return ()
+        return tuple(fmt for fmt in FORMATS if fmt not in ('avif', 'webp') or features.check(fmt))
+
+    def sources(self):
+        """Static paths that derivatives can be made of"""
+        return sorted(path for path, entry in self.manifest.files.items() if entry['mimetype'] in SOURCE_TYPES)
+
+    def resolve(self, path, width=None, fmt=None, quality=None, accept=None):
+        """Validate a request and return (source entry, width, fmt, quality).
+
+        Widths round up to the next configured breakpoint so arbitrary
+        values cannot fill the cache; the format defaults to the best one
+        the Accept header allows.
+        """
+        if Image is None:
+            raise ImageError('Image processing is not available (install Pillow)', 501)
+        entry = self.manifest.lookup(path)
+        if entry is None or entry['mimetype'] not in SOURCE_TYPES:
+            raise ImageError('Image not found', 404)
+
+        if width is None:
+            width = self.widths[-1]
+        elif width < 1:
+            raise ImageError('w must be a positive integer')
+        width = next((breakpoint for breakpoint in self.widths if breakpoint >= width), self.widths[-1])
+
+        available = self.available_formats()
+        if fmt is None:
+            fmt = next((candidate for candidate in NEGOTIATED_FORMATS
+                        if candidate in available and accept and accept[FORMATS[candidate][1]]), 'jpeg')
+        elif fmt not in available:
+            raise ImageError(f'Unsupported fmt: {fmt}. Use one of: {", ".join(available)}')
+
+        default_quality = FORMATS[fmt][2]
+        if default_quality is None:
+            quality = None
+        elif quality is None:
+            quality = default_quality
+        elif not 1 <= quality <= 100:
+            raise ImageError('q must be between 1 and 100')
+        return entry, width, fmt, quality
+
+    @staticmethod
+    def cache_key(entry, width, fmt, quality):
+        return hashlib.sha256(f'{entry["hash"]}|{width}|{fmt}|{quality}'.encode()).hexdigest()[:32]
+
+    def cache_path(self, key, fmt):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.{fmt}')
+
+    def derivative(self, path, width, fmt, quality):
+        """Path of a cached derivative, encoding it first if needed"""
+        entry = self.manifest.lookup(path)
+        key = self.cache_key(entry, width, fmt, quality)
+        target = self.cache_path(key, fmt)
+        if os.path.exists(target):
+            return key, target
+
+        submitted = False
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                # Bounded so a burst of cold images queues a fixed amount of work at most
+                if not self._slots.acquire(blocking=False):
+                    raise ImageError('Too many images being processed, retry shortly', 503)
+                try:
+                    future = self._executor().submit(
+                        render_derivative, os.path.join(self.manifest.root, path), target, width, fmt, quality
+                    )
+                except BaseException:
+                    self._slots.release()
+                    raise
+                self._inflight[key] = future
+                submitted = True
+        if submitted:
+            # Outside the lock: the callback takes it, and runs right away if the encode already finished
+            future.add_done_callback(lambda done: self._finished(key, done))
+        try:
+            future.result()
+        except OSError as e:
+            # Pillow raises OSError subclasses for files it cannot decode
+            raise ImageError('Image could not be processed', 415) from e
+        return key, target
+
+    def _finished(self, key, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+        self._slots.release()
+        if not future.cancelled() and future.exception() is None:
+            self._account(future.result())
+
+    def send(self, path, width=None, fmt=None, quality=None, accept=None, version=None):
+        """Response for /img/<path>; immutable when ?v= matches the source's hash, like static files"""
+        entry, width, fmt, quality = self.resolve(path, width, fmt, quality, accept)
+        key, target = self.derivative(path, width, fmt, quality)
+        response = send_file(target, mimetype=FORMATS[fmt][1], etag=key, conditional=True, max_age=None)
+        response.vary.add('Accept')
+        if version == entry['hash']:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+    def warm(self, paths=None, widths=None, formats=None):
+        """Encode every missing derivative of the given sources.
+
+        Returns (encoded, already cached, {source path: error}) so one
+        unreadable file does not stop the batch.
+        """
+        paths = self.sources() if paths is None else paths
+        widths = widths or self.widths
+        formats = formats or [fmt for fmt in ('avif', 'webp', 'jpeg') if fmt in self.available_formats()]
+        jobs = {}
+        for path in paths:
+            entry = self.manifest.lookup(path)
+            for width in widths:
+                for fmt in formats:
+                    _, width, fmt, quality = self.resolve(path, width, fmt)
+                    target = self.cache_path(self.cache_key(entry, width, fmt, quality), fmt)
+                    jobs[target] = (path, width, fmt, quality)
+        missing = {target: job for target, job in jobs.items() if not os.path.exists(target)}
+        encoded = 0
+        failed = {}
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                pool.submit(render_derivative, os.path.join(self.manifest.root, path), target, width, fmt, quality): path
+                for target, (path, width, fmt, quality) in missing.items()
+            }
+            for future, path in futures.items():
+                try:
+                    self._account(future.result())
+                    encoded += 1
+                except OSError as e:
+                    failed[path] = str(e)
+        return encoded, len(jobs) - len(missing), failed
+
+    def _executor(self):
+        # Created lazily, and again after a fork, since pools do not survive forking workers
+        if self._pool is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _account(self, written):
+        with self._evict_lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = sum(size for _, size, _ in self._cached_files())
+            self._cache_bytes += written
+            over = self._cache_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _cached_files(self):
+        """(path, size, mtime) of every cached derivative"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        files = []
+        for directory, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                full_path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(full_path)
+                except FileNotFoundError:
+                    continue
+                files.append((full_path, stat.st_size, stat.st_mtime))
+        return files
+
+    def evict(self):
+        """Delete the oldest derivatives until the cache is under 90% of its limit; returns files removed"""
+        with self._evict_lock:
+            files = sorted(self._cached_files(), key=lambda item: item[2])
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            for full_path, size, _ in files:
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(full_path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._cache_bytes = total
+            return removed
+
+
+image_service = ImageService()
@@ -3,16 +3,39 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import click
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from src.models.user import db
 from src.models.blog_post import BlogPost
+from src.models.blog_stats import BlogStat, rebuild_stats
+from src.models.jobs import Job, job_queue
+from src.models.related import RelatedPost, build_related
+from src.models.rendered_content import RenderedContent, backfill_batch
+from src.models.search import create_search_index, rebuild_search_index
+from src.models.slugs import SlugHistory, slug_map
+from src.models.tags import Tag, migrate_tags
+from src.models.trending import TrendingPost, trending
+from src.models.view_counter import view_counter
+from src.models.view_history import PostViewBucket
+from src.utils.feeds import site_feeds
+from src.utils.fragment_cache import fragment_cache
+from src.utils.images import ImageError, image_service
+from src.utils.json_provider import FastJSONProvider
+from src.utils.metrics import request_metrics
+from src.utils.response_cache import response_cache
+from src.utils.sqlite_profile import sqlite_profile
+from src.utils.static_manifest import DEFAULT_PRECACHE, MANIFEST_FILENAME, SERVICE_WORKER, static_manifest
+from src.utils.tasks import queue_metrics, schedule_trending_refresh
 from src.routes.user import user_bp
 from src.routes.blog import blog_bp
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
+# orjson when installed, with pre-encoded fragments spliced into listings
+app.json = FastJSONProvider(app)
+
 # Enable CORS for all routes
 CORS(app)
 
@@ -20,11 +43,189 @@ app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(blog_bp, url_prefix='/api/blog')
 
 # uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pragmas and pool sizing; must be applied before the engine is created
+sqlite_profile.init_app(app)
 db.init_app(app)
+view_counter.init_app(app)
+trending.init_app(app)
+response_cache.init_app(app)
+request_metrics.init_app(app)
+fragment_cache.init_app(app)
+# Post pages are the static blog page, which loads a post by id
+app.config.setdefault('SITE_POST_PATH', '/blog.html?id={id}')
+app.config.setdefault('SITEMAP_PAGES', ('/', '/blog.html'))
+site_feeds.init_app(app)
+job_queue.init_app(app)
+request_metrics.add_collector(queue_metrics)
 with app.app_context():
     db.create_all()
+    # create_all skips new indexes on tables that already exist
+    for index in BlogPost.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+        # Slug lookups are answered from memory from the first request on
+        slug_map.warm(connection)
+        # Trending leaderboards are refreshed by job workers, rescheduling themselves from here on
+        schedule_trending_refresh(connection)
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Reindex all blog posts for full-text search"""
+    with db.engine.begin() as connection:
+        if not create_search_index(connection):
+            rebuild_search_index(connection)
+    print('Search index rebuilt!')
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Check the materialized blog stats against blog_posts and repair any drift"""
+    with db.engine.begin() as connection:
+        drift = rebuild_stats(connection)
+    for (dimension, key), (stored, actual) in sorted(drift.items()):
+        print(f'{dimension}/{key}: {stored} -> {actual}')
+    print(f'Blog stats rebuilt ({len(drift)} rows repaired)')
+
+@app.cli.command('rebuild-tags')
+def rebuild_tags_command():
+    """Relink post_tags from blog_posts.tags, rewriting any legacy tag formats as JSON lists"""
+    with db.engine.begin() as connection:
+        rewritten = migrate_tags(connection)
+    response_cache.invalidate('posts', 'tags')
+    print(f'Tag index rebuilt ({rewritten} posts had their tags rewritten)')
+
+@app.cli.command('rebuild-related')
+def rebuild_related_command():
+    """Recompute the term vectors and related posts of every published post"""
+    with db.engine.begin() as connection:
+        indexed = build_related(connection)
+    response_cache.invalidate('related')
+    print(f'Related posts rebuilt for {indexed} published posts')
+
+@app.cli.command('refresh-trending')
+def refresh_trending_command():
+    """Recompute the trending leaderboards now instead of waiting for the scheduled refresh"""
+    entries = trending.refresh()
+    print(f'Trending leaderboards refreshed with {entries} entries')
+
+@app.cli.command('run-worker')
+@click.option('--threads', default=2, help='Worker threads per process')
+@click.option('--processes', default=1, help='Worker processes (forked)')
+@click.option('--burst', is_flag=True, help='Exit once no job is runnable')
+def run_worker_command(threads, processes, burst):
+    """Run background jobs from the job queue"""
+    if processes > 1:
+        job_queue.work_processes(processes, threads, burst)
+    else:
+        job_queue.work(threads, burst)
+
+@app.cli.command('backfill-renders')
+@click.option('--batch-size', default=500, help='Posts read and written per transaction')
+@click.option('--force', is_flag=True, help='Re-render every post, e.g. after changing the sanitizer')
+def backfill_renders_command(batch_size, force):
+    """Render posts whose cached HTML is missing or out of date"""
+    total = 0
+    last_id = ''
+    while True:
+        with db.engine.begin() as connection:
+            last_id, rendered = backfill_batch(connection, last_id, batch_size, force)
+        if last_id is None:
+            break
+        total += rendered
+    response_cache.invalidate('posts')
+    print(f'Rendered {total} posts')
+
+@app.cli.command('import-posts')
+@click.argument('path', type=click.File('r', encoding='utf-8'))
+@click.option('--chunk-size', default=500, help='Posts inserted per transaction')
+def import_posts_command(path, chunk_size):
+    """Import blog posts from an NDJSON file (or '-' for stdin)"""
+    from src.models.bulk_import import import_posts
+    created = failed = 0
+    for result in import_posts(path, chunk_size=chunk_size):
+        if result['status'] == 'created':
+            created += 1
+        else:
+            failed += 1
+            click.echo(f"line {result['line']}: {result['error']}", err=True)
+    response_cache.invalidate('posts', 'categories', 'stats', 'tags', 'related')
+    print(f'Imported {created} posts ({failed} failed)')
+
+# Index the static tree once at startup so requests never stat the filesystem.
+# `flask build-static-manifest` precomputes it (and the compressed variants) at build time;
+# without it every process only hashes the tree, and never writes into it.
+if app.static_folder and os.path.isdir(app.static_folder):
+    manifest_path = os.path.join(app.static_folder, MANIFEST_FILENAME)
+    if os.path.exists(manifest_path):
+        static_manifest.load(manifest_path, root=app.static_folder)
+    else:
+        static_manifest.build(app.static_folder, compress=False)
+image_service.init_app(app, static_manifest)
+
+@app.cli.command('warm-images')
+@click.option('--widths', help='Comma-separated widths (default: IMAGE_WIDTHS)')
+@click.option('--formats', help='Comma-separated formats (default: avif, webp and jpeg where supported)')
+@click.argument('paths', nargs=-1)
+def warm_images_command(widths, formats, paths):
+    """Encode the derivatives of static images ahead of the first requests for them"""
+    try:
+        encoded, cached, failed = image_service.warm(
+            paths or None,
+            [int(width) for width in widths.split(',')] if widths else None,
+            formats.split(',') if formats else None
+        )
+    except ImageError as e:
+        raise click.ClickException(str(e))
+    for path, error in sorted(failed.items()):
+        click.echo(f'{path}: {error}', err=True)
+    print(f'Encoded {encoded} image derivatives ({cached} already cached, {len(failed)} sources failed)')
+
+@app.cli.command('build-static-manifest')
+def build_static_manifest_command():
+    """Hash and precompress the static tree and regenerate the service worker asset list"""
+    static_manifest.build(app.static_folder)
+    static_manifest.save(os.path.join(app.static_folder, MANIFEST_FILENAME))
+    if static_manifest.lookup(SERVICE_WORKER):
+        static_manifest.write_service_worker(os.path.join(app.static_folder, SERVICE_WORKER), DEFAULT_PRECACHE)
+        # Index the regenerated service worker too; the version is unaffected
+        static_manifest.build(app.static_folder)
+        static_manifest.save(os.path.join(app.static_folder, MANIFEST_FILENAME))
+    print(f'Static manifest built: {len(static_manifest.files)} files, version {static_manifest.version}')
+
+# Regenerated on disk only when the published set changes; revalidation costs one aggregate query
+@app.route('/sitemap.xml')
+def sitemap():
+    return site_feeds.sitemap_response()
+
+@app.route('/sitemap-<int:shard>.xml')
+def sitemap_shard(shard):
+    return site_feeds.sitemap_response(shard)
+
+@app.route('/feed.xml')
+def feed():
+    return site_feeds.feed_response()
+
+# Resized, re-encoded static images, e.g. /img/pmax/report.png?w=640&fmt=webp
+@app.route('/img/<path:path>')
+def image(path):
+    try:
+        return image_service.send(
+            path,
+            width=request.args.get('w', type=int),
+            fmt=request.args.get('fmt'),
+            quality=request.args.get('q', type=int),
+            accept=request.accept_mimetypes,
+            version=request.args.get('v')
+        )
+    except ImageError as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        if e.status == 503:
+            response.headers['Retry-After'] = '1'
+        return response, e.status
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -33,12 +234,11 @@ def serve(path):
     if static_folder_path is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
+    if path != "" and static_manifest.lookup(path):
+        return static_manifest.send(path)
     else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+        if static_manifest.lookup('index.html'):
+            return static_manifest.send('index.html')
         else:
             return "index.html not found", 404
 
@@ -0,0 +1,274 @@
+import bisect
+import os
+import threading
+import time
+from collections import Counter
+from flask import Response, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label tuple"""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{_format_labels(self.labels, labels, [("le", _format_number(bound))])} {cumulative}'
+                )
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, labels)} {_format_number(series[-1])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, labels)} {cumulative}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = Counter()
+
+    def inc(self, labels, amount=1):
+        self._values[labels] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labels, labels)} {value}')
+        return lines
+
+
+class Gauge:
+    """Current values, one series per label tuple; collectors build these fresh for each scrape"""
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+
+    def set(self, labels, value):
+        self._values[labels] = value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        for labels, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labels, labels)} {_format_number(value)}')
+        return lines
+
+
+class RequestStats:
+    """SQL activity of one request, filled in by the engine events"""
+
+    __slots__ = ('started', 'queries', 'query_time', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+
+    def repeated_statement(self):
+        """(statement, count) for the statement run most often, or None"""
+        if not self.statements:
+            return None
+        return self.statements.most_common(1)[0]
+
+
+class RequestMetrics:
+    """Per-endpoint latency, SQL query and response size metrics served at /metrics.
+
+    Statements are counted and timed through engine events while a request
+    is active. Requests that run the same statement METRICS_N_PLUS_ONE_THRESHOLD
+    times (the usual N+1 shape) or go over METRICS_QUERY_BUDGET queries or
+    METRICS_TIME_BUDGET_MS are logged, and with METRICS_DEBUG_HEADERS (on in
+    debug mode) the counts are also returned as X-Query-* headers. Metrics are
+    kept per process; streamed bodies are measured up to their first byte.
+    Collectors added with add_collector() are called on every scrape and
+    return metrics read from elsewhere (e.g. gauges over a database table).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.query_budget = 20
+        self.time_budget = 0.5
+        self.n_plus_one_threshold = 5
+        self.debug_headers = False
+        self._lock = threading.Lock()
+        self._collectors = []
+        self.requests = CounterMetric(
+            'http_requests_total', 'HTTP requests by endpoint and status.', ('method', 'endpoint', 'status')
+        )
+        self.duration = Histogram(
+            'http_request_duration_seconds', 'Time spent handling a request.', ('method', 'endpoint'), DURATION_BUCKETS
+        )
+        self.query_count = Histogram(
+            'http_request_sql_queries', 'SQL statements executed per request.', ('method', 'endpoint'), QUERY_COUNT_BUCKETS
+        )
+        self.query_time = Histogram(
+            'http_request_sql_duration_seconds', 'Time spent in SQL per request.', ('method', 'endpoint'), DURATION_BUCKETS
+        )
+        self.response_size = Histogram(
+            'http_response_size_bytes', 'Response body size.', ('method', 'endpoint'), SIZE_BUCKETS
+        )
+        self.flagged = CounterMetric(
+            'http_requests_flagged_total', 'Requests over budget or with repeated statements.', ('endpoint', 'reason')
+        )
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_QUERY_BUDGET', int(os.environ.get('METRICS_QUERY_BUDGET', 20)))
+        app.config.setdefault('METRICS_TIME_BUDGET_MS', float(os.environ.get('METRICS_TIME_BUDGET_MS', 500)))
+        app.config.setdefault('METRICS_N_PLUS_ONE_THRESHOLD', int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', 5)))
+        app.config.setdefault('METRICS_DEBUG_HEADERS', app.debug)
+        self.app = app
+        self.query_budget = app.config['METRICS_QUERY_BUDGET']
+        self.time_budget = app.config['METRICS_TIME_BUDGET_MS'] / 1000
+        self.n_plus_one_threshold = app.config['METRICS_N_PLUS_ONE_THRESHOLD']
+        self.debug_headers = app.config['METRICS_DEBUG_HEADERS']
+        app.extensions['request_metrics'] = self
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view, methods=['GET'])
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def _start_request(self):
+        g._request_stats = RequestStats()
+
+    def _finish_request(self, response):
+        stats = g.pop('_request_stats', None)
+        if stats is None or request.endpoint == 'metrics':
+            return response
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = (request.method, endpoint)
+        size = None if response.is_streamed else response.calculate_content_length()
+
+        problems = self._problems(stats, elapsed)
+        self.observe(labels, response.status_code, elapsed, size, stats, problems)
+
+        if problems:
+            self.app.logger.warning(
+                '%s %s: %s', request.method, request.full_path.rstrip('?'), '; '.join(detail for _, detail in problems)
+            )
+        if self.debug_headers:
+            response.headers['X-Query-Count'] = str(stats.queries)
+            response.headers['X-Query-Time-Ms'] = f'{stats.query_time * 1000:.1f}'
+            response.headers['X-Response-Time-Ms'] = f'{elapsed * 1000:.1f}'
+            if problems:
+                response.headers['X-Query-Warning'] = '; '.join(reason for reason, _ in problems)
+        return response
+
+    def observe(self, labels, status, elapsed, size=None, stats=None, problems=()):
+        """Record one finished request; `labels` is (method, endpoint)"""
+        with self._lock:
+            self.requests.inc(labels + (str(status),))
+            self.duration.observe(labels, elapsed)
+            if stats is not None:
+                self.query_count.observe(labels, stats.queries)
+                self.query_time.observe(labels, stats.query_time)
+            if size is not None:
+                self.response_size.observe(labels, size)
+            for reason, _ in problems:
+                self.flagged.inc((labels[1], reason))
+
+    def _problems(self, stats, elapsed):
+        """(reason, detail) pairs for everything worth flagging about a request"""
+        problems = []
+        repeated = stats.repeated_statement()
+        if repeated and repeated[1] >= self.n_plus_one_threshold:
+            statement, count = repeated
+            problems.append(('n_plus_one', f'statement ran {count} times (possible N+1): {" ".join(statement.split())[:120]}'))
+        if stats.queries > self.query_budget:
+            problems.append(('query_budget', f'{stats.queries} queries (budget {self.query_budget})'))
+        if elapsed > self.time_budget:
+            problems.append(('time_budget', f'{elapsed * 1000:.0f}ms (budget {self.time_budget * 1000:.0f}ms)'))
+        return problems
+
+    def add_collector(self, collector):
+        """Register a callable returning metrics (objects with render()) to include in every scrape"""
+        self._collectors.append(collector)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.query_count, self.query_time,
+                           self.response_size, self.flagged):
+                lines.extend(metric.render())
+        # Outside the lock: collectors may query the database
+        for collector in self._collectors:
+            for metric in collector():
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render(), content_type=CONTENT_TYPE)
+
+
+def _current_stats():
+    # Only statements run on behalf of a request are counted; background flushes have no stats
+    return g.get('_request_stats') if has_app_context() else None
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        connection.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    started = connection.info.get('_query_started')
+    if stats is None or not started:
+        return
+    stats.queries += 1
+    stats.query_time += time.perf_counter() - started.pop()
+    stats.statements[statement] += 1
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,374 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from operator import itemgetter
+import numpy as np
+from scipy import sparse
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from src.models.blog_post import BlogPost, db
+from src.models.jobs import job_queue
+from src.models.tags import parse_tags
+
+# Neighbours stored (and returned) per post
+TOP_K = 5
+
+# Highest-weighted terms kept in each post's vector; the long tail barely moves cosine scores
+MAX_TERMS = 64
+
+# Relatedness = TEXT_WEIGHT * TF-IDF cosine + TAG_WEIGHT * tag cosine + CATEGORY_WEIGHT if same category
+TEXT_WEIGHT = 0.6
+TAG_WEIGHT = 0.3
+CATEGORY_WEIGHT = 0.1
+
+# Bulk changes to more posts than this rebuild the index instead of updating post by post
+FULL_BUILD_THRESHOLD = 100
+
+# Scores held in memory at once during a full build (8 bytes each)
+BLOCK_CELLS = 4_000_000
+
+# Term counts are weighted by where the term appears
+FIELD_WEIGHTS = (('title', 3), ('excerpt', 2), ('content', 1))
+
+# Fields of each related post returned with include=related; all plain columns,
+# so the list comes from one join without touching the render cache
+RELATED_FIELDS = ('id', 'title', 'slug', 'category', 'featured_image', 'published_at', 'updated_at', 'reading_time')
+
+STOPWORDS = frozenset('''
+    about above after again against all also and any are because been before being below between both but can
+    could did does doing down during each few for from further had has have having her here hers herself him
+    himself his how into its itself just more most myself nor not now off once only other our ours ourselves
+    out over own same she should some such than that the their theirs them themselves then there these they
+    this those through too under until very was were what when where which while who whom why will with would
+    you your yours yourself yourselves
+'''.split())
+
+_MARKUP = re.compile(r'<[^>]*>|https?://\S+')
+_WORD = re.compile(r'[^\W\d_]{3,40}')
+
+
+class RelatedPost(db.Model):
+    """One of a post's TOP_K most related published posts"""
+    __tablename__ = 'related_posts'
+
+    post_id = db.Column(db.String(36), db.ForeignKey('blog_posts.id'), primary_key=True)
+    related_id = db.Column(db.String(36), db.ForeignKey('blog_posts.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+
+# The sparse post x term matrix: each published post's pruned, weighted vector
+related_terms = db.Table(
+    'related_terms',
+    db.Column('post_id', db.String(36), db.ForeignKey('blog_posts.id'), primary_key=True),
+    db.Column('term', db.String(64), primary_key=True),
+    db.Column('weight', db.Float, nullable=False),
+    # Covering index for the postings of a term, used to score one post against all others
+    db.Index('ix_related_terms_term', 'term', 'post_id', 'weight'),
+)
+
+# Inverse document frequencies from the last full build
+related_vocabulary = db.Table(
+    'related_vocabulary',
+    db.Column('term', db.String(64), primary_key=True),
+    db.Column('idf', db.Float, nullable=False),
+)
+
+
+def term_counts(title, excerpt, content):
+    """Weighted counts of the lowercase words (three letters or more) of a post, minus stopwords"""
+    counts = Counter()
+    for text, (_, weight) in zip((title, excerpt, content), FIELD_WEIGHTS):
+        words = Counter(_WORD.findall(_MARKUP.sub(' ', text or '').lower()))
+        for word, count in words.items():
+            counts[word] += count * weight
+    for word in STOPWORDS.intersection(counts):
+        del counts[word]
+    return counts
+
+
+def post_vector(counts, idf, tags, default_idf=1.0):
+    """Sparse vector {feature: weight} of a post, with unit-length text and tag parts.
+
+    The parts are scaled so the dot product of two vectors is the text and
+    tag part of their relatedness score. Tags are '#'-prefixed features,
+    which words never are.
+    """
+    weights = {term: (1 + math.log(count)) * idf.get(term, default_idf) for term, count in counts.items()}
+    top = heapq.nlargest(MAX_TERMS, weights.items(), key=itemgetter(1))
+    norm = math.sqrt(sum(weight * weight for _, weight in top))
+    vector = {term: math.sqrt(TEXT_WEIGHT) * weight / norm for term, weight in top} if norm else {}
+    if tags:
+        vector.update(dict.fromkeys((f'#{tag.lower()}'[:64] for tag in tags), math.sqrt(TAG_WEIGHT / len(tags))))
+    return vector
+
+
+def top_neighbours(scores):
+    """The TOP_K best (post id, score) pairs, best first"""
+    return heapq.nlargest(TOP_K, scores.items(), key=itemgetter(1))
+
+
+def _published_rows(connection, batch_size):
+    posts = BlogPost.__table__
+    last_id = ''
+    while True:
+        batch = connection.execute(
+            db.select(posts.c.id, posts.c.title, posts.c.excerpt, posts.c.content, posts.c.tags, posts.c.category)
+            .where(posts.c.status == 'published', posts.c.id > last_id)
+            .order_by(posts.c.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return
+        last_id = batch[-1].id
+        yield from batch
+
+
+def _vector_rows(post_id, vector):
+    return [{'post_id': post_id, 'term': term, 'weight': weight} for term, weight in vector.items()]
+
+
+def _neighbour_rows(post_id, neighbours):
+    return [{'post_id': post_id, 'related_id': related_id, 'score': score} for related_id, score in neighbours]
+
+
+def _store_neighbours(connection, post_id, neighbours):
+    connection.execute(RelatedPost.__table__.delete().where(RelatedPost.post_id == post_id))
+    if neighbours:
+        connection.execute(RelatedPost.__table__.insert(), _neighbour_rows(post_id, neighbours))
+
+
+def _feature_matrix(vectors):
+    """CSR matrix of the post vectors, one row per post in iteration order"""
+    features = {}
+    indptr, indices, data = [0], [], []
+    for vector in vectors:
+        for feature, weight in vector.items():
+            indices.append(features.setdefault(feature, len(features)))
+            data.append(weight)
+        indptr.append(len(indices))
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, len(features)))
+
+
+def _top_neighbour_rows(ids, matrix, categories):
+    """Neighbour rows of every post, scored a block of rows of A.A^T at a time"""
+    count = len(ids)
+    k = min(TOP_K, count - 1)
+    if k <= 0:
+        return []
+    codes = {}
+    category_codes = np.array([codes.setdefault(category, len(codes)) if category else -1 for category in categories])
+    transposed = matrix.T.tocsc()
+    rows = []
+    # Dense blocks of about BLOCK_CELLS scores keep memory flat as the blog grows
+    block_size = max(1, BLOCK_CELLS // count)
+    for start in range(0, count, block_size):
+        scores = (matrix[start:start + block_size] @ transposed).toarray()
+        block_codes = category_codes[start:start + block_size, None]
+        # The category bonus only applies to posts that already share a word or tag
+        scores += CATEGORY_WEIGHT * ((block_codes == category_codes) & (block_codes >= 0) & (scores > 0))
+        positions = np.arange(scores.shape[0])
+        scores[positions, positions + start] = 0
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for position, columns in enumerate(top):
+            row_scores = scores[position]
+            for column in columns[np.argsort(-row_scores[columns])]:
+                if row_scores[column] > 0:
+                    rows.append({'post_id': ids[start + position], 'related_id': ids[column], 'score': float(row_scores[column])})
+    return rows
+
+
+def build_related(connection, batch_size=500):
+    """Rebuild the vocabulary, vectors and neighbour lists of every published post.
+
+    Every pair is scored at once as the sparse product A.A^T of the post x
+    feature matrix, so the cost follows the pairs that share a feature
+    rather than all pairs. Returns the number of posts indexed.
+    """
+    counts, tags, categories = {}, {}, {}
+    document_frequency = Counter()
+    for row in _published_rows(connection, batch_size):
+        counts[row.id] = term_counts(row.title, row.excerpt, row.content)
+        document_frequency.update(counts[row.id].keys())
+        tags[row.id] = parse_tags(row.tags)
+        categories[row.id] = row.category
+
+    # Smoothed idf, as if one extra post contained every term
+    idf = {term: math.log((1 + len(counts)) / (1 + df)) + 1 for term, df in document_frequency.items()}
+    vectors = {post_id: post_vector(terms, idf, tags[post_id]) for post_id, terms in counts.items()}
+    ids = list(vectors)
+    neighbour_rows = _top_neighbour_rows(ids, _feature_matrix(vectors.values()), [categories[post_id] for post_id in ids])
+
+    connection.execute(RelatedPost.__table__.delete())
+    connection.execute(related_terms.delete())
+    connection.execute(related_vocabulary.delete())
+    vocabulary_rows = [{'term': term, 'idf': value} for term, value in idf.items()]
+    vector_rows = [row for post_id, vector in vectors.items() for row in _vector_rows(post_id, vector)]
+    for table, rows in ((related_vocabulary, vocabulary_rows), (related_terms, vector_rows),
+                        (RelatedPost.__table__, neighbour_rows)):
+        if rows:
+            connection.execute(table.insert(), rows)
+    return len(vectors)
+
+
+def _vocabulary_idf(connection, terms):
+    """({term: idf} for the known terms, idf for unknown ones: as rare as the rarest known term)"""
+    idf = dict(connection.execute(
+        db.select(related_vocabulary.c.term, related_vocabulary.c.idf).where(related_vocabulary.c.term.in_(terms))
+    ).all())
+    default = connection.execute(db.select(db.func.max(related_vocabulary.c.idf))).scalar()
+    return idf, default or 1.0
+
+
+def similarities(connection, post_id, vector, category):
+    """{post id: relatedness} between a post and every published post sharing a feature with it"""
+    scores = defaultdict(float)
+    if vector:
+        rows = connection.execute(
+            db.select(related_terms.c.post_id, related_terms.c.term, related_terms.c.weight)
+            .where(related_terms.c.term.in_(list(vector)), related_terms.c.post_id != post_id)
+        )
+        for other_id, feature, weight in rows:
+            scores[other_id] += vector[feature] * weight
+    if category and scores:
+        posts = BlogPost.__table__
+        for other_id in connection.execute(
+            db.select(posts.c.id).where(posts.c.id.in_(list(scores)), posts.c.category == category)
+        ).scalars():
+            scores[other_id] += CATEGORY_WEIGHT
+    return scores
+
+
+def _refill(connection, post_id):
+    """Recompute one post's neighbours from its stored vector"""
+    vector = dict(connection.execute(
+        db.select(related_terms.c.term, related_terms.c.weight).where(related_terms.c.post_id == post_id)
+    ).all())
+    category = connection.execute(
+        db.select(BlogPost.__table__.c.category).where(BlogPost.__table__.c.id == post_id)
+    ).scalar()
+    _store_neighbours(connection, post_id, top_neighbours(similarities(connection, post_id, vector, category)))
+
+
+def update_related(connection, post_ids):
+    """Re-index the given posts after they changed and repair the lists they appear in.
+
+    Only the changed posts are re-vectorized (with the vocabulary of the last
+    full build) and scored against the stored vectors. Other posts are only
+    touched when the changed post enters, leaves or moves within their top
+    TOP_K; a full recompute of one of those is needed only when it drops out
+    of a full list, since a post outside the list may now outrank it.
+    Returns the ids of the posts whose lists were rewritten.
+    """
+    posts = BlogPost.__table__
+    related = RelatedPost.__table__
+    rewritten = set()
+    for post_id in post_ids:
+        row = connection.execute(
+            db.select(posts.c.status, posts.c.title, posts.c.excerpt, posts.c.content, posts.c.tags, posts.c.category)
+            .where(posts.c.id == post_id)
+        ).first()
+        connection.execute(related_terms.delete().where(related_terms.c.post_id == post_id))
+        scores = {}
+        if row is not None and row.status == 'published':
+            counts = term_counts(row.title, row.excerpt, row.content)
+            idf, default_idf = _vocabulary_idf(connection, list(counts))
+            vector = post_vector(counts, idf, parse_tags(row.tags), default_idf)
+            if vector:
+                connection.execute(related_terms.insert(), _vector_rows(post_id, vector))
+            scores = similarities(connection, post_id, vector, row.category)
+        _store_neighbours(connection, post_id, top_neighbours(scores))
+        rewritten.add(post_id)
+
+        # Scores are symmetric, so scores[other] is also this post's score in other's list
+        listed_by = set(connection.execute(db.select(related.c.post_id).where(related.c.related_id == post_id)).scalars())
+        affected = listed_by | set(scores)
+        if not affected:
+            continue
+        current = defaultdict(dict)
+        for source_id, related_id, score in connection.execute(
+            db.select(related.c.post_id, related.c.related_id, related.c.score).where(related.c.post_id.in_(list(affected)))
+        ):
+            current[source_id][related_id] = score
+        for source_id in affected:
+            neighbours = dict(current[source_id])
+            old = neighbours.pop(post_id, None)
+            new = scores.get(source_id)
+            if old is not None and len(current[source_id]) >= TOP_K and (new is None or new < old):
+                _refill(connection, source_id)
+                rewritten.add(source_id)
+                continue
+            if new is not None:
+                neighbours[post_id] = new
+            top = top_neighbours(neighbours)
+            if dict(top) != current[source_id]:
+                _store_neighbours(connection, source_id, top)
+                rewritten.add(source_id)
+    return rewritten
+
+
+def refresh_related(connection, post_ids):
+    """Update the index after posts were added in bulk: incrementally for a few, rebuilt for many.
+
+    Returns the ids of the posts whose related lists may have changed.
+    """
+    post_ids = list(post_ids)
+    if len(post_ids) > FULL_BUILD_THRESHOLD:
+        listed = db.select(RelatedPost.post_id).distinct()
+        before = set(connection.execute(listed).scalars())
+        build_related(connection)
+        return before | set(connection.execute(listed).scalars()) | set(post_ids)
+    return update_related(connection, post_ids)
+
+
+def related_posts_query(post_id, limit=TOP_K):
+    """Select a post's related published posts, most related first, in one indexed join"""
+    return (
+        db.select(BlogPost)
+        .join(RelatedPost, RelatedPost.related_id == BlogPost.id)
+        .where(RelatedPost.post_id == post_id, BlogPost.status == 'published')
+        .order_by(RelatedPost.score.desc())
+        .options(BlogPost.load_fields(RELATED_FIELDS))
+        .limit(limit)
+    )
+
+
+# Columns whose changes can move a post's neighbourhood
+INDEXED_ATTRIBUTES = ('title', 'excerpt', 'content', 'tags', 'category', 'status')
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_related_changes(session, flush_context, instances):
+    changed = session.info.setdefault('related_changes', set())
+    for post in session.new:
+        if isinstance(post, BlogPost):
+            changed.add(post)
+    for post in session.dirty:
+        if isinstance(post, BlogPost):
+            attrs = inspect(post).attrs
+            if any(attrs[name].history.has_changes() for name in INDEXED_ATTRIBUTES):
+                changed.add(post)
+    for post in session.deleted:
+        if isinstance(post, BlogPost):
+            changed.add(post)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_related_changes(session, flush_context):
+    changed = session.info.pop('related_changes', None)
+    # Queued in the write's transaction and applied by a job worker, so writes
+    # do not wait on scoring; a post edited again before its job runs is updated once
+    for post_id in sorted(post.id for post in changed or ()):
+        job_queue.enqueue(session.connection(), 'related.update', {'post_ids': [post_id]}, key=f'related:{post_id}')
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_related_changes(session, previous_transaction):
+    session.info.pop('related_changes', None)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _build_related(target, connection, tables=(), **kwargs):
+    # Runs once all tables exist; databases that predate the index get it built from their posts
+    if RelatedPost.__table__ in tables and inspect(connection).has_table(BlogPost.__tablename__):
+        build_related(connection)
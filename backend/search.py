@@ -0,0 +1,142 @@
+import re
+from sqlalchemy import event, text
+from src.models.blog_post import BlogPost, db
+
+# External-content FTS5 index over blog_posts; the text lives only in blog_posts
+# and the triggers below keep the index in step with every insert/update/delete
+FTS_TABLE = 'blog_posts_fts'
+FTS_COLUMNS = ('title', 'excerpt', 'content', 'tags')
+
+# bm25 column weights, in FTS_COLUMNS order: a title hit outranks a body hit
+RANK_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+
+# Snippet match delimiters; control characters, so they survive escaping and cannot come from markup
+MARK_START, MARK_END = '\x02', '\x03'
+
+# Replacements that make text safe to insert as HTML, '&' first
+HTML_ESCAPES = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;'))
+
+fts = db.table(FTS_TABLE, db.column(FTS_TABLE), db.column('rowid'))
+
+_columns = ', '.join(FTS_COLUMNS)
+_new_values = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+_old_values = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+
+SEARCH_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_columns}, content='blog_posts', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS blog_posts_fts_ai AFTER INSERT ON blog_posts BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.rowid, {_new_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS blog_posts_fts_ad AFTER DELETE ON blog_posts BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.rowid, {_old_values});
+    END""",
+    # Only reindex when an indexed column changes, so view counts stay cheap
+    f"""CREATE TRIGGER IF NOT EXISTS blog_posts_fts_au AFTER UPDATE OF {_columns} ON blog_posts BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.rowid, {_old_values});
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.rowid, {_new_values});
+    END""",
+)
+
+_index_ready = False
+
+
+def create_search_index(connection):
+    """Create the FTS table and sync triggers if missing, backfilling a new index.
+
+    Returns True when the index was created by this call.
+    """
+    if connection.dialect.name != 'sqlite':
+        return False
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first()
+    for statement in SEARCH_DDL:
+        connection.execute(text(statement))
+    if not exists:
+        rebuild_search_index(connection)
+    return not exists
+
+
+def rebuild_search_index(connection):
+    """Reindex every post from blog_posts and merge the index b-trees"""
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def search_index_ready():
+    """Check whether the FTS index exists in the current database"""
+    global _index_ready
+    if not _index_ready and db.engine.dialect.name == 'sqlite':
+        _index_ready = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE}
+        ).first() is not None
+    return _index_ready
+
+
+def build_match_query(search):
+    """Turn free-form user input into a safe FTS5 query.
+
+    Every word must match, and the last one is treated as a prefix so
+    results keep up while someone is still typing.
+    """
+    terms = re.findall(r'\w+', search.lower())
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def highlighted_snippet(column):
+    """SQL for an HTML-safe snippet of the best matching column.
+
+    Post bodies may hold raw HTML, so the text is escaped and only the
+    <mark> tags around matches are markup.
+    """
+    snippet = db.func.snippet(column, -1, MARK_START, MARK_END, '…', 16)
+    for character, entity in HTML_ESCAPES:
+        snippet = db.func.replace(snippet, character, entity)
+    return db.func.replace(db.func.replace(snippet, MARK_START, '<mark>'), MARK_END, '</mark>')
+
+
+def apply_search(query, search):
+    """Restrict a BlogPost query to full-text matches, best BM25 rank first.
+
+    The query yields (post, snippet) rows. Falls back to LIKE scans when the
+    index is unavailable, in which case the snippet is None.
+    """
+    match = build_match_query(search)
+    if match is None:
+        return query.add_columns(db.null())
+
+    if not search_index_ready():
+        return query.filter(
+            db.or_(
+                BlogPost.title.contains(search),
+                BlogPost.content.contains(search),
+                BlogPost.excerpt.contains(search)
+            )
+        ).add_columns(db.null())
+
+    rank = db.func.bm25(fts.c[FTS_TABLE], *RANK_WEIGHTS)
+    return query.join(fts, fts.c.rowid == db.literal_column('blog_posts.rowid')) \
+        .filter(fts.c[FTS_TABLE].op('MATCH')(match)) \
+        .add_columns(highlighted_snippet(fts.c[FTS_TABLE])) \
+        .order_by(rank)
+
+
+@event.listens_for(BlogPost.__table__, 'after_create')
+def _create_search_index(target, connection, **kwargs):
+    create_search_index(connection)
+
+
+@event.listens_for(BlogPost.__table__, 'before_drop')
+def _drop_search_index(target, connection, **kwargs):
+    global _index_ready
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f'DROP TABLE IF EXISTS {FTS_TABLE}'))
+    _index_ready = False
@@ -0,0 +1,151 @@
+import threading
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from src.models.blog_post import BlogPost, db
+
+
+class SlugHistory(db.Model):
+    """Slugs a post has been published under before, kept so old links can redirect"""
+    __tablename__ = 'blog_post_slugs'
+
+    slug = db.Column(db.String(250), primary_key=True)
+    post_id = db.Column(db.String(36), db.ForeignKey('blog_posts.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SlugMap:
+    """In-process slug -> post id map covering current and retired slugs.
+
+    Warmed once at startup and updated when writes commit, so resolving a
+    slug is a dict hit followed by a primary key fetch. Writes made by other
+    workers are not seen here: resolve falls back to indexed lookups for
+    unknown slugs, and callers correct stale entries with set_current/retire.
+    """
+
+    def __init__(self):
+        self._current = {}
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def warm(self, connection):
+        current = dict(connection.execute(db.select(BlogPost.slug, BlogPost.id)).all())
+        retired = dict(connection.execute(db.select(SlugHistory.slug, SlugHistory.post_id)).all())
+        with self._lock:
+            self._current, self._retired = current, retired
+
+    def lookup(self, slug):
+        """Return (post_id, retired) from the map alone, or (None, False)"""
+        with self._lock:
+            if slug in self._current:
+                return self._current[slug], False
+            if slug in self._retired:
+                return self._retired[slug], True
+        return None, False
+
+    def resolve(self, slug):
+        """Like lookup, but falls back to the database for slugs the map has not seen"""
+        post_id, retired = self.lookup(slug)
+        if post_id is not None:
+            return post_id, retired
+
+        post_id = db.session.execute(db.select(BlogPost.id).where(BlogPost.slug == slug)).scalar()
+        if post_id is not None:
+            self.set_current(slug, post_id)
+            return post_id, False
+        post_id = db.session.execute(db.select(SlugHistory.post_id).where(SlugHistory.slug == slug)).scalar()
+        if post_id is not None:
+            self.retire(slug, post_id)
+            return post_id, True
+        return None, False
+
+    def is_taken(self, slug, post_id=None):
+        """Whether the slug, current or retired, belongs to a post other than post_id"""
+        owner, _ = self.resolve(slug)
+        return owner is not None and owner != post_id
+
+    def unique_slug(self, slug, post_id=None):
+        """The slug itself, or the first free slug-2, slug-3, ... variant"""
+        candidate = slug
+        suffix = 1
+        while self.is_taken(candidate, post_id):
+            suffix += 1
+            candidate = f'{slug}-{suffix}'
+        return candidate
+
+    def set_current(self, slug, post_id):
+        with self._lock:
+            self._current[slug] = post_id
+            self._retired.pop(slug, None)
+
+    def retire(self, slug, post_id):
+        with self._lock:
+            if self._current.get(slug) == post_id:
+                del self._current[slug]
+            self._retired[slug] = post_id
+
+    def forget(self, post_id):
+        """Drop every slug of a deleted post"""
+        with self._lock:
+            for slugs in (self._current, self._retired):
+                for slug in [slug for slug, owner in slugs.items() if owner == post_id]:
+                    del slugs[slug]
+
+    def __len__(self):
+        return len(self._current) + len(self._retired)
+
+
+slug_map = SlugMap()
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_slug_history(session, flush_context, instances):
+    changes = session.info.setdefault('slug_changes', [])
+    with session.no_autoflush:
+        for post in session.new:
+            if isinstance(post, BlogPost):
+                changes.append(('new', post, post.slug))
+        for post in session.dirty:
+            if not isinstance(post, BlogPost):
+                continue
+            history = inspect(post).attrs.slug.history
+            if not history.deleted or history.deleted[0] == post.slug:
+                continue
+            old_slug = history.deleted[0]
+            session.merge(SlugHistory(slug=old_slug, post_id=post.id))
+            # Taking back one of its own old slugs makes it current again
+            reclaimed = session.get(SlugHistory, post.slug)
+            if reclaimed is not None and reclaimed.post_id == post.id:
+                session.delete(reclaimed)
+            changes.append(('renamed', post, post.slug))
+            changes.append(('retired', post, old_slug))
+        for post in session.deleted:
+            if isinstance(post, BlogPost):
+                for retired in session.scalars(db.select(SlugHistory).where(SlugHistory.post_id == post.id)):
+                    session.delete(retired)
+                changes.append(('deleted', post, None))
+
+
+@event.listens_for(Session, 'after_flush')
+def _resolve_slug_changes(session, flush_context):
+    # Ids of new posts only exist once they are flushed; read them before commit expires them
+    pending = session.info.setdefault('slug_map_changes', [])
+    for change, post, slug in session.info.pop('slug_changes', []):
+        pending.append((change, post.id, slug))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_slug_changes(session):
+    for change, post_id, slug in session.info.pop('slug_map_changes', []):
+        if change == 'deleted':
+            slug_map.forget(post_id)
+        elif change == 'retired':
+            slug_map.retire(slug, post_id)
+        else:
+            slug_map.set_current(slug, post_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_slug_changes(session, previous_transaction):
+    session.info.pop('slug_changes', None)
+    session.info.pop('slug_map_changes', None)
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+from flask import has_request_context, request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+from src.models.user import db
+
+# Pragmas applied to every new connection. journal_mode is persistent, the rest are per connection.
+PROFILES = {
+    # SQLite's own defaults: rollback journal, synchronous=FULL, no busy timeout
+    'default': {},
+    # WAL lets readers run alongside the single writer; NORMAL is durable in WAL
+    # mode except across power loss, and the busy timeout absorbs writer contention
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,
+        'cache_size': -65536,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    },
+}
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def is_memory_database(uri):
+    """Whether a database URL points at an in-memory SQLite database"""
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite':
+        return False
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+
+def parse_pragmas(value):
+    """Parse 'name=value;name=value' overrides, e.g. from SQLITE_PRAGMAS"""
+    pragmas = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(';'))):
+        name, _, setting = item.partition('=')
+        pragmas[name.strip()] = setting.strip()
+    return pragmas
+
+
+class SQLiteProfile:
+    """Connection pragmas, pool sizing and an optional read-only pool for SQLite.
+
+    init_app has to run before db.init_app, since the pool options are read
+    when Flask-SQLAlchemy creates the engine. With SQLITE_READ_POOL_SIZE set,
+    ORM selects issued while handling GET/HEAD requests go to a separate pool
+    of query_only connections, leaving the main pool to writers. In-memory
+    databases keep SQLAlchemy's single shared connection (StaticPool), so
+    neither pool sizing nor the read pool applies to them.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.pragmas = {}
+        self.read_pool_size = 0
+        self._read_engine = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLITE_PROFILE', os.environ.get('SQLITE_PROFILE', 'production'))
+        app.config.setdefault('SQLITE_PRAGMAS', os.environ.get('SQLITE_PRAGMAS'))
+        app.config.setdefault('SQLITE_POOL_SIZE', int(os.environ.get('SQLITE_POOL_SIZE', 5)))
+        app.config.setdefault('SQLITE_MAX_OVERFLOW', int(os.environ.get('SQLITE_MAX_OVERFLOW', 10)))
+        app.config.setdefault('SQLITE_POOL_RECYCLE', int(os.environ.get('SQLITE_POOL_RECYCLE', 3600)))
+        app.config.setdefault('SQLITE_READ_POOL_SIZE', int(os.environ.get('SQLITE_READ_POOL_SIZE', 0)))
+        if app.config['SQLITE_PROFILE'] not in PROFILES:
+            raise ValueError(f"Unknown SQLITE_PROFILE: {app.config['SQLITE_PROFILE']}")
+
+        self.app = app
+        self.pragmas = dict(PROFILES[app.config['SQLITE_PROFILE']])
+        self.pragmas.update(parse_pragmas(app.config['SQLITE_PRAGMAS']))
+        self.read_pool_size = app.config['SQLITE_READ_POOL_SIZE']
+
+        if is_memory_database(app.config.get('SQLALCHEMY_DATABASE_URI', 'sqlite://')):
+            self.read_pool_size = 0
+        else:
+            options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+            options.setdefault('pool_size', app.config['SQLITE_POOL_SIZE'])
+            options.setdefault('max_overflow', app.config['SQLITE_MAX_OVERFLOW'])
+            options.setdefault('pool_recycle', app.config['SQLITE_POOL_RECYCLE'])
+            options.setdefault('pool_pre_ping', True)
+
+        if not event.contains(Engine, 'connect', self._apply_pragmas):
+            event.listen(Engine, 'connect', self._apply_pragmas)
+        if not event.contains(Session, 'do_orm_execute', self._route_reads):
+            event.listen(Session, 'do_orm_execute', self._route_reads)
+        # Pooled connections must not be shared with forked workers
+        os.register_at_fork(after_in_child=self._after_fork)
+        app.extensions['sqlite_profile'] = self
+
+    def _apply_pragmas(self, dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in self.pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    @property
+    def read_engine(self):
+        """Engine for the read-only pool, created on first use; None when disabled"""
+        if self.read_pool_size <= 0:
+            return None
+        with self._lock:
+            if self._read_engine is None:
+                with self.app.app_context():
+                    url = db.engine.url
+                engine = create_engine(
+                    url,
+                    pool_size=self.read_pool_size,
+                    max_overflow=0,
+                    pool_recycle=self.app.config['SQLITE_POOL_RECYCLE'],
+                    pool_pre_ping=True
+                )
+                event.listen(engine, 'connect', _make_query_only)
+                self._read_engine = engine
+        return self._read_engine
+
+    def _route_reads(self, orm_execute_state):
+        if not (orm_execute_state.is_select and has_request_context() and request.method in READ_METHODS):
+            return
+        session = orm_execute_state.session
+        # Stay on the writer when the statement has to see this session's own changes
+        if 'bind' in orm_execute_state.bind_arguments or session.new or session.dirty or session.deleted:
+            return
+        engine = self.read_engine
+        if engine is not None:
+            orm_execute_state.bind_arguments['bind'] = engine
+
+    def _after_fork(self):
+        if self.app is None:
+            return
+        with self.app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+        if self._read_engine is not None:
+            self._read_engine.dispose(close=False)
+
+
+def _make_query_only(dbapi_connection, connection_record):
+    dbapi_connection.execute('PRAGMA query_only=ON')
+
+
+sqlite_profile = SQLiteProfile()
@@ -0,0 +1,281 @@
+import fnmatch
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from flask import Response, request, send_file
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always produced
+    brotli = None
+
+# Types worth precompressing; images and fonts are already compressed
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/javascript', 'application/json', 'application/xml',
+    'image/svg+xml', 'application/manifest+json'
+)
+COMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+MIN_COMPRESS_SIZE = 1024
+
+# A year, the longest max-age caches honour
+IMMUTABLE_MAX_AGE = 31536000
+
+MANIFEST_FILENAME = 'static-manifest.json'
+
+# Left out of the manifest version, since the version is written into it
+SERVICE_WORKER = 'js/sw.js'
+
+# Service worker precache groups, as glob patterns relative to the static root
+DEFAULT_PRECACHE = {
+    'core': ['index.html', 'offline.html', 'assets/css/styles.css', 'assets/js/blog-display.js'],
+    'images': ['assets/images/blog/*']
+}
+
+SW_BLOCK = re.compile(r'(// <static-manifest>\n).*?(// </static-manifest>)', re.S)
+
+# src/href attributes in HTML pages; references with a query or fragment are left alone
+ASSET_REFERENCE = re.compile(r'''(\s(?:src|href)=)(["'])([^"'?#:]+)\2''')
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def compress_bytes(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def write_atomic(path, data):
+    """Write next to the target and rename, so concurrent readers never see a partial file"""
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(data)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    os.replace(temporary, path)
+
+
+class StaticManifest:
+    """In-memory index of the static tree with content hashes.
+
+    Lookups are dict hits instead of stat calls, responses are served from
+    precompressed siblings when the client accepts them, and URLs carrying
+    the current hash (?v=<hash>) are cached as immutable. HTML pages are
+    served with their references to other manifest files rewritten to those
+    URLs, so the pages revalidate while everything they load is cached for
+    good. The manifest reflects the tree when it was built, so rebuild it
+    after deploying.
+    """
+
+    def __init__(self, root=None):
+        self.root = root
+        self.files = {}
+        self.version = None
+        self._pages = {}  # HTML path -> (etag, {encoding or None: body})
+
+    def build(self, root=None, compress=True):
+        """Hash every file under root.
+
+        With `compress`, missing or stale compressed siblings are written
+        (by the build-static-manifest command); otherwise only siblings
+        already up to date are used, and the tree is not written to.
+        """
+        self.root = root or self.root
+        files = {}
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            for filename in sorted(filenames):
+                if filename.startswith('.') or filename == MANIFEST_FILENAME \
+                        or filename.endswith(tuple(COMPRESSED_SUFFIXES.values()) + ('.tmp',)):
+                    continue
+                full_path = os.path.join(directory, filename)
+                path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                entry = {
+                    'hash': file_hash(full_path),
+                    'size': os.path.getsize(full_path),
+                    'mimetype': mimetype,
+                    'encodings': []
+                }
+                # HTML is compressed when it is served, after its asset URLs are rewritten
+                if entry['size'] >= MIN_COMPRESS_SIZE and mimetype.startswith(COMPRESSIBLE_TYPES) \
+                        and mimetype != 'text/html':
+                    entry['encodings'] = self._compress(full_path, write=compress)
+                files[path] = entry
+        self.files = files
+        self._pages = {}
+        self.version = hashlib.sha256(
+            ''.join(
+                f'{path}:{entry["hash"]}' for path, entry in sorted(files.items())
+                if path != SERVICE_WORKER
+            ).encode()
+        ).hexdigest()[:12]
+        return self
+
+    @staticmethod
+    def _compress(full_path, write=True):
+        """Encodings with an up-to-date compressed sibling, writing missing or stale ones if `write`"""
+        encodings = []
+        data = None
+        for encoding in ('br', 'gzip'):
+            target = full_path + COMPRESSED_SUFFIXES[encoding]
+            if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(full_path):
+                encodings.append(encoding)
+                continue
+            if not write or (encoding == 'br' and brotli is None):
+                continue
+            if data is None:
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+            compressed = compress_bytes(data, encoding)
+            # Only keep a variant that actually saves bytes
+            if len(compressed) >= len(data):
+                continue
+            write_atomic(target, compressed)
+            encodings.append(encoding)
+        return encodings
+
+    def save(self, path):
+        write_atomic(path, json.dumps({'version': self.version, 'files': self.files}, indent=1, sort_keys=True).encode())
+
+    def load(self, path, root=None):
+        with open(path) as f:
+            data = json.load(f)
+        self.root = root or self.root
+        self.version = data['version']
+        self.files = data['files']
+        self._pages = {}
+        return self
+
+    def lookup(self, path):
+        return self.files.get(path)
+
+    def url_for(self, path):
+        """Fingerprinted URL for a static file, cacheable forever"""
+        entry = self.files[path]
+        return f'/{path}?v={entry["hash"]}'
+
+    def resolve_reference(self, page, reference):
+        """Manifest path a src/href in an HTML page points to, or None"""
+        if reference.startswith('/'):
+            path = posixpath.normpath(reference.lstrip('/'))
+        else:
+            path = posixpath.normpath(posixpath.join(posixpath.dirname(page), reference))
+        return path if path in self.files else None
+
+    def rewrite_page(self, page, html):
+        """Point an HTML page's references to manifest files at their fingerprinted URLs"""
+        def versioned(match):
+            prefix, quote, reference = match.groups()
+            path = self.resolve_reference(page, reference)
+            if path is None or self.files[path]['mimetype'] == 'text/html':
+                return match.group(0)
+            return f'{prefix}{quote}{reference}?v={self.files[path]["hash"]}{quote}'
+        return ASSET_REFERENCE.sub(versioned, html)
+
+    def _page(self, path):
+        page = self._pages.get(path)
+        if page is None:
+            with open(os.path.join(self.root, path), encoding='utf-8', errors='surrogateescape') as f:
+                body = self.rewrite_page(path, f.read()).encode('utf-8', errors='surrogateescape')
+            bodies = {None: body}
+            if len(body) >= MIN_COMPRESS_SIZE:
+                for encoding in ('br', 'gzip'):
+                    if encoding == 'br' and brotli is None:
+                        continue
+                    compressed = compress_bytes(body, encoding)
+                    if len(compressed) < len(body):
+                        bodies[encoding] = compressed
+            # Rewritten once per process; the manifest, and so every URL in the page, is fixed until rebuilt
+            page = self._pages[path] = (hashlib.sha256(body).hexdigest()[:16], bodies)
+        return page
+
+    def send_page(self, path):
+        """Serve an HTML page with fingerprinted asset URLs; the page itself always revalidates"""
+        etag, bodies = self._page(path)
+        encoding = next((candidate for candidate in bodies if candidate and request.accept_encodings[candidate]), None)
+        response = Response(bodies[encoding], mimetype=self.files[path]['mimetype'])
+        if encoding:
+            response.content_encoding = encoding
+        if len(bodies) > 1:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(etag + (f'-{encoding}' if encoding else ''))
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    def send(self, path):
+        """Serve a manifest entry, picking the best precompressed variant"""
+        entry = self.files[path]
+        if entry['mimetype'] == 'text/html':
+            return self.send_page(path)
+        full_path = os.path.join(self.root, path)
+        encoding = None
+        for candidate in entry['encodings']:
+            if request.accept_encodings[candidate]:
+                encoding = candidate
+                full_path += COMPRESSED_SUFFIXES[candidate]
+                break
+
+        response = send_file(
+            full_path,
+            mimetype=entry['mimetype'],
+            etag=entry['hash'] + (f'-{encoding}' if encoding else ''),
+            conditional=True,
+            max_age=None
+        )
+        if encoding:
+            response.content_encoding = encoding
+        if entry['encodings']:
+            response.vary.add('Accept-Encoding')
+
+        if request.args.get('v') == entry['hash']:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+    def precache_list(self, patterns):
+        """URLs of manifest files matching any of the glob patterns, as the rewritten pages request them"""
+        return [
+            f'/{path}' if self.files[path]['mimetype'] == 'text/html' else self.url_for(path)
+            for path in sorted(self.files)
+            if any(fnmatch.fnmatch(path, pattern) for pattern in patterns)
+        ]
+
+    def write_service_worker(self, sw_path, precache):
+        """Regenerate the CACHE_VERSION/ASSETS_TO_CACHE block of a service worker
+
+        `precache` maps each ASSETS_TO_CACHE group to glob patterns.
+        """
+        assets = {group: self.precache_list(patterns) for group, patterns in precache.items()}
+        assets['core'] = ['/'] + assets.get('core', [])
+        block = (
+            '// Generated from the static manifest; do not edit by hand\n'
+            f"const CACHE_VERSION = '{self.version}';\n\n"
+            '// Assets to cache with version tracking\n'
+            f'const ASSETS_TO_CACHE = {json.dumps(assets, indent=2)};\n'
+        )
+        with open(sw_path) as f:
+            source = f.read()
+        if not SW_BLOCK.search(source):
+            raise ValueError(f'{sw_path} has no // <static-manifest> block')
+        write_atomic(sw_path, SW_BLOCK.sub(lambda m: m.group(1) + block + m.group(2), source).encode())
+
+
+static_manifest = StaticManifest()
@@ -0,0 +1,178 @@
+import ast
+import json
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from src.models.blog_post import BlogPost, db
+
+MAX_TAG_LENGTH = 50
+
+
+class Tag(db.Model):
+    """A distinct tag name; posts link to tags through post_tags"""
+    __tablename__ = 'tags'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(MAX_TAG_LENGTH), unique=True, nullable=False)
+
+
+post_tags = db.Table(
+    'post_tags',
+    db.Column('post_id', db.String(36), db.ForeignKey('blog_posts.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True),
+    # The primary key serves lookups by post; this one serves ?tag= filters and counts
+    db.Index('ix_post_tags_tag_id', 'tag_id', 'post_id'),
+)
+
+
+def parse_tags(value):
+    """Tag names from any stored format: a list, a JSON list, a Python list repr or 'a, b'.
+
+    Names are stripped, capped at MAX_TAG_LENGTH and de-duplicated in order.
+    """
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith('['):
+            try:
+                value = json.loads(text)
+            except ValueError:
+                try:
+                    # Older seed data stored str(list)
+                    value = ast.literal_eval(text)
+                except (ValueError, SyntaxError):
+                    value = text.strip('[]').split(',')
+        else:
+            value = text.split(',')
+    if not isinstance(value, (list, tuple)):
+        return []
+    names = (str(name).strip().strip('\'"').strip()[:MAX_TAG_LENGTH] for name in value if name is not None)
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def serialize_tags(names):
+    """The blog_posts.tags column format: a JSON list, or NULL for no tags"""
+    return json.dumps(names) if names else None
+
+
+def tag_ids(connection, names):
+    """{name: id} for the given names, creating tags that do not exist yet"""
+    names = set(names)
+    if not names:
+        return {}
+    table = Tag.__table__
+    connection.execute(insert(table).on_conflict_do_nothing(index_elements=[table.c.name]), [
+        {'name': name} for name in names
+    ])
+    return dict(connection.execute(db.select(table.c.name, table.c.id).where(table.c.name.in_(names))).all())
+
+
+def set_post_tags(connection, post_tag_names):
+    """Replace the post_tags rows of each (post id, tag names) pair"""
+    post_tag_names = list(post_tag_names)
+    if not post_tag_names:
+        return
+    ids = tag_ids(connection, (name for _, names in post_tag_names for name in names))
+    connection.execute(post_tags.delete().where(post_tags.c.post_id.in_([post_id for post_id, _ in post_tag_names])))
+    rows = [
+        {'post_id': post_id, 'tag_id': ids[name]}
+        for post_id, names in post_tag_names
+        for name in names
+    ]
+    if rows:
+        connection.execute(post_tags.insert(), rows)
+
+
+def tagged(name):
+    """Filter selecting posts that carry the given tag"""
+    return BlogPost.id.in_(
+        db.select(post_tags.c.post_id)
+        .join(Tag.__table__, Tag.id == post_tags.c.tag_id)
+        .where(Tag.name == name.strip())
+    )
+
+
+def tag_counts(connection, status='published'):
+    """[(name, post count)] for tags used by posts in the given status, most used first"""
+    posts = BlogPost.__table__
+    count = db.func.count(post_tags.c.post_id)
+    return connection.execute(
+        db.select(Tag.name, count)
+        .select_from(Tag.__table__)
+        .join(post_tags, post_tags.c.tag_id == Tag.id)
+        .join(posts, posts.c.id == post_tags.c.post_id)
+        .where(posts.c.status == status)
+        .group_by(Tag.id)
+        .order_by(count.desc(), Tag.name)
+    ).all()
+
+
+def migrate_tags(connection, batch_size=500):
+    """Fill post_tags from blog_posts.tags, rewriting anything else as a JSON list.
+
+    Safe to run again; returns the number of posts whose tags column was rewritten.
+    """
+    posts = BlogPost.__table__
+    rewritten = 0
+    last_id = ''
+    while True:
+        batch = connection.execute(
+            db.select(posts.c.id, posts.c.tags).where(posts.c.id > last_id).order_by(posts.c.id).limit(batch_size)
+        ).all()
+        if not batch:
+            return rewritten
+        last_id = batch[-1].id
+        parsed = [(post_id, parse_tags(tags)) for post_id, tags in batch]
+        legacy = [
+            {'post_id': post_id, 'tags': serialize_tags(names)}
+            for (post_id, tags), (_, names) in zip(batch, parsed)
+            if tags != serialize_tags(names)
+        ]
+        if legacy:
+            connection.execute(
+                posts.update().where(posts.c.id == db.bindparam('post_id')).values(tags=db.bindparam('tags')),
+                legacy
+            )
+            rewritten += len(legacy)
+        set_post_tags(connection, parsed)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_tag_changes(session, flush_context, instances):
+    changes = session.info.setdefault('post_tag_changes', {'set': set(), 'deleted': set()})
+    for post in list(session.new) + list(session.dirty):
+        if not isinstance(post, BlogPost):
+            continue
+        if post in session.new or inspect(post).attrs.tags.history.has_changes():
+            # Store the same clean list the index is built from
+            tags = serialize_tags(parse_tags(post.tags))
+            if post.tags != tags:
+                post.tags = tags
+            changes['set'].add(post)
+    for post in session.deleted:
+        if isinstance(post, BlogPost):
+            changes['deleted'].add(post.id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _write_tag_changes(session, flush_context):
+    changes = session.info.pop('post_tag_changes', None)
+    if not changes:
+        return
+    connection = session.connection()
+    if changes['deleted']:
+        connection.execute(post_tags.delete().where(post_tags.c.post_id.in_(changes['deleted'])))
+    set_post_tags(connection, [
+        (post.id, parse_tags(post.tags)) for post in changes['set'] if post.id not in changes['deleted']
+    ])
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_tag_changes(session, previous_transaction):
+    session.info.pop('post_tag_changes', None)
+
+
+@event.listens_for(post_tags, 'after_create')
+def _migrate_tags(target, connection, **kwargs):
+    # Databases that predate the tag tables have tags to parse and link
+    if inspect(connection).has_table(BlogPost.__tablename__):
+        migrate_tags(connection)
@@ -0,0 +1,52 @@
+from src.models.blog_post import db
+from src.models.jobs import job_queue
+from src.models.related import refresh_related
+from src.models.trending import trending
+from src.utils.feeds import site_feeds
+from src.utils.metrics import Gauge
+from src.utils.response_cache import response_cache
+
+# Follow-up work of post writes, run by job queue workers
+
+
+@job_queue.task('related.update')
+def update_related_posts(post_ids):
+    with db.engine.begin() as connection:
+        refresh_related(connection, post_ids)
+    response_cache.invalidate('related')
+
+
+@job_queue.task('feeds.prune')
+def prune_feeds():
+    site_feeds.prune()
+
+
+@job_queue.task('trending.refresh')
+def refresh_trending():
+    # The next refresh is queued first, so the schedule outlives a refresh that keeps failing
+    with db.engine.begin() as connection:
+        schedule_trending_refresh(connection, trending.refresh_interval)
+    trending.refresh_if_stale()
+
+
+def schedule_trending_refresh(connection, delay=0):
+    """Queue a refresh of the trending leaderboards, unless one is queued already"""
+    return job_queue.enqueue(connection, 'trending.refresh', key='trending.refresh', delay=delay)
+
+
+def queue_metrics():
+    """Gauges over the jobs table, for /metrics"""
+    stats = job_queue.stats(db.session.connection())
+    depth = Gauge('job_queue_jobs', 'Jobs in the queue by name and status.', ('name', 'status'))
+    for labels, count in stats['depth'].items():
+        depth.set(labels, count)
+    oldest = Gauge('job_queue_oldest_runnable_seconds', 'How long the oldest runnable job has been waiting.', ('name',))
+    for name, seconds in stats['oldest_runnable'].items():
+        oldest.set((name,), seconds)
+    wait = Gauge('job_queue_wait_seconds', 'Time from runnable to started, jobs finished recently.', ('name', 'quantile'))
+    run = Gauge('job_queue_run_seconds', 'Time from started to finished, jobs finished recently.', ('name', 'quantile'))
+    for gauge, quantiles in ((wait, stats['wait']), (run, stats['run'])):
+        for name, values in quantiles.items():
+            for q, seconds in values.items():
+                gauge.set((name, str(q)), seconds)
+    return depth, oldest, wait, run
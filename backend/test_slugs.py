@@ -0,0 +1,63 @@
+import json
+from uuid import uuid4
+
+from src.models.slugs import SlugHistory
+
+
+def create_post(client, title, **fields):
+    response = client.post('/api/blog/posts', json=dict(title=title, content='Body', **fields))
+    assert response.status_code == 201
+    return response.get_json()['post']
+
+
+def test_retired_slug_redirects_to_the_current_one(client):
+    post = create_post(client, f'Original {uuid4().hex[:8]}', status='published')
+    old_slug = post['slug']
+    response = client.put(f"/api/blog/posts/{post['id']}", json={'title': f'Renamed {uuid4().hex[:8]}'})
+    new_slug = response.get_json()['post']['slug']
+    assert new_slug != old_slug
+
+    response = client.get(f'/api/blog/posts/{old_slug}?include=related')
+    assert response.status_code == 301
+    assert response.headers['Location'].endswith(f'/api/blog/posts/{new_slug}?include=related')
+
+    response = client.get(f'/api/blog/posts/{new_slug}')
+    assert response.status_code == 200
+    assert response.get_json()['post']['id'] == post['id']
+
+
+def test_retired_slug_is_not_reused_by_a_new_post(client):
+    title = f'Reused {uuid4().hex[:8]}'
+    post = create_post(client, title)
+    client.put(f"/api/blog/posts/{post['id']}", json={'title': f'{title} moved'})
+
+    # The old slug still redirects, so a new post with the old title gets a suffix
+    assert create_post(client, title)['slug'] == f"{post['slug']}-2"
+    assert client.get(f"/api/blog/posts/{post['slug']}").status_code == 301
+
+
+def test_bulk_import_does_not_collide_with_current_retired_or_batch_slugs(app, client):
+    title = f'Imported {uuid4().hex[:8]}'
+    current = create_post(client, title)
+    retired = create_post(client, f'{title} old')
+    client.put(f"/api/blog/posts/{retired['id']}", json={'title': f'{title} new'})
+
+    lines = [
+        {'title': title},
+        {'title': f'{title} old'},
+        {'title': title},
+        {'title': 'x', 'slug': current['slug']},
+    ]
+    body = '\n'.join(json.dumps(dict(line, content='Body')) for line in lines)
+    # chunk_size=1 puts each row in its own transaction, so collisions span chunks too
+    response = client.post('/api/blog/posts/bulk?chunk_size=1', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['created'] * len(lines)
+
+    slugs = [result['slug'] for result in results]
+    assert len(set(slugs)) == len(slugs)
+    with app.app_context():
+        retired_slugs = {row.slug for row in SlugHistory.query}
+    assert not set(slugs) & {current['slug'], retired['slug']}
+    assert not set(slugs) & retired_slugs
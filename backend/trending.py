@@ -0,0 +1,145 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from src.models.blog_post import BlogPost, db
+from src.models.view_counter import view_counter
+from src.models.view_history import GRANULARITIES, PostViewBucket, prune_views, truncate
+
+# Window -> (length, buckets scored); a bucket's views halve in weight every quarter window
+WINDOWS = {
+    '24h': (timedelta(hours=24), 'hour'),
+    '7d': (timedelta(days=7), 'hour'),
+    '30d': (timedelta(days=30), 'day'),
+}
+
+
+class TrendingPost(db.Model):
+    """One entry of a precomputed trending leaderboard"""
+    __tablename__ = 'trending_posts'
+
+    window = db.Column(db.String(8), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.String(36), db.ForeignKey('blog_posts.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    views = db.Column(db.Integer, nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+
+def trending_scores(connection, window, limit, now=None):
+    """[(post id, score, views)] of the best scoring published posts in a window.
+
+    A bucket's views are weighted by 2^(-age / half-life), with the
+    half-life a quarter of the window, so recent views count the most.
+    """
+    length, granularity = WINDOWS[window]
+    now = now or datetime.utcnow()
+    half_life = length / 4
+    weights = {}
+    start = truncate(now, granularity)
+    while start > now - length:
+        weights[start] = 0.5 ** ((now - start) / half_life)
+        start -= GRANULARITIES[granularity]
+
+    # Driving from a small VALUES list of bucket weights turns the scan into one
+    # primary key range per bucket, much cheaper than a CASE with a branch per bucket
+    weight = db.values(
+        db.column('bucket_start', db.DateTime), db.column('weight', db.Float), name='weights'
+    ).data(list(weights.items())).cte()
+    buckets = PostViewBucket.__table__
+    posts = BlogPost.__table__
+    score = db.func.sum(buckets.c.views * weight.c.weight)
+    return connection.execute(
+        db.select(buckets.c.post_id, score, db.func.sum(buckets.c.views))
+        .select_from(weight)
+        .join(buckets, db.and_(buckets.c.granularity == granularity, buckets.c.bucket_start == weight.c.bucket_start))
+        .join(posts, posts.c.id == buckets.c.post_id)
+        .where(posts.c.status == 'published')
+        .group_by(buckets.c.post_id)
+        .order_by(score.desc(), buckets.c.post_id)
+        .limit(limit)
+    ).all()
+
+
+class TrendingLeaderboard:
+    """Trending posts per window, precomputed from the view buckets.
+
+    Requests only read a handful of trending_posts rows. A job queue task
+    recomputes every window each TRENDING_REFRESH_INTERVAL seconds (also
+    pruning view buckets past their retention), and skips the refresh when
+    one has just been done, e.g. from the command line.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.size = 50
+        self.refresh_interval = 300.0
+        self.hourly_retention = timedelta(days=14)
+        self.daily_retention = timedelta(days=730)
+        self.refreshed_at = None
+        self._refresh_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TRENDING_SIZE', int(os.environ.get('TRENDING_SIZE', 50)))
+        app.config.setdefault('TRENDING_REFRESH_INTERVAL', float(os.environ.get('TRENDING_REFRESH_INTERVAL', 300)))
+        app.config.setdefault('VIEW_HISTORY_HOURLY_DAYS', int(os.environ.get('VIEW_HISTORY_HOURLY_DAYS', 14)))
+        app.config.setdefault('VIEW_HISTORY_DAILY_DAYS', int(os.environ.get('VIEW_HISTORY_DAILY_DAYS', 730)))
+        self.app = app
+        self.size = app.config['TRENDING_SIZE']
+        self.refresh_interval = app.config['TRENDING_REFRESH_INTERVAL']
+        self.hourly_retention = timedelta(days=app.config['VIEW_HISTORY_HOURLY_DAYS'])
+        self.daily_retention = timedelta(days=app.config['VIEW_HISTORY_DAILY_DAYS'])
+        app.extensions['trending'] = self
+
+    def refresh(self):
+        """Recompute every window's leaderboard in one transaction; returns the entries written"""
+        with self._refresh_lock:
+            # Views still buffered in this process are part of the picture
+            view_counter.flush()
+            now = datetime.utcnow()
+            table = TrendingPost.__table__
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    prune_views(connection, self.hourly_retention, self.daily_retention, now)
+                    rows = [
+                        {'window': window, 'rank': rank, 'post_id': post_id, 'score': score,
+                         'views': views, 'refreshed_at': now}
+                        for window in WINDOWS
+                        for rank, (post_id, score, views) in enumerate(
+                            trending_scores(connection, window, self.size, now), 1
+                        )
+                    ]
+                    connection.execute(table.delete())
+                    if rows:
+                        connection.execute(table.insert(), rows)
+            self.refreshed_at = now
+            return len(rows)
+
+    def refresh_if_stale(self):
+        """Refresh unless any worker has done so within the last half interval"""
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                latest = connection.execute(db.select(db.func.max(TrendingPost.refreshed_at))).scalar()
+        if latest is not None and datetime.utcnow() - latest < timedelta(seconds=self.refresh_interval / 2):
+            self.refreshed_at = latest
+            return 0
+        return self.refresh()
+
+    def leaderboard(self, window, limit=None):
+        """([(post id, score, views)], refreshed at) for a window, best first.
+
+        Empty, refreshed at None, until the first refresh has run.
+        """
+        table = TrendingPost.__table__
+        rows = db.session.execute(
+            db.select(table.c.post_id, table.c.score, table.c.views, table.c.refreshed_at)
+            .where(table.c.window == window)
+            .order_by(table.c.rank)
+            .limit(max(1, min(limit or self.size, self.size)))
+        ).all()
+        refreshed_at = rows[0].refreshed_at if rows else self.refreshed_at
+        return [(row.post_id, row.score, row.views) for row in rows], refreshed_at
+
+
+trending = TrendingLeaderboard()
@@ -0,0 +1,131 @@
+import atexit
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from src.models.blog_post import BlogPost, db
+from src.models.blog_stats import VERSION_ROW, apply_deltas
+from src.models.view_history import record_views
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class ViewCounter:
+    """Write-behind accumulator for post view counts.
+
+    Reads only bump an in-memory counter per post id (and per post and
+    hour, for the view history). Pending views are written in a single
+    UPDATE ... CASE transaction, together with the hourly and daily bucket
+    upserts, once enough have built up, when the flush interval elapses,
+    and at interpreter shutdown.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_threshold = 100
+        self.flush_interval = 10.0
+        self._pending = defaultdict(int)
+        self._pending_hours = defaultdict(int)  # (post id, hours since the epoch) -> views
+        self._pending_views = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('VIEW_COUNTER_FLUSH_THRESHOLD', 100)
+        app.config.setdefault('VIEW_COUNTER_FLUSH_INTERVAL', 10.0)
+        self.app = app
+        self.flush_threshold = app.config['VIEW_COUNTER_FLUSH_THRESHOLD']
+        self.flush_interval = app.config['VIEW_COUNTER_FLUSH_INTERVAL']
+        app.extensions['view_counter'] = self
+        atexit.register(self.flush)
+
+    def increment(self, post_id, count=1):
+        """Record views for a post without touching the database"""
+        hour = int(time.time() // 3600)
+        with self._lock:
+            self._pending[post_id] += count
+            self._pending_hours[(post_id, hour)] += count
+            self._pending_views += count
+            pending_views = self._pending_views
+        self._ensure_flusher()
+        if pending_views >= self.flush_threshold:
+            self._wakeup.set()
+
+    def pending(self, post_id):
+        """Views recorded for a post that have not been written yet"""
+        with self._lock:
+            return self._pending.get(post_id, 0)
+
+    def views(self, post):
+        """Current view count for a loaded post, including unflushed views"""
+        return (post.views or 0) + self.pending(post.id)
+
+    def flush(self):
+        """Write all pending views in one transaction; returns the number of posts updated"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(int)
+                pending_hours, self._pending_hours = self._pending_hours, defaultdict(int)
+                self._pending_views = 0
+            if not pending:
+                return 0
+
+            table = BlogPost.__table__
+            statement = table.update() \
+                .where(table.c.id.in_(list(pending))) \
+                .values(
+                    views=db.func.coalesce(table.c.views, 0) + db.case(pending, value=table.c.id, else_=0),
+                    # View counts are not edits, so keep updated_at (and anything keyed on it) stable
+                    updated_at=table.c.updated_at
+                )
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(statement)
+                        # Listings show views, so their version (and ETag) moves with every flush
+                        apply_deltas(connection, {('total', 'views'): sum(pending.values()), VERSION_ROW: 1})
+                        record_views(connection, {
+                            (post_id, EPOCH + timedelta(hours=hour)): count
+                            for (post_id, hour), count in pending_hours.items()
+                        })
+            except Exception:
+                # Keep the views for the next attempt rather than dropping them
+                with self._lock:
+                    for post_id, count in pending.items():
+                        self._pending[post_id] += count
+                        self._pending_views += count
+                    for key, count in pending_hours.items():
+                        self._pending_hours[key] += count
+                raise
+            return len(pending)
+
+    def _ensure_flusher(self):
+        # Started lazily, and again after a fork, since threads do not survive forking workers
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                if self.app is not None:
+                    self.app.logger.warning('Failed to flush view counts: %s', e)
+                time.sleep(self.flush_interval)
+
+
+view_counter = ViewCounter()
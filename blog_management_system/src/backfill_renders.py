@@ -0,0 +1,22 @@
+import argparse
+from main import app, db
+from models.rendered_content import backfill_batch
+
+def backfill(batch_size=500, force=False):
+    """Render missing or stale posts, committing after every batch"""
+    total = 0
+    last_id = 0
+    with app.app_context():
+        while True:
+            with db.engine.begin() as connection:
+                last_id, rendered = backfill_batch(connection, last_id, batch_size, force)
+            if last_id is None:
+                return total
+            total += rendered
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render posts whose cached HTML is missing or out of date')
+    parser.add_argument('--batch-size', type=int, default=500, help='Posts read and written per batch')
+    parser.add_argument('--force', action='store_true', help='Re-render every post, e.g. after changing the sanitizer')
+    args = parser.parse_args()
+    print(f'Rendered {backfill(batch_size=args.batch_size, force=args.force)} posts')
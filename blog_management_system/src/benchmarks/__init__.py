@@ -0,0 +1,15 @@
+"""Reproducible benchmarks for the blog API.
+
+Three parts, all run from the src directory against their own database so
+blog.db is never touched:
+
+    # 1. Generate a synthetic dataset (~12ms a post on one core, nearly all of it Markdown rendering)
+    python -m benchmarks generate --database bench.db --posts 100000 --users 1000
+
+    # 2. Drive load scenarios in-process or through a local WSGI server, and
+    # 3. save p50/p95/p99 and throughput as JSON, optionally compared with a baseline
+    python -m benchmarks run --database bench.db --driver server --output results/v1.4.json
+    python -m benchmarks run --database bench.db --baseline results/v1.4.json
+
+See dataset.py, scenarios.py and report.py for the details of each part.
+"""
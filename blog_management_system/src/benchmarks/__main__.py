@@ -0,0 +1,163 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+DEFAULT_DATABASE = 'bench.db'
+
+
+def configure(args):
+    """Point the app at the benchmark database; must run before `main` is imported"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.database)
+    # Pre-rendered pages from write scenarios go to a scratch directory, not static/blog
+    os.environ.setdefault('PRERENDER_DIR', tempfile.mkdtemp(prefix='blog-bench-'))
+    if not getattr(args, 'cache', True):
+        # Measure the application, not the response cache
+        os.environ['RESPONSE_CACHE_BACKEND'] = 'null'
+
+
+def dataset_info(database):
+    from models import db
+    from models.blog_post import BlogPost
+    from models.user import User
+    return {
+        'posts': db.session.scalar(db.select(db.func.count(BlogPost.id))),
+        'published': db.session.scalar(db.select(db.func.count(BlogPost.id)).where(BlogPost.status == 'published')),
+        'users': db.session.scalar(db.select(db.func.count(User.id))),
+        'database_bytes': os.path.getsize(database),
+    }
+
+
+def generate(args):
+    for suffix in ('', '-wal', '-shm'):
+        path = args.database + suffix
+        if os.path.exists(path):
+            if not args.force:
+                sys.exit(f'{path} already exists; pass --force to replace it')
+            os.remove(path)
+    configure(args)
+    from main import app
+    from benchmarks.dataset import generate_posts, generate_users
+
+    def progress(done, total):
+        print(f'  {done}/{total} posts', file=sys.stderr)
+
+    started = time.perf_counter()
+    with app.app_context():
+        users = generate_users(args.users, seed=args.seed)
+        created, failed = generate_posts(args.posts, seed=args.seed, chunk_size=args.chunk_size, progress=progress)
+        info = dataset_info(args.database)
+    print(f'Generated {created} posts ({failed} failed) and {users} users in {time.perf_counter() - started:.1f}s')
+    print(f"{info['published']} published, database is {info['database_bytes'] / 2 ** 20:.1f}MB")
+
+
+def run(args):
+    if not os.path.exists(args.database):
+        sys.exit(f'{args.database} does not exist; run `python -m benchmarks generate` first')
+    configure(args)
+    from main import app
+    from benchmarks.report import build_report, compare, format_summary, load_report, save_report
+    from benchmarks.runner import DRIVERS, run_scenario
+    from benchmarks.scenarios import SCENARIOS, Context
+
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    with app.app_context():
+        context = Context.load(seed=args.seed)
+        dataset = dataset_info(args.database)
+
+    driver = DRIVERS[args.driver](app)
+    results = {}
+    try:
+        for name in names:
+            results[name] = run_scenario(
+                driver, SCENARIOS[name], context,
+                concurrency=args.concurrency, duration=args.duration, warmup=args.warmup, seed=args.seed
+            )
+            print(format_summary(name, results[name]))
+    finally:
+        driver.close()
+
+    report = build_report(results, dataset, {
+        'driver': args.driver,
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'warmup_s': args.warmup,
+        'seed': args.seed,
+        'response_cache': args.cache,
+    })
+    if args.output:
+        save_report(report, args.output)
+        print(f'Report saved to {args.output}')
+
+    if args.baseline:
+        rows, regressions = compare(report, load_report(args.baseline), tolerance=args.tolerance)
+        for name, metric, previous, current, change in rows:
+            flag = '  REGRESSION' if (name, metric, previous, current, change) in regressions else ''
+            print(f'{name:<16} {metric:<10} {previous:>10} -> {current:>10} ({change:+.1%}){flag}')
+        if regressions:
+            sys.exit(1)
+
+
+def serialization(args):
+    if not os.path.exists(args.database):
+        sys.exit(f'{args.database} does not exist; run `python -m benchmarks generate` first')
+    configure(args)
+    from main import app
+    from benchmarks.serialization import benchmark_serialization
+
+    with app.app_context():
+        results = benchmark_serialization(app, page_size=args.page_size, rounds=args.rounds)
+    for view, variants in results.items():
+        baseline = variants['stdlib']
+        for name, micros in variants.items():
+            print(f'{view:<8} {name:<18} {micros:>9.1f}us per {args.page_size}-post page  ({baseline / micros:.1f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Blog API benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = commands.add_parser('generate', help='Create a synthetic benchmark database')
+    generate_parser.add_argument('--database', default=DEFAULT_DATABASE)
+    generate_parser.add_argument('--posts', type=int, default=100000)
+    generate_parser.add_argument('--users', type=int, default=1000)
+    generate_parser.add_argument('--seed', type=int, default=1)
+    generate_parser.add_argument('--chunk-size', type=int, default=500, help='Posts inserted per transaction')
+    generate_parser.add_argument('--force', action='store_true', help='Replace an existing database')
+    generate_parser.set_defaults(handler=generate)
+
+    run_parser = commands.add_parser('run', help='Run load scenarios and report latency and throughput')
+    run_parser.add_argument('--database', default=DEFAULT_DATABASE)
+    run_parser.add_argument('--scenarios', help='Comma-separated subset of scenarios (default: all)')
+    run_parser.add_argument('--driver', choices=('client', 'server'), default='client',
+                            help='In-process test client, or HTTP to a local threaded WSGI server')
+    run_parser.add_argument('--concurrency', type=int, default=4)
+    run_parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds per scenario')
+    run_parser.add_argument('--warmup', type=float, default=1.0, help='Unmeasured seconds before each scenario')
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--cache', action='store_true', help='Keep the response cache enabled')
+    run_parser.add_argument('--output', help='Write the JSON report here')
+    run_parser.add_argument('--baseline', help='Compare with an earlier JSON report; exits 1 on regressions')
+    run_parser.add_argument('--tolerance', type=float, default=0.10,
+                            help='Relative change in p50/p95/p99 or throughput treated as a regression')
+    run_parser.set_defaults(handler=run)
+
+    serialization_parser = commands.add_parser(
+        'serialization', help='Microbenchmark listing serialization: stdlib, orjson and cached fragments'
+    )
+    serialization_parser.add_argument('--database', default=DEFAULT_DATABASE)
+    serialization_parser.add_argument('--page-size', type=int, default=50)
+    serialization_parser.add_argument('--rounds', type=int, default=200)
+    serialization_parser.set_defaults(handler=serialization)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
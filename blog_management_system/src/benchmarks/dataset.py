@@ -0,0 +1,171 @@
+import itertools
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from models import db
+from models.blog_post import BlogPost
+from models.bulk_import import import_posts, DEFAULT_CHUNK_SIZE
+from models.user import User
+from utils.passwords import password_hasher
+
+CATEGORIES = ['Google Ads', 'SEO', 'Social Media', 'Content Marketing', 'Email Marketing', 'Analytics']
+
+AUTHORS = ['Marlon Palomares', 'Ana Reyes', 'Sam Carter', 'Priya Nair', 'Leo Fischer', 'Mei Tanaka']
+
+# Marketing vocabulary; frequent words come first so they are drawn more often
+COMMON_WORDS = (
+    'the of and to in for is on that with campaign ads search budget bid keyword audience '
+    'conversion click traffic content email social brand landing page quality score strategy '
+    'report metric analytics funnel segment organic paid performance cost revenue growth test '
+    'headline copy creative target match broad phrase exact negative remarketing display video '
+    'shopping feed attribution tracking pixel tag event goal dashboard cohort retention churn '
+    'newsletter subscriber open rate engagement reach impression frequency schedule automation '
+    'optimization experiment variant benchmark seasonal holiday local mobile desktop schema '
+    'backlink crawl index sitemap snippet ranking authority outreach influencer calendar'
+).split()
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ten', 'ra', 'vus', 'el', 'don', 'pri', 'sa', 'quo', 'bel', 'tor', 'ni', 'ust', 've']
+
+
+def _rare_words(count, seed=0):
+    """Deterministic made-up words for the long tail, so searches match a realistic share of posts"""
+    rng = random.Random(seed)
+    words = dict.fromkeys(
+        ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(count * 2)
+    )
+    return [word for word in words if word not in COMMON_WORDS][:count]
+
+
+# Zipf over ~5,000 words: the common ones are in nearly every post, tail words in a few percent
+WORDS = COMMON_WORDS + _rare_words(5000 - len(COMMON_WORDS))
+
+TAGS = [
+    'ppc', 'seo', 'analytics', 'email', 'social', 'content', 'cro', 'automation', 'local-seo',
+    'youtube', 'shopping', 'pmax', 'ga4', 'tag-manager', 'reporting', 'budgeting', 'copywriting',
+    'remarketing', 'b2b', 'ecommerce', 'strategy', 'case-study', 'tutorial', 'news'
+]
+
+DEFAULT_PASSWORD = 'benchmark123'
+
+
+def _zipf_weights(count, exponent=1.1):
+    """Cumulative Zipf weights, ready for random.choices(cum_weights=...)"""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class PostGenerator:
+    """Deterministic stream of realistic post dicts in the bulk import format.
+
+    Body length is log-normal around ~700 words (roughly 100 to 5,000),
+    words, categories and tags follow a Zipf-like skew, about 85% of posts
+    are published, and dates spread over `days` days.
+    """
+
+    def __init__(self, seed=1, days=3 * 365, now=None):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.now = now or datetime(2026, 1, 1)
+        self.word_weights = _zipf_weights(len(WORDS))
+        self.tag_weights = _zipf_weights(len(TAGS))
+        self.category_weights = _zipf_weights(len(CATEGORIES), exponent=0.8)
+
+    def words(self, count):
+        return self.rng.choices(WORDS, cum_weights=self.word_weights, k=count)
+
+    def sentence(self):
+        words = self.words(self.rng.randint(8, 24))
+        return ' '.join(words).capitalize() + '.'
+
+    def paragraph(self, words):
+        sentences = []
+        while words > 0:
+            sentence = self.sentence()
+            sentences.append(sentence)
+            words -= sentence.count(' ') + 1
+        return ' '.join(sentences)
+
+    def content(self):
+        """Markdown body with a few sections, an occasional list and code block"""
+        total = min(max(int(self.rng.lognormvariate(math.log(700), 0.7)), 100), 5000)
+        blocks = []
+        while total > 0:
+            blocks.append('## ' + ' '.join(self.words(self.rng.randint(2, 6))).title())
+            for _ in range(self.rng.randint(2, 5)):
+                words = self.rng.randint(40, 160)
+                blocks.append(self.paragraph(words))
+                total -= words
+            if self.rng.random() < 0.3:
+                blocks.append('\n'.join(f'- {self.sentence()}' for _ in range(self.rng.randint(3, 6))))
+            if self.rng.random() < 0.1:
+                blocks.append('```\n' + '\n'.join(' '.join(self.words(5)) for _ in range(4)) + '\n```')
+        return '\n\n'.join(blocks)
+
+    def post(self, number):
+        created_at = self.now - timedelta(seconds=self.rng.randint(0, self.days * 86400))
+        published = self.rng.random() < 0.85
+        title = ' '.join(self.words(self.rng.randint(4, 10))).title()
+        return {
+            'title': title,
+            # Numbered so generation never has to resolve slug collisions
+            'slug': f'{BlogPost.generate_slug(title)}-{number}',
+            'content': self.content(),
+            # Most authors leave the excerpt to the renderer
+            'excerpt': self.sentence() if self.rng.random() < 0.3 else None,
+            'author': self.rng.choice(AUTHORS),
+            'category': self.rng.choices(CATEGORIES, cum_weights=self.category_weights)[0],
+            'status': 'published' if published else 'draft',
+            'featured_image': f'https://picsum.photos/seed/{number}/800/400',
+            'meta_description': self.sentence()[:200],
+            'meta_keywords': ', '.join(self.words(4)),
+            'tags': sorted(set(self.rng.choices(TAGS, cum_weights=self.tag_weights, k=self.rng.randint(1, 5)))),
+            'views': int(self.rng.paretovariate(1.2) * 10) if published else 0,
+            'published_at': created_at.isoformat() if published else None,
+            'created_at': created_at.isoformat(),
+            'updated_at': (created_at + timedelta(hours=self.rng.randint(0, 72))).isoformat(),
+        }
+
+    def posts(self, count):
+        for number in range(1, count + 1):
+            yield self.post(number)
+
+
+def generate_posts(count, seed=1, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Insert `count` synthetic posts through the bulk import path; returns (created, failed)"""
+    created = failed = 0
+    lines = (json.dumps(post) for post in PostGenerator(seed).posts(count))
+    for result in import_posts(lines, chunk_size=chunk_size):
+        if result['status'] == 'created':
+            created += 1
+        else:
+            failed += 1
+        if progress and (created + failed) % chunk_size == 0:
+            progress(created + failed, count)
+    return created, failed
+
+
+def generate_users(count, seed=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Insert `count` users sharing DEFAULT_PASSWORD; returns the number created.
+
+    The password is hashed once, since key stretching every row would
+    dominate generation time without making reads any more realistic.
+    """
+    rng = random.Random(seed)
+    password = password_hasher.hash(DEFAULT_PASSWORD)
+    now = datetime.utcnow()
+    table = User.__table__
+    for start in range(0, count, chunk_size):
+        rows = [
+            {
+                'name': f'Bench User {number}',
+                'email': f'bench{number}@example.com',
+                'password': password,
+                'role': 'admin' if number == 1 else 'user',
+                'created_at': now - timedelta(days=rng.randint(0, 1000)),
+                'updated_at': now,
+            }
+            for number in range(start + 1, min(start + chunk_size, count) + 1)
+        ]
+        with db.engine.begin() as connection:
+            connection.execute(table.insert(), rows)
+    return count
@@ -0,0 +1,107 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+
+# Metrics compared against a baseline, and whether higher is better
+COMPARED_METRICS = {
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'throughput': True,
+}
+
+
+def summarize(latencies, elapsed, errors):
+    """Latency percentiles (ms), throughput (req/s) and error counts for one run"""
+    summary = {
+        'requests': len(latencies),
+        'errors': dict(sorted(errors.items())),
+        'elapsed_s': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+        summary.update({
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+            'p50_ms': round(quantiles[49] * 1000, 2),
+            'p95_ms': round(quantiles[94] * 1000, 2),
+            'p99_ms': round(quantiles[98] * 1000, 2),
+            'max_ms': round(max(latencies) * 1000, 2),
+        })
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(results, dataset, options):
+    """Everything needed to compare one run with another later on"""
+    return {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'revision': git_revision(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'dataset': dataset,
+        'options': options,
+        'scenarios': results,
+    }
+
+
+def save_report(report, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(report, baseline, tolerance=0.10):
+    """Compare scenario metrics with a baseline report.
+
+    Returns (rows, regressions): rows are (scenario, metric, baseline, current,
+    relative change) for every shared metric, regressions the subset that got
+    worse by more than `tolerance`.
+    """
+    rows = []
+    regressions = []
+    for name, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in current or not previous.get(metric):
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            row = (name, metric, previous[metric], current[metric], change)
+            rows.append(row)
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(row)
+    return rows, regressions
+
+
+def format_summary(name, summary):
+    if 'p50_ms' not in summary:
+        return f"{name:<16} {summary['requests']:>7} requests, errors: {summary['errors'] or 0}"
+    return (
+        f"{name:<16} {summary['throughput']:>8.1f} req/s  p50 {summary['p50_ms']:>8.2f}ms  "
+        f"p95 {summary['p95_ms']:>8.2f}ms  p99 {summary['p99_ms']:>8.2f}ms  errors: {summary['errors'] or 0}"
+    )
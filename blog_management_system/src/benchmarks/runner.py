@@ -0,0 +1,124 @@
+import http.client
+import json
+import random
+import threading
+import time
+from werkzeug.serving import WSGIRequestHandler, make_server
+from benchmarks.report import summarize
+
+
+class TestClientDriver:
+    """Calls the app in-process through Flask's test client: no sockets or HTTP parsing"""
+
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(request):
+            response = client.open(request.path, method=request.method, json=request.body)
+            response.close()
+            return response.status_code
+
+        return send
+
+    def close(self):
+        pass
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log(self, type, message, *args):
+        pass
+
+
+class ServerDriver:
+    """Serves the app from a local threaded WSGI server and talks HTTP/1.1 keep-alive to it"""
+
+    name = 'server'
+
+    def __init__(self, app, host='127.0.0.1'):
+        self.host = host
+        self.server = make_server(host, 0, app, threaded=True, request_handler=_QuietHandler)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, name='benchmark-server', daemon=True)
+        self.thread.start()
+
+    def session(self):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+        def send(request):
+            body = json.dumps(request.body) if request.body is not None else None
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            try:
+                connection.request(request.method, request.path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                # Start over on a fresh connection next time
+                connection.close()
+                raise
+            return response.status
+
+        return send
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+DRIVERS = {
+    'client': TestClientDriver,
+    'server': ServerDriver,
+}
+
+
+def run_scenario(driver, scenario, context, concurrency=4, duration=10.0, warmup=1.0, seed=1):
+    """Run one scenario from `concurrency` threads for `duration` seconds.
+
+    Requests made during the first `warmup` seconds are not measured.
+    Returns the summary from report.summarize.
+    """
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    def worker(number):
+        rng = random.Random(seed * 1000 + number)
+        send = driver.session()
+        own_latencies = []
+        own_errors = {}
+        while True:
+            request = scenario(rng, context)
+            before = time.perf_counter()
+            if before >= deadline:
+                break
+            try:
+                status = send(request)
+                error = str(status) if status >= 400 else None
+            except Exception as e:
+                error = type(e).__name__
+            after = time.perf_counter()
+            if before < measure_from:
+                continue
+            if error:
+                own_errors[error] = own_errors.get(error, 0) + 1
+            else:
+                own_latencies.append(after - before)
+        with lock:
+            latencies.extend(own_latencies)
+            for error, count in own_errors.items():
+                errors[error] = errors.get(error, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Requests still in flight at the deadline are waited for and counted
+    return summarize(latencies, time.perf_counter() - measure_from, errors)
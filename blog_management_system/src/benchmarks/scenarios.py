@@ -0,0 +1,107 @@
+import math
+import random
+import uuid
+from collections import namedtuple
+from models import db
+from models.blog_post import BlogPost
+from benchmarks.dataset import PostGenerator, WORDS
+
+Request = namedtuple('Request', 'method path body')
+
+PER_PAGE = 10
+
+# Past the common vocabulary, each term matches somewhere between ~1% and ~20% of posts
+SEARCH_TERMS = WORDS[150:2000]
+
+
+class Context:
+    """What scenarios need to know about the dataset, read once before a run"""
+
+    def __init__(self, published_ids, published_count, sample_size=10000, seed=1):
+        rng = random.Random(seed)
+        self.post_ids = rng.sample(published_ids, min(sample_size, len(published_ids)))
+        self.published_count = published_count
+        self.pages = max(math.ceil(published_count / PER_PAGE), 1)
+
+    @classmethod
+    def load(cls, **kwargs):
+        ids = [post_id for (post_id,) in db.session.execute(
+            db.select(BlogPost.id).where(BlogPost.status == 'published')
+        )]
+        if not ids:
+            raise ValueError('The benchmark database has no published posts; run `generate` first')
+        return cls(ids, len(ids), **kwargs)
+
+
+def list_posts(rng, context):
+    """First few pages of the public listing"""
+    return Request('GET', f'/api/posts?status=published&per_page={PER_PAGE}&page={rng.randint(1, 3)}', None)
+
+
+def deep_pagination(rng, context):
+    """Offset pages from the back half of the listing"""
+    page = rng.randint(max(context.pages // 2, 1), context.pages)
+    return Request('GET', f'/api/posts?status=published&per_page={PER_PAGE}&page={page}', None)
+
+
+def search(rng, context):
+    terms = ' '.join(rng.sample(SEARCH_TERMS, rng.choice((1, 1, 2))))
+    return Request('GET', f'/api/posts?status=published&per_page={PER_PAGE}&search={terms.replace(" ", "+")}', None)
+
+
+def get_post(rng, context):
+    """Single published post; every read counts a view"""
+    return Request('GET', f'/api/posts/{rng.choice(context.post_ids)}', None)
+
+
+def get_stats(rng, context):
+    return Request('GET', '/api/stats', None)
+
+
+def create_post(rng, context):
+    post = PostGenerator(rng.random()).post(rng.randint(1, 10 ** 9))
+    return Request('POST', '/api/posts', {
+        # Titles become slugs, which must stay unique across runs against the same database
+        'title': f"{post['title']} {uuid.uuid4().hex[:12]}",
+        'content': post['content'],
+        'category': post['category'],
+        'tags': post['tags'],
+        'status': post['status'],
+    })
+
+
+def update_post(rng, context):
+    content = PostGenerator(rng.random()).content()
+    return Request('PUT', f'/api/posts/{rng.choice(context.post_ids)}', {'content': content})
+
+
+def weighted(*choices):
+    """Scenario picking one of (weight, scenario) per request"""
+    weights = [weight for weight, _ in choices]
+    scenarios = [scenario for _, scenario in choices]
+
+    def mixed(rng, context):
+        return rng.choices(scenarios, weights=weights)[0](rng, context)
+
+    return mixed
+
+
+# Read-heavy traffic with roughly one write in ten requests
+mixed = weighted(
+    (30, list_posts),
+    (40, get_post),
+    (10, search),
+    (5, deep_pagination),
+    (5, get_stats),
+    (5, create_post),
+    (5, update_post),
+)
+
+SCENARIOS = {
+    'list': list_posts,
+    'deep_pagination': deep_pagination,
+    'search': search,
+    'get_post': get_post,
+    'stats': get_stats,
+    'mixed': mixed,
+}
@@ -0,0 +1,24 @@
+import argparse
+import sys
+from main import app
+from models.bulk_import import import_posts, DEFAULT_CHUNK_SIZE
+
+def run_import(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    created = failed = 0
+    with app.app_context():
+        with (sys.stdin if path == '-' else open(path, encoding='utf-8')) as lines:
+            for result in import_posts(lines, chunk_size=chunk_size):
+                if result['status'] == 'created':
+                    created += 1
+                else:
+                    failed += 1
+                    print(f"line {result['line']}: {result['error']}", file=sys.stderr)
+    return created, failed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import blog posts from an NDJSON file')
+    parser.add_argument('path', help="NDJSON file with one post per line, or '-' for stdin")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    created, failed = run_import(args.path, args.chunk_size)
+    print(f'Imported {created} posts ({failed} failed)')
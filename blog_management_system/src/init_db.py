@@ -41,7 +41,7 @@ def init_database():
                 featured_image='https://via.placeholder.com/800x400',
                 meta_description=f'Meta description for blog post {i + 1}',
                 meta_keywords=f'keyword1, keyword2, keyword3',
-                tags=str(['tag1', 'tag2', 'tag3']),
+                tags=['tag1', 'tag2', 'tag3'],
                 views=random.randint(0, 1000),
                 reading_time=random.randint(3, 15),
                 created_at=created_at,
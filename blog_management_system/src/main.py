@@ -1,13 +1,36 @@
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, request, send_from_directory, jsonify
 from flask_cors import CORS
 from models import db
 from models.blog_post import BlogPost
 from models.user import User
+from models.blog_stats import BlogStat
+from models.jobs import Job, job_queue
+from models.related import RelatedPost
+from models.rendered_content import RenderedContent
+from models.search import create_search_index
+from models.tags import Tag
+from models.trending import TrendingPost, trending
+from models.view_counter import view_counter
+from models.view_history import PostViewBucket
+from utils.auth import auth
+from utils.feeds import site_feeds
+from utils.fragment_cache import fragment_cache
+from utils.http_cache import add_validators, is_not_modified, make_etag, not_modified_response
+from utils.json_provider import FastJSONProvider
+from utils.metrics import request_metrics
+from utils.passwords import password_hasher
+from utils.prerender import static_renderer
+from utils.response_cache import response_cache
+from utils.sqlite_profile import sqlite_profile
+from utils.tasks import queue_metrics, schedule_trending_refresh
 import os
 
 # Initialize Flask app
 app = Flask(__name__)
 
+# orjson when installed, with pre-encoded fragments spliced into listings
+app.json = FastJSONProvider(app)
+
 # Enable CORS for all routes
 CORS(app, resources={
     r"/*": {
@@ -19,11 +42,25 @@ CORS(app, resources={
 
 # Configure SQLite database
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'blog.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'blog.db'))
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Engine profile (pragmas, pool sizing) has to be in place before the engine is created
+sqlite_profile.init_app(app)
+
 # Initialize SQLAlchemy
 db.init_app(app)
+view_counter.init_app(app)
+trending.init_app(app)
+response_cache.init_app(app)
+auth.init_app(app)
+password_hasher.init_app(app)
+static_renderer.init_app(app)
+request_metrics.init_app(app)
+fragment_cache.init_app(app)
+site_feeds.init_app(app)
+job_queue.init_app(app)
+request_metrics.add_collector(queue_metrics)
 
 # Import and register blueprints
 from routes.blog import create_blog_blueprint
@@ -39,6 +76,16 @@ app.register_blueprint(blog_bp, url_prefix='/api')
 def init_db():
     with app.app_context():
         db.create_all()
+        # create_all skips new indexes on tables that already exist
+        for index in BlogPost.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        with db.engine.begin() as connection:
+            create_search_index(connection)
+            # Trending leaderboards are refreshed by job workers, rescheduling themselves from here on
+            schedule_trending_refresh(connection)
+
+# Make sure the schema is current however the app is started (script, gunicorn, CLI tools)
+init_db()
 
 @app.route('/')
 def index():
@@ -52,23 +99,81 @@ def blog_management():
 def serve_assets(filename):
     return send_from_directory('static/assets', filename)
 
+# Pre-rendered pages are complete HTML; the client-side pages are the fallback until they exist
 @app.route('/blog')
 def blog():
+    return blog_page(1)
+
+@app.route('/blog/page/<int:page>')
+def blog_page(page):
+    rendered = static_renderer.index_file(page)
+    if rendered:
+        return send_from_directory(static_renderer.output_dir, rendered)
     return send_from_directory('static', 'blog.html')
 
 @app.route('/blog/<int:post_id>')
 def blog_post(post_id):
+    rendered = static_renderer.post_file(post_id)
+    if rendered:
+        # Only published posts are rendered; the page makes no API call, so its view is counted here
+        view_counter.increment(post_id)
+        return send_from_directory(static_renderer.output_dir, rendered)
+    # The client-side page fetches /api/posts/<id>, which counts the view
     return send_from_directory('static', 'blog-post.html')
 
+# Regenerated on disk only when the published set changes; revalidation costs one aggregate query
+@app.route('/sitemap.xml')
+def sitemap():
+    return site_feeds.sitemap_response()
+
+@app.route('/sitemap-<int:shard>.xml')
+def sitemap_shard(shard):
+    return site_feeds.sitemap_response(shard)
+
+@app.route('/feed.xml')
+def feed():
+    return site_feeds.feed_response()
+
 @app.route('/api/posts/<int:post_id>')
 def get_post(post_id):
     from models.blog_post import BlogPost
+    from models.related import RELATED_FIELDS, related_posts_query
+    try:
+        includes = BlogPost.resolve_includes(request.args.get('include'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Related lists change when other posts do, so those responses share a
+    # namespace that every write drops
+    namespace = 'related' if 'related' in includes else f'post:{post_id}'
+
+    # Cache hits still count the view, but never touch the database
+    cached = response_cache.get(namespace)
+    if cached is not None:
+        if cached.meta.get('published'):
+            view_counter.increment(post_id)
+        return cached.to_response()
+
     post = BlogPost.query.get_or_404(post_id)
-    return jsonify(post.to_dict())
+
+    # Views are buffered and written in batches, so this read takes no write lock
+    if post.status == 'published':
+        view_counter.increment(post.id)
+
+    related = db.session.scalars(related_posts_query(post.id)).all() if 'related' in includes else []
+
+    etag = make_etag(post.id, post.updated_at, *(f'{other.id}:{other.updated_at}' for other in related))
+    last_modified = max([post.updated_at] + [other.updated_at for other in related])
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    data = post.to_dict()
+    data['views'] = view_counter.views(post)
+    if 'related' in includes:
+        data['related'] = [other.to_dict(RELATED_FIELDS) for other in related]
+    response = add_validators(jsonify(data), etag, last_modified)
+    return response_cache.set(namespace, response, {'published': post.status == 'published'})
 
 if __name__ == '__main__':
-    # Initialize database
-    init_db()
-    
     # Run the application
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,375 @@
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, aliased
+from models import db
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+# Quantiles reported for recent wait and run times
+QUANTILES = (0.5, 0.95, 1.0)
+
+
+class Job(db.Model):
+    """A unit of background work; rows are the queue"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Claiming takes the earliest runnable job
+        db.Index('ix_jobs_claim', 'status', 'run_at', 'id'),
+        # At most one queued job per key; once one starts, a new one can queue behind it
+        db.Index('ux_jobs_queued_key', 'key', unique=True, sqlite_where=db.text("status = 'queued'")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    key = db.Column(db.String(200))
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False)
+    enqueued_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+
+def quantile(values, q):
+    """Nearest-rank quantile of sorted values"""
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class JobQueue:
+    """Durable background jobs stored in the app's own database.
+
+    enqueue() adds a row in the caller's transaction, so follow-up work
+    commits (or rolls back) with the write that needs it. Workers claim the
+    earliest runnable job with one UPDATE ... RETURNING, which SQLite
+    serializes, so any number of threads and processes on the box can share
+    the queue. Idle workers look for due jobs with a read and only take the
+    write lock to claim one; they poll less often the longer the queue stays
+    idle, up to JOB_POLL_MAX_INTERVAL, and wake at once for jobs enqueued in
+    their own process. Failed jobs are retried with jittered exponential
+    backoff up to their max_attempts; a job whose worker died is claimed
+    again once its lease runs out. Jobs with a key are deduplicated while
+    queued.
+
+    Web processes run JOB_WORKER_THREADS embedded worker threads (0 leaves
+    the work to a separate `run_worker.py`).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.tasks = {}
+        self.worker_threads = 1
+        self.poll_interval = 1.0
+        self.max_poll_interval = 30.0
+        self.lease = timedelta(seconds=600)
+        self.max_attempts = 5
+        self.backoff_base = 5.0
+        self.backoff_max = 3600.0
+        self.done_retention = timedelta(days=1)
+        self.failed_retention = timedelta(days=7)
+        self.metrics_window = timedelta(seconds=300)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._pruned_at = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKER_THREADS', int(os.environ.get('JOB_WORKER_THREADS', 1)))
+        app.config.setdefault('JOB_POLL_INTERVAL', float(os.environ.get('JOB_POLL_INTERVAL', 1.0)))
+        app.config.setdefault('JOB_POLL_MAX_INTERVAL', float(os.environ.get('JOB_POLL_MAX_INTERVAL', 30.0)))
+        app.config.setdefault('JOB_LEASE_SECONDS', int(os.environ.get('JOB_LEASE_SECONDS', 600)))
+        app.config.setdefault('JOB_MAX_ATTEMPTS', int(os.environ.get('JOB_MAX_ATTEMPTS', 5)))
+        app.config.setdefault('JOB_BACKOFF_SECONDS', float(os.environ.get('JOB_BACKOFF_SECONDS', 5)))
+        app.config.setdefault('JOB_BACKOFF_MAX_SECONDS', float(os.environ.get('JOB_BACKOFF_MAX_SECONDS', 3600)))
+        app.config.setdefault('JOB_RETENTION_HOURS', float(os.environ.get('JOB_RETENTION_HOURS', 24)))
+        self.app = app
+        self.worker_threads = app.config['JOB_WORKER_THREADS']
+        self.poll_interval = app.config['JOB_POLL_INTERVAL']
+        self.max_poll_interval = max(app.config['JOB_POLL_MAX_INTERVAL'], self.poll_interval)
+        self.lease = timedelta(seconds=app.config['JOB_LEASE_SECONDS'])
+        self.max_attempts = app.config['JOB_MAX_ATTEMPTS']
+        self.backoff_base = app.config['JOB_BACKOFF_SECONDS']
+        self.backoff_max = app.config['JOB_BACKOFF_MAX_SECONDS']
+        self.done_retention = timedelta(hours=app.config['JOB_RETENTION_HOURS'])
+        self.failed_retention = self.done_retention * 7
+        app.extensions['job_queue'] = self
+
+        # Embedded workers start with the first request, after any forking server has forked
+        if self.worker_threads > 0:
+            app.before_request(self._ensure_workers)
+
+    def task(self, name, max_attempts=None):
+        """Register a function as the handler of a job name; payload items are its keyword arguments"""
+        def register(function):
+            self.tasks[name] = (function, max_attempts)
+            return function
+        return register
+
+    def enqueue(self, connection, name, payload=None, key=None, delay=0, max_attempts=None):
+        """Queue a job in the connection's transaction; returns its id, or None if one with the key is queued"""
+        now = datetime.utcnow()
+        _, task_max_attempts = self.tasks.get(name, (None, None))
+        table = Job.__table__
+        statement = insert(table).values(
+            name=name,
+            key=key,
+            payload=json.dumps(payload or {}),
+            status='queued',
+            attempts=0,
+            max_attempts=max_attempts or task_max_attempts or self.max_attempts,
+            run_at=now + timedelta(seconds=delay),
+            enqueued_at=now
+        )
+        if key is not None:
+            statement = statement.on_conflict_do_nothing(
+                index_elements=[table.c.key], index_where=table.c.status == 'queued'
+            )
+        job_id = connection.execute(statement.returning(table.c.id)).scalar()
+        self._wakeup.set()
+        return job_id
+
+    def next_due(self, connection):
+        """When the next job becomes runnable (queued, or running with a lease that runs out); None if there is none"""
+        table = Job.__table__
+        queued = connection.execute(
+            db.select(db.func.min(table.c.run_at)).where(table.c.status == 'queued')
+        ).scalar()
+        leased = connection.execute(
+            db.select(db.func.min(table.c.locked_until)).where(table.c.status == 'running')
+        ).scalar()
+        return min((due for due in (queued, leased) if due is not None), default=None)
+
+    def claim(self, connection, now=None):
+        """Take the earliest runnable job (or one whose lease ran out) and mark it running"""
+        now = now or datetime.utcnow()
+        table = Job.__table__
+        runnable = db.select(table.c.id).where(db.or_(
+            db.and_(table.c.status == 'queued', table.c.run_at <= now),
+            db.and_(table.c.status == 'running', table.c.locked_until < now)
+        )).order_by(table.c.run_at, table.c.id).limit(1).scalar_subquery()
+        return connection.execute(
+            table.update()
+            .where(table.c.id == runnable)
+            .values(status='running', attempts=table.c.attempts + 1, started_at=now, locked_until=now + self.lease)
+            .returning(*table.c)
+        ).first()
+
+    def run_next(self):
+        """Claim and run one job; returns False when none was runnable"""
+        with self.app.app_context():
+            # Read first: an idle queue never takes SQLite's write lock
+            with db.engine.connect() as connection:
+                due = self.next_due(connection)
+            if due is None or due > datetime.utcnow():
+                return False
+            with db.engine.begin() as connection:
+                job = self.claim(connection)
+            if job is None:
+                return False
+            try:
+                if job.name not in self.tasks:
+                    raise LookupError(f'No task registered as {job.name}')
+                function, _ = self.tasks[job.name]
+                function(**json.loads(job.payload))
+            except Exception as e:
+                self.app.logger.warning('Job %s (%s) failed on attempt %s: %s', job.id, job.name, job.attempts, e)
+                self._failed(job, ''.join(traceback.format_exception(e))[-4000:])
+            else:
+                self._finished(job)
+            finally:
+                # Handlers may use the scoped session; never leak it into the next job
+                db.session.remove()
+        return True
+
+    def _finished(self, job):
+        table = Job.__table__
+        with db.engine.begin() as connection:
+            connection.execute(
+                table.update()
+                # Unless the lease ran out and another worker has taken the job over
+                .where(table.c.id == job.id, table.c.attempts == job.attempts)
+                .values(status='done', finished_at=datetime.utcnow(), locked_until=None, last_error=None)
+            )
+
+    def _failed(self, job, error):
+        now = datetime.utcnow()
+        table = Job.__table__
+        mine = db.and_(table.c.id == job.id, table.c.attempts == job.attempts)
+        with db.engine.begin() as connection:
+            if job.attempts >= job.max_attempts or job.name not in self.tasks:
+                connection.execute(table.update().where(mine).values(
+                    status='failed', finished_at=now, locked_until=None, last_error=error
+                ))
+                return
+            delay = min(self.backoff_base * 2 ** (job.attempts - 1), self.backoff_max)
+            other = aliased(table)
+            retried = connection.execute(table.update().where(
+                mine,
+                # A newer queued job with the same key already covers the retry
+                db.or_(table.c.key.is_(None), ~db.exists().where(other.c.key == table.c.key, other.c.status == 'queued'))
+            ).values(
+                status='queued', run_at=now + timedelta(seconds=delay * random.uniform(0.5, 1.0)),
+                locked_until=None, last_error=error
+            )).rowcount
+            if not retried:
+                connection.execute(table.delete().where(mine, table.c.key.is_not(None)))
+
+    def prune(self, now=None):
+        """Delete finished jobs past their retention; returns rows deleted"""
+        now = now or datetime.utcnow()
+        table = Job.__table__
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                return connection.execute(table.delete().where(db.or_(
+                    db.and_(table.c.status == 'done', table.c.finished_at < now - self.done_retention),
+                    db.and_(table.c.status == 'failed', table.c.finished_at < now - self.failed_retention)
+                ))).rowcount
+
+    def work(self, threads=1, burst=False):
+        """Run jobs on a pool of threads until stopped (or, in burst mode, until none are runnable)"""
+        self._stop.clear()
+        pool = [
+            threading.Thread(target=self._work_loop, args=(burst,), name=f'job-worker-{n}', daemon=True)
+            for n in range(threads)
+        ]
+        for thread in pool:
+            thread.start()
+        try:
+            for thread in pool:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            # Let running jobs finish; anything cut short is retried once its lease runs out
+            self.stop()
+            for thread in pool:
+                thread.join()
+
+    def work_processes(self, processes, threads=1, burst=False):
+        """Run `processes` forked worker processes of `threads` threads each"""
+        context = multiprocessing.get_context('fork')
+        children = [context.Process(target=self._process_main, args=(threads, burst)) for _ in range(processes)]
+        for child in children:
+            child.start()
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            for child in children:
+                child.join()
+
+    def _process_main(self, threads, burst):
+        with self.app.app_context():
+            # Connections must not be shared with the parent process
+            db.engine.dispose(close=False)
+        self.work(threads, burst)
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _work_loop(self, burst=False):
+        interval = self.poll_interval
+        while not self._stop.is_set():
+            wait = interval
+            try:
+                if self.run_next():
+                    interval = self.poll_interval
+                    continue
+                self._prune_now_and_then()
+                wait = self._idle_wait(interval)
+            except Exception as e:
+                self.app.logger.warning('Job worker error: %s', e)
+            if burst:
+                return
+            if self._wakeup.wait(wait):
+                self._wakeup.clear()
+                interval = self.poll_interval
+            else:
+                # Nothing was enqueued here; jobs from other processes are found by polling, less often while idle
+                interval = min(interval * 2, self.max_poll_interval)
+
+    def _idle_wait(self, interval):
+        # Sleep no longer than until a retry comes due or a lease runs out
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                due = self.next_due(connection)
+        if due is None:
+            return interval
+        return min(interval, max((due - datetime.utcnow()).total_seconds(), 0.0))
+
+    def _prune_now_and_then(self):
+        if time.monotonic() - self._pruned_at > 600:
+            self._pruned_at = time.monotonic()
+            self.prune()
+
+    def _ensure_workers(self):
+        # Started lazily, and again after a fork, since threads do not survive forking workers
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self._work_loop, name=f'job-worker-{n}', daemon=True)
+                for n in range(self.worker_threads)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stats(self, connection):
+        """Queue depth by name and status, age of the oldest runnable job, and
+        wait and run time quantiles of jobs finished within the metrics window"""
+        now = datetime.utcnow()
+        table = Job.__table__
+        depth = {
+            (name, status): count for name, status, count in connection.execute(
+                db.select(table.c.name, table.c.status, db.func.count()).group_by(table.c.name, table.c.status)
+            )
+        }
+        oldest = {
+            name: (now - run_at).total_seconds() for name, run_at in connection.execute(
+                db.select(table.c.name, db.func.min(table.c.run_at))
+                .where(table.c.status == 'queued', table.c.run_at <= now)
+                .group_by(table.c.name)
+            )
+        }
+        recent = {}
+        for name, run_at, started_at, finished_at in connection.execute(
+            db.select(table.c.name, table.c.run_at, table.c.started_at, table.c.finished_at)
+            .where(table.c.status == 'done', table.c.finished_at >= now - self.metrics_window)
+        ):
+            waits, runs = recent.setdefault(name, ([], []))
+            waits.append(max((started_at - run_at).total_seconds(), 0.0))
+            runs.append((finished_at - started_at).total_seconds())
+        wait, run = {}, {}
+        for name, (waits, runs) in recent.items():
+            waits.sort()
+            runs.sort()
+            wait[name] = {q: quantile(waits, q) for q in QUANTILES}
+            run[name] = {q: quantile(runs, q) for q in QUANTILES}
+        return {'depth': depth, 'oldest_runnable': oldest, 'wait': wait, 'run': run}
+
+
+job_queue = JobQueue()
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    # Jobs enqueued in a session transaction become visible on commit
+    job_queue._wakeup.set()
@@ -0,0 +1,190 @@
+import functools
+import hashlib
+import re
+from datetime import datetime
+import bleach
+import markdown
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models import db
+from models.blog_post import BlogPost
+
+# Part of every content hash, so bumping it re-renders all posts after a pipeline change
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = ['extra', 'sane_lists', 'toc']
+
+ALLOWED_TAGS = sorted(bleach.sanitizer.ALLOWED_TAGS | {
+    'p', 'br', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'code', 'img', 'span', 'div',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td', 'dl', 'dt', 'dd', 'sup', 'sub', 'del', 'figure', 'figcaption'
+})
+ALLOWED_ATTRIBUTES = {
+    'a': ['href', 'title', 'rel'],
+    'img': ['src', 'alt', 'title', 'width', 'height'],
+    'code': ['class'],
+    'th': ['align'],
+    'td': ['align'],
+    **{f'h{level}': ['id'] for level in range(1, 7)},
+}
+ALLOWED_PROTOCOLS = ['http', 'https', 'mailto']
+
+EXCERPT_LENGTH = 200
+
+
+class RenderedContent(db.Model):
+    """Sanitized HTML, excerpt and table of contents rendered from a post's content.
+
+    Rows are keyed by post and carry the hash of the content they were
+    rendered from, so a stale row is detected without re-rendering.
+    """
+    __tablename__ = 'blog_post_renders'
+
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id'), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    excerpt = db.Column(db.Text)
+    toc = db.Column(db.JSON, default=list)
+    rendered_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    post = db.relationship(
+        BlogPost,
+        backref=db.backref('rendered', uselist=False, cascade='all, delete-orphan')
+    )
+
+
+def content_hash(content):
+    return hashlib.sha256(f'{RENDERER_VERSION}:{content or ""}'.encode()).hexdigest()
+
+
+def make_excerpt(html, length=EXCERPT_LENGTH):
+    """Plain-text lead of the rendered HTML, cut at a word boundary"""
+    text = re.sub(r'\s+', ' ', bleach.clean(html, tags=[], strip=True)).strip()
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(' ', 1)[0].rstrip('.,;:') + '…'
+
+
+def _flatten_toc(tokens):
+    for token in tokens:
+        yield token['level'], token['id'], token['name']
+        yield from _flatten_toc(token['children'])
+
+
+@functools.lru_cache(maxsize=256)
+def _render(content):
+    # Cached as immutable values; callers get fresh containers from render_content
+    md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    html = bleach.clean(
+        md.convert(content or ''),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        protocols=ALLOWED_PROTOCOLS,
+        strip=True
+    )
+    return html, make_excerpt(html), tuple(_flatten_toc(md.toc_tokens))
+
+
+def render_content(content):
+    """Render markdown (or HTML) content to {'html', 'excerpt', 'toc'}.
+
+    Raw HTML in the content passes through markdown and is then sanitized,
+    so existing HTML posts keep their markup minus anything unsafe.
+    """
+    html, excerpt, toc = _render(content)
+    return {
+        'html': html,
+        'excerpt': excerpt,
+        'toc': [{'level': level, 'id': anchor, 'title': title} for level, anchor, title in toc],
+    }
+
+
+def render_row(post_id, content):
+    """Insertable blog_post_renders row for the given content"""
+    return dict(render_content(content), post_id=post_id, content_hash=content_hash(content), rendered_at=datetime.utcnow())
+
+
+def store_renders(connection, rows):
+    """Insert or replace render rows in the current transaction"""
+    if not rows:
+        return
+    table = RenderedContent.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.post_id],
+        set_={column: statement.excluded[column] for column in ('content_hash', 'html', 'excerpt', 'toc', 'rendered_at')}
+    )
+    connection.execute(statement, rows)
+
+
+def rendered_for(post):
+    """The post's render, from its row when current and rendered on the fly otherwise"""
+    state = inspect(post)
+    row = None if 'rendered' in state.unloaded and state.session is None else post.rendered
+    if 'content' in state.unloaded:
+        # Content was not loaded (e.g. summary listings); trust the row written with the last edit
+        return row
+    if row is not None and row.content_hash == content_hash(post.content):
+        return row
+    return RenderedContent(post_id=post.id, content_hash=content_hash(post.content), **render_content(post.content))
+
+
+def backfill_batch(connection, after_id=0, batch_size=500, force=False):
+    """Render the missing or stale posts among the next batch_size posts by id.
+
+    Returns (last id seen, posts rendered); the last id is None once past the end.
+    """
+    posts = BlogPost.__table__
+    renders = RenderedContent.__table__
+    batch = connection.execute(
+        db.select(posts.c.id, posts.c.content, renders.c.content_hash)
+        .select_from(posts.outerjoin(renders, renders.c.post_id == posts.c.id))
+        .where(posts.c.id > after_id)
+        .order_by(posts.c.id)
+        .limit(batch_size)
+    ).all()
+    if not batch:
+        return None, 0
+    rows = [
+        render_row(post_id, content) for post_id, content, stored_hash in batch
+        if force or stored_hash != content_hash(content)
+    ]
+    store_renders(connection, rows)
+    return batch[-1].id, len(rows)
+
+
+def backfill_renders(connection, batch_size=500, force=False):
+    """Render every post whose row is missing or stale; returns the number rendered"""
+    total = 0
+    last_id = 0
+    while last_id is not None:
+        last_id, rendered = backfill_batch(connection, last_id, batch_size, force)
+        total += rendered
+    return total
+
+
+@event.listens_for(Session, 'before_flush')
+def _render_changed_content(session, flush_context, instances):
+    # Render once per edit, in the same transaction as the edit itself
+    with session.no_autoflush:
+        for post in list(session.new) + list(session.dirty):
+            if not isinstance(post, BlogPost) or post in session.deleted:
+                continue
+            if post not in session.new and not inspect(post).attrs.content.history.has_changes():
+                continue
+            rendered = render_content(post.content)
+            row = post.rendered
+            if row is None:
+                post.rendered = RenderedContent(content_hash=content_hash(post.content), **rendered)
+            else:
+                row.content_hash = content_hash(post.content)
+                row.html = rendered['html']
+                row.excerpt = rendered['excerpt']
+                row.toc = rendered['toc']
+
+
+@event.listens_for(RenderedContent.__table__, 'after_create')
+def _backfill_renders(target, connection, **kwargs):
+    # Databases that predate the render cache already have posts to render
+    if inspect(connection).has_table(BlogPost.__tablename__):
+        backfill_renders(connection)
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models import db
+from models.blog_post import BlogPost
+
+# Bucket widths; views are kept per post per hour and per day
+GRANULARITIES = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+
+class PostViewBucket(db.Model):
+    """Views of one post during one hour or one day (UTC), written by the view counter"""
+    __tablename__ = 'post_view_buckets'
+    __table_args__ = (
+        # Per-post history; the primary key serves site-wide ranges and trending scans
+        db.Index('ix_post_view_buckets_post', 'post_id', 'granularity', 'bucket_start'),
+    )
+
+    granularity = db.Column(db.String(4), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id'), primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+
+
+def truncate(moment, granularity):
+    """Start of the hour or day a moment falls in"""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def record_views(connection, hourly_counts):
+    """Add {(post id, hour start): views} to the hourly and daily buckets"""
+    daily_counts = {}
+    for (post_id, hour), count in hourly_counts.items():
+        key = (post_id, truncate(hour, 'day'))
+        daily_counts[key] = daily_counts.get(key, 0) + count
+
+    table = PostViewBucket.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.granularity, table.c.bucket_start, table.c.post_id],
+        set_={'views': table.c.views + statement.excluded.views}
+    )
+    connection.execute(statement, [
+        {'granularity': granularity, 'bucket_start': start, 'post_id': post_id, 'views': count}
+        for granularity, counts in (('hour', hourly_counts), ('day', daily_counts))
+        for (post_id, start), count in counts.items()
+    ])
+
+
+def view_history(connection, granularity='day', since=None, until=None, post_id=None):
+    """[(bucket start, views)] from since to until, one entry per bucket including empty ones.
+
+    Covers every post unless post_id is given.
+    """
+    step = GRANULARITIES[granularity]
+    until = truncate(until or datetime.utcnow(), granularity)
+    since = truncate(since or until - 29 * step, granularity)
+    table = PostViewBucket.__table__
+    query = db.select(table.c.bucket_start, db.func.sum(table.c.views)) \
+        .where(table.c.granularity == granularity, table.c.bucket_start.between(since, until)) \
+        .group_by(table.c.bucket_start)
+    if post_id is not None:
+        query = query.where(table.c.post_id == post_id)
+    counts = dict(connection.execute(query).all())
+
+    history = []
+    start = since
+    while start <= until:
+        history.append((start, counts.get(start, 0)))
+        start += step
+    return history
+
+
+def prune_views(connection, hourly_retention, daily_retention, now=None):
+    """Drop buckets past their retention; returns rows deleted.
+
+    Each granularity is one primary key range. Buckets of deleted posts go
+    with the post, see below.
+    """
+    now = now or datetime.utcnow()
+    table = PostViewBucket.__table__
+    deleted = 0
+    for granularity, retention in (('hour', hourly_retention), ('day', daily_retention)):
+        deleted += connection.execute(table.delete().where(
+            table.c.granularity == granularity,
+            table.c.bucket_start < truncate(now - retention, granularity)
+        )).rowcount
+    return deleted
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_deleted_posts(session, flush_context, instances):
+    deleted = session.info.setdefault('view_history_deleted', set())
+    deleted.update(post.id for post in session.deleted if isinstance(post, BlogPost))
+
+
+@event.listens_for(Session, 'after_flush')
+def _delete_view_buckets(session, flush_context):
+    deleted = session.info.pop('view_history_deleted', None)
+    if deleted:
+        table = PostViewBucket.__table__
+        session.connection().execute(table.delete().where(table.c.post_id.in_(deleted)))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_deleted_posts(session, previous_transaction):
+    session.info.pop('view_history_deleted', None)
@@ -0,0 +1,10 @@
+import argparse
+from main import app
+from utils.prerender import static_renderer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-render every published post and blog index page to static HTML')
+    parser.add_argument('--workers', type=int, default=None, help='Renderer processes (default: one per CPU)')
+    args = parser.parse_args()
+    post_pages, index_pages = static_renderer.rebuild(workers=args.workers)
+    print(f'Rendered {post_pages} posts and {index_pages} index pages into {static_renderer.output_dir}')
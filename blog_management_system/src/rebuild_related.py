@@ -0,0 +1,13 @@
+import time
+from main import app, db
+from models.related import build_related
+
+def rebuild():
+    with app.app_context():
+        with db.engine.begin() as connection:
+            return build_related(connection)
+
+if __name__ == '__main__':
+    started = time.perf_counter()
+    indexed = rebuild()
+    print(f'Related posts rebuilt for {indexed} published posts in {time.perf_counter() - started:.1f}s')
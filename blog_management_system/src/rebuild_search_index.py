@@ -0,0 +1,13 @@
+from main import app, db
+from models.search import create_search_index, rebuild_search_index
+
+def rebuild():
+    with app.app_context():
+        with db.engine.begin() as connection:
+            # A freshly created index is already backfilled
+            if not create_search_index(connection):
+                rebuild_search_index(connection)
+
+if __name__ == '__main__':
+    rebuild()
+    print('Search index rebuilt!')
@@ -0,0 +1,13 @@
+from main import app, db
+from models.blog_stats import rebuild_stats
+
+def rebuild():
+    with app.app_context():
+        with db.engine.begin() as connection:
+            return rebuild_stats(connection)
+
+if __name__ == '__main__':
+    drift = rebuild()
+    for (dimension, key), (stored, actual) in sorted(drift.items()):
+        print(f'{dimension}/{key}: {stored} -> {actual}')
+    print(f'Blog stats rebuilt ({len(drift)} rows repaired)')
@@ -0,0 +1,11 @@
+from main import app, db
+from models.tags import migrate_tags
+
+def rebuild():
+    with app.app_context():
+        with db.engine.begin() as connection:
+            return migrate_tags(connection)
+
+if __name__ == '__main__':
+    rewritten = rebuild()
+    print(f'Tag index rebuilt ({rewritten} posts had their tags rewritten as JSON lists)')
@@ -0,0 +1,8 @@
+import time
+from main import app
+from models.trending import trending
+
+if __name__ == '__main__':
+    started = time.perf_counter()
+    entries = trending.refresh()
+    print(f'Trending leaderboards refreshed with {entries} entries in {time.perf_counter() - started:.1f}s')
@@ -1,43 +1,207 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from datetime import datetime
 from models import db
+from models.search import apply_search
+from utils.http_cache import add_validators, is_not_modified, make_etag, not_modified_response, request_fingerprint
+from utils.response_cache import response_cache
+from utils.export import EXPORT_FORMATS, iter_export
+from utils.fragment_cache import fragment_cache
+from utils.prerender import static_renderer
+from utils.tasks import enqueue_listing_prerender, enqueue_prerender
 
 def create_blog_blueprint():
     blog_bp = Blueprint('blog', __name__)
 
+    def invalidate_post_caches(post):
+        # Any write can change listings, categories and stats as well as the post itself
+        response_cache.invalidate('posts', 'categories', 'stats', 'tags', 'related', f'post:{post.id}')
+
     @blog_bp.route('/stats', methods=['GET'])
+    @response_cache.cached('stats')
     def get_stats():
-        from models.blog_post import BlogPost
-        total_posts = BlogPost.query.count()
-        published_posts = BlogPost.query.filter_by(status='published').count()
-        draft_posts = BlogPost.query.filter_by(status='draft').count()
-        total_views = sum(post.views for post in BlogPost.query.all())
+        from models.blog_stats import get_stat_values
+        # Read from the materialized aggregates instead of scanning blog_posts
+        totals = get_stat_values('total')
+        statuses = get_stat_values('status')
+
+        return jsonify({
+            'total_posts': totals.get('posts', 0),
+            'published_posts': statuses.get('published', 0),
+            'draft_posts': statuses.get('draft', 0),
+            'total_views': totals.get('views', 0)
+        })
+
+    @blog_bp.route('/tags', methods=['GET'])
+    @response_cache.cached('tags')
+    def get_tags():
+        from models.tags import tag_counts
+        # Counted through the post_tags index rather than by parsing every post's tags
+        counts = tag_counts(db.session.connection())
+        return jsonify({'tags': [{'name': name, 'count': count} for name, count in counts]})
 
+    @blog_bp.route('/stats/views', methods=['GET'])
+    def get_view_history():
+        from models.view_history import GRANULARITIES, view_history
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': f'Unknown granularity: {granularity}'}), 400
+        buckets = request.args.get('buckets', 30, type=int)
+        if not 1 <= buckets <= 1000:
+            return jsonify({'error': 'buckets must be between 1 and 1000'}), 400
+
+        until = datetime.utcnow()
+        history = view_history(
+            db.session.connection(), granularity,
+            since=until - (buckets - 1) * GRANULARITIES[granularity], until=until,
+            post_id=request.args.get('post_id', type=int)
+        )
         return jsonify({
-            'total_posts': total_posts,
-            'published_posts': published_posts,
-            'draft_posts': draft_posts,
-            'total_views': total_views
+            'granularity': granularity,
+            'views': [{'start': start.isoformat(), 'views': views} for start, views in history]
         })
 
+    @blog_bp.route('/posts/trending', methods=['GET'])
+    def get_trending_posts():
+        from models.blog_post import BlogPost
+        from models.trending import WINDOWS, trending
+        window = request.args.get('window', '7d')
+        if window not in WINDOWS:
+            return jsonify({'error': f'Unknown window: {window}. Use one of: {", ".join(WINDOWS)}'}), 400
+        try:
+            fields = BlogPost.resolve_fields(request.args.get('view'), request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # A few precomputed rows; the ranking itself is rebuilt in the background
+        entries, refreshed_at = trending.leaderboard(window, request.args.get('limit', type=int))
+        posts = {
+            post.id: post
+            # updated_at is loaded whatever the projection, it versions the response
+            for post in BlogPost.query.options(BlogPost.load_fields(set(fields) | {'updated_at'}))
+            .filter(BlogPost.id.in_([post_id for post_id, _, _ in entries]))
+        }
+        entries = [entry for entry in entries if entry[0] in posts]
+
+        etag = make_etag(request_fingerprint(), refreshed_at, *(
+            f'{post_id}:{posts[post_id].updated_at}' for post_id, _, _ in entries
+        ))
+        if is_not_modified(etag, refreshed_at):
+            return not_modified_response(etag, refreshed_at)
+
+        return add_validators(jsonify({
+            'window': window,
+            'refreshed_at': refreshed_at.isoformat() if refreshed_at else None,
+            'posts': [
+                dict(posts[post_id].to_dict(fields), trending={'score': round(score, 3), 'views': views})
+                for post_id, score, views in entries
+            ]
+        }), etag, refreshed_at)
+
     @blog_bp.route('/posts', methods=['GET'])
+    @response_cache.cached('posts')
     def get_posts():
         from models.blog_post import BlogPost
+        from models.blog_stats import posts_version
+        from models.tags import tagged
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         status = request.args.get('status')
+        search = request.args.get('search')
+
+        # Listings default to the summary view so post bodies are never read
+        try:
+            fields = BlogPost.resolve_fields(request.args.get('view'), request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         query = BlogPost.query
         if status:
             query = query.filter_by(status=status)
+        # Repeated ?tag= arguments narrow the listing to posts carrying every one of them
+        for tag in request.args.getlist('tag'):
+            query = query.filter(tagged(tag))
+
+        # Every write to blog_posts bumps the posts version, so revalidation costs
+        # one primary key lookup rather than a scan of the filtered set
+        etag = make_etag(request_fingerprint(), posts_version(db.session.connection()))
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+
+        query = query.options(BlogPost.load_fields(fields))
+
+        # Full-text matches come back by relevance, so they page by offset
+        if search:
+            if 'cursor' in request.args:
+                return jsonify({'error': 'Cursor pagination is not supported with search'}), 400
+            results = apply_search(query, search).order_by(*BlogPost.listing_order())
+            results = results.paginate(page=page, per_page=per_page)
+            return add_validators(jsonify({
+                'posts': [dict(post.to_dict(fields), snippet=snippet) for post, snippet in results.items],
+                'total': results.total,
+                'pages': results.pages,
+                'current_page': results.page
+            }), etag)
+
+        # Cursor mode seeks past the last seen post instead of OFFSET scanning,
+        # and only counts the filtered set when asked to
+        if 'cursor' in request.args:
+            cursor = request.args.get('cursor')
+            page_query = query.order_by(*BlogPost.listing_order())
+            if cursor:
+                try:
+                    page_query = page_query.filter(BlogPost.after_cursor(BlogPost.decode_cursor(cursor)))
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+
+            posts = page_query.limit(per_page + 1).all()
+            has_next = len(posts) > per_page
+            posts = posts[:per_page]
+            result = {
+                'posts': fragment_cache.posts(posts, fields),
+                'has_next': has_next,
+                'next_cursor': posts[-1].encode_cursor() if has_next else None
+            }
+            if request.args.get('with_total', 'false').lower() in ('1', 'true', 'yes'):
+                result['total'] = query.order_by(None).count()
+            return add_validators(jsonify(result), etag)
 
         posts = query.paginate(page=page, per_page=per_page)
-        return jsonify({
-            'posts': [post.to_dict() for post in posts.items],
+        return add_validators(jsonify({
+            'posts': fragment_cache.posts(posts.items, fields),
             'total': posts.total,
             'pages': posts.pages,
             'current_page': posts.page
-        })
+        }), etag)
+
+    @blog_bp.route('/posts/export', methods=['GET'])
+    def export_posts():
+        from models.blog_post import BlogPost
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'Unknown format: {export_format}'}), 400
+        # Exports are snapshots, so they include every field unless projected
+        try:
+            fields = BlogPost.resolve_fields(request.args.get('view', 'full'), request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        fields = fields or BlogPost.FIELDS
+
+        query = db.select(BlogPost).options(BlogPost.load_fields(fields)).order_by(BlogPost.id)
+        if request.args.get('status'):
+            query = query.where(BlogPost.status == request.args['status'])
+        if request.args.get('category'):
+            query = query.where(BlogPost.category == request.args['category'])
+
+        def generate():
+            # yield_per streams rows off the cursor in batches, so memory stays flat
+            posts = db.session.execute(query.execution_options(yield_per=500)).scalars()
+            yield from iter_export(posts, fields, export_format)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={'Content-Disposition': f'attachment; filename=posts.{export_format}'}
+        )
 
     @blog_bp.route('/posts', methods=['POST'])
     def create_post():
@@ -59,14 +223,38 @@ def create_blog_blueprint():
         )
 
         db.session.add(post)
+        db.session.flush()
+        # Follow-up work commits with the post and runs on a job worker
+        enqueue_prerender(db.session.connection(), post.id, after=static_renderer.listing_key(post))
         db.session.commit()
+        invalidate_post_caches(post)
         return jsonify(post.to_dict()), 201
 
+    @blog_bp.route('/posts/bulk', methods=['POST'])
+    def bulk_create_posts():
+        from models.bulk_import import import_posts, DEFAULT_CHUNK_SIZE
+        # The body is NDJSON, one post per line, read as it streams in
+        chunk_size = request.args.get('chunk_size', DEFAULT_CHUNK_SIZE, type=int)
+        results = sorted(import_posts(request.stream, chunk_size=max(1, chunk_size)), key=lambda result: result['line'])
+        response_cache.invalidate('posts', 'categories', 'stats', 'tags', 'related')
+        created_ids = [result['id'] for result in results if result['status'] == 'created']
+        if created_ids:
+            with db.engine.begin() as connection:
+                enqueue_listing_prerender(connection, created_ids)
+
+        created = len(created_ids)
+        return jsonify({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }), 201 if created else 400
+
     @blog_bp.route('/posts/<int:post_id>', methods=['PUT'])
     def update_post(post_id):
         from models.blog_post import BlogPost
         post = BlogPost.query.get_or_404(post_id)
         data = request.get_json()
+        listing_key = static_renderer.listing_key(post)
 
         post.title = data.get('title', post.title)
         post.content = data.get('content', post.content)
@@ -83,15 +271,20 @@ def create_blog_blueprint():
         post.status = data.get('status', post.status)
 
         post.updated_at = datetime.now()
+        enqueue_prerender(db.session.connection(), post.id, listing_key, static_renderer.listing_key(post))
         db.session.commit()
+        invalidate_post_caches(post)
         return jsonify(post.to_dict())
 
     @blog_bp.route('/posts/<int:post_id>', methods=['DELETE'])
     def delete_post(post_id):
         from models.blog_post import BlogPost
         post = BlogPost.query.get_or_404(post_id)
+        listing_key = static_renderer.listing_key(post)
         db.session.delete(post)
+        enqueue_prerender(db.session.connection(), post_id, before=listing_key)
         db.session.commit()
+        invalidate_post_caches(post)
         return '', 204
 
     return blog_bp
\ No newline at end of file
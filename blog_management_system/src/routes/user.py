@@ -1,12 +1,19 @@
-from flask import Blueprint, jsonify, request
-from werkzeug.security import generate_password_hash, check_password_hash
-import jwt
-from datetime import datetime, timedelta
+from flask import Blueprint, g, jsonify, request
+from datetime import datetime
 from models import db
+from utils.auth import auth
+from utils.passwords import HasherBusy, password_hasher
 
 def create_user_blueprint():
     user_bp = Blueprint('user', __name__)
 
+    @user_bp.errorhandler(HasherBusy)
+    def hasher_busy(e):
+        # Hashing is saturated; tell the client to back off rather than queueing forever
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
     @user_bp.route('/register', methods=['POST'])
     def register():
         from models.user import User
@@ -20,7 +27,7 @@ def create_user_blueprint():
         user = User(
             name=data['name'],
             email=data['email'],
-            password=generate_password_hash(data['password']),
+            password=password_hasher.hash(data['password']),
             role=data.get('role', 'user')
         )
 
@@ -35,77 +42,51 @@ def create_user_blueprint():
         data = request.get_json()
 
         user = User.query.filter_by(email=data['email']).first()
-        if not user or not check_password_hash(user.password, data['password']):
+        if not user or not password_hasher.verify(user.password, data['password']):
             return jsonify({'error': 'Invalid credentials'}), 401
 
-        token = jwt.encode(
-            {
-                'user_id': user.id,
-                'exp': datetime.utcnow() + timedelta(days=1)
-            },
-            'your-secret-key',  # Should be stored in environment variable
-            algorithm='HS256'
-        )
+        # Upgrade hashes made with an older cost while the plain password is at hand
+        if password_hasher.needs_rehash(user.password):
+            user.password = password_hasher.hash(data['password'])
+            db.session.commit()
+            auth.invalidate_user(user.id)
 
         return jsonify({
-            'token': token,
+            'token': auth.issue_token(user.id),
             'user': user.to_dict()
         })
 
     @user_bp.route('/profile', methods=['GET'])
+    @auth.token_required
     def get_profile():
         from models.user import User
-        # Get token from header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-
-        try:
-            # Verify token
-            data = jwt.decode(token, 'your-secret-key', algorithms=['HS256'])
-            user = User.query.get(data['user_id'])
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
+        user = auth.get_user(g.token_claims['user_id'], lambda user_id: db.session.get(User, user_id))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
 
-            return jsonify(user.to_dict())
-
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
+        return jsonify(user)
 
     @user_bp.route('/profile', methods=['PUT'])
+    @auth.token_required
     def update_profile():
         from models.user import User
-        # Get token from header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-
-        try:
-            # Verify token
-            data = jwt.decode(token, 'your-secret-key', algorithms=['HS256'])
-            user = User.query.get(data['user_id'])
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-
-            # Update user data
-            update_data = request.get_json()
-            if 'name' in update_data:
-                user.name = update_data['name']
-            if 'email' in update_data:
-                user.email = update_data['email']
-            if 'password' in update_data:
-                user.password = generate_password_hash(update_data['password'])
-
-            user.updated_at = datetime.now()
-            db.session.commit()
-
-            return jsonify(user.to_dict())
+        user = db.session.get(User, g.token_claims['user_id'])
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        # Update user data
+        update_data = request.get_json()
+        if 'name' in update_data:
+            user.name = update_data['name']
+        if 'email' in update_data:
+            user.email = update_data['email']
+        if 'password' in update_data:
+            user.password = password_hasher.hash(update_data['password'])
+
+        user.updated_at = datetime.now()
+        db.session.commit()
+        auth.invalidate_user(user.id)
 
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
+        return jsonify(user.to_dict())
 
-    return user_bp
\ No newline at end of file
+    return user_bp
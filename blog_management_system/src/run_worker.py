@@ -0,0 +1,15 @@
+import argparse
+from main import app
+from models.jobs import job_queue
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run background jobs from the job queue')
+    parser.add_argument('--threads', type=int, default=2, help='worker threads per process')
+    parser.add_argument('--processes', type=int, default=1, help='worker processes (forked)')
+    parser.add_argument('--burst', action='store_true', help='exit once no job is runnable')
+    args = parser.parse_args()
+
+    if args.processes > 1:
+        job_queue.work_processes(args.processes, args.threads, args.burst)
+    else:
+        job_queue.work(args.threads, args.burst)
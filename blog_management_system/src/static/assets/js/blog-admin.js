@@ -20,6 +20,7 @@ class BlogAdminManager {
             await this.loadStats();
             await this.loadPosts();
             this.setupEventListeners();
+            this.loadViewHistory();
         } catch (error) {
             console.error('Initialization error:', error);
             this.useLocalStorage();
@@ -72,6 +73,12 @@ class BlogAdminManager {
             });
         }
 
+        // Views chart range
+        const granularitySelect = document.getElementById('views-granularity');
+        if (granularitySelect) {
+            granularitySelect.addEventListener('change', () => this.loadViewHistory());
+        }
+
         // Close modal buttons
         document.querySelectorAll('.close-modal').forEach(button => {
             button.addEventListener('click', () => this.closeModal());
@@ -110,6 +117,66 @@ class BlogAdminManager {
         }
     }
 
+    async loadViewHistory() {
+        const select = document.getElementById('views-granularity');
+        const granularity = select ? select.value : 'day';
+        const buckets = granularity === 'hour' ? 48 : 30;
+        try {
+            const response = await fetch(`${this.apiBase}/stats/views?granularity=${granularity}&buckets=${buckets}`);
+            if (!response.ok) throw new Error('API not available');
+
+            const data = await response.json();
+            this.renderViewChart(data.views, granularity);
+        } catch (error) {
+            // The chart is an extra; the rest of the dashboard works without it
+            console.error('Error loading view history:', error);
+        }
+    }
+
+    renderViewChart(history, granularity) {
+        const container = document.getElementById('views-chart-container');
+        if (!container) return;
+
+        if (!history || history.length === 0) {
+            container.innerHTML = '<p class="text-center">No views recorded yet.</p>';
+            return;
+        }
+
+        const width = 600;
+        const height = 180;
+        const bottom = 20;
+        const max = Math.max(1, ...history.map(bucket => bucket.views));
+        const barWidth = width / history.length;
+        const label = bucket => {
+            const start = new Date(`${bucket.start}Z`);
+            return granularity === 'hour'
+                ? `${start.getHours()}:00`
+                : start.toLocaleDateString(undefined, { month: 'short', day: 'numeric' });
+        };
+        // Label about eight buckets so the axis stays readable at any range
+        const labelEvery = Math.ceil(history.length / 8);
+
+        const bars = history.map((bucket, i) => {
+            const barHeight = (bucket.views / max) * (height - bottom - 10);
+            const x = i * barWidth;
+            return `
+                <rect class="bar" x="${x + 1}" y="${height - bottom - barHeight}"
+                      width="${Math.max(barWidth - 2, 1)}" height="${barHeight}">
+                    <title>${label(bucket)}: ${bucket.views} views</title>
+                </rect>
+                ${i % labelEvery === 0 ? `
+                    <text class="axis-label" x="${x + barWidth / 2}" y="${height - 5}" text-anchor="middle">${label(bucket)}</text>
+                ` : ''}
+            `;
+        }).join('');
+
+        container.innerHTML = `
+            <svg viewBox="0 0 ${width} ${height}" role="img" aria-label="Views over time">
+                ${bars}
+            </svg>
+        `;
+    }
+
     async loadPosts() {
         try {
             const response = await fetch(`${this.apiBase}/posts`);
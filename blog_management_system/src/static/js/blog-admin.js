@@ -4,6 +4,7 @@ class BlogAdmin {
     constructor() {
         this.apiBase = window.location.origin + '/api';
         this.currentTab = 'all';
+        this.searchTerm = '';
         this.posts = [];
         this.stats = {};
         this.useLocalStorage = false;
@@ -48,8 +49,11 @@ class BlogAdmin {
         // Search functionality
         const searchInput = document.getElementById('search-posts');
         if (searchInput) {
+            // Searched on the server, once typing pauses
+            let searchTimer = null;
             searchInput.addEventListener('input', (e) => {
-                this.filterPosts(e.target.value);
+                clearTimeout(searchTimer);
+                searchTimer = setTimeout(() => this.filterPosts(e.target.value), 250);
             });
         }
 
@@ -229,19 +233,38 @@ class BlogAdmin {
         container.innerHTML = tableHTML;
     }
 
-    filterPosts(searchTerm) {
-        if (!searchTerm.trim()) {
+    async filterPosts(searchTerm) {
+        const term = searchTerm.trim();
+        this.searchTerm = term;
+        if (!term) {
             this.renderPosts();
             return;
         }
 
-        const filtered = this.posts.filter(post => 
-            post.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-            post.content.toLowerCase().includes(searchTerm.toLowerCase()) ||
-            (post.excerpt && post.excerpt.toLowerCase().includes(searchTerm.toLowerCase()))
-        );
+        if (this.useLocalStorage) {
+            // Local posts carry their content, so they can be matched here
+            const needle = term.toLowerCase();
+            const filtered = this.posts.filter(post =>
+                post.title.toLowerCase().includes(needle) ||
+                (post.content && post.content.toLowerCase().includes(needle)) ||
+                (post.excerpt && post.excerpt.toLowerCase().includes(needle))
+            );
+            this.renderPosts(filtered);
+            return;
+        }
 
-        this.renderPosts(filtered);
+        // Listings only carry summaries, so content is searched on the server's full-text index
+        try {
+            const response = await fetch(`${this.apiBase}/posts?per_page=50&search=${encodeURIComponent(term)}`);
+            if (!response.ok) throw new Error('Search failed');
+            const data = await response.json();
+            // A newer search may have been started while this one was in flight
+            if (term === this.searchTerm) {
+                this.renderPosts(data.posts);
+            }
+        } catch (error) {
+            console.error('Error searching posts:', error);
+        }
     }
 
     showCreateModal() {
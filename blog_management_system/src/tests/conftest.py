@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Tests import the app's modules the way main.py does, from src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main reads its settings from the environment on import; keep everything it writes in a scratch directory
+_scratch = tempfile.mkdtemp(prefix='blog-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_scratch, 'blog.db')}"
+os.environ['PRERENDER_DIR'] = os.path.join(_scratch, 'blog')
+os.environ['FEEDS_DIR'] = os.path.join(_scratch, 'feeds')
+os.environ['RESPONSE_CACHE_BACKEND'] = 'null'
+os.environ['JOB_WORKER_THREADS'] = '0'
+
+
+@pytest.fixture
+def blog_app():
+    from main import app
+    return app
+
+
+@pytest.fixture
+def client(blog_app):
+    return blog_app.test_client()
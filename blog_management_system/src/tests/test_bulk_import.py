@@ -0,0 +1,21 @@
+import json
+from uuid import uuid4
+
+
+def test_bulk_import_gives_every_post_a_unique_slug(client):
+    title = f'Imported {uuid4().hex[:8]}'
+    existing = client.post('/api/posts', json={'title': title, 'content': 'Body'}).get_json()['slug']
+    taken = client.post('/api/posts', json={'title': f'{title} 2', 'content': 'Body'}).get_json()['slug']
+
+    # Same title as the existing post and as each other, one claiming the suffix the others would get,
+    # spread over chunks of two so collisions are resolved against earlier chunks too
+    lines = [{'title': title}, {'title': title}, {'title': 'x', 'slug': f'{existing}-3'}, {'title': title}, {'title': title}]
+    body = '\n'.join(json.dumps(dict(line, content='Body')) for line in lines)
+    response = client.post('/api/posts/bulk?chunk_size=2', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['created'] * len(lines)
+
+    slugs = [result['slug'] for result in results]
+    assert len(set(slugs)) == len(slugs)
+    assert not set(slugs) & {existing, taken}
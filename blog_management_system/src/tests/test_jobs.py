@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from models import db
+from models.jobs import Job, JobQueue
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "jobs.db"}'
+    app.config['JOB_WORKER_THREADS'] = 0
+    app.config['JOB_BACKOFF_SECONDS'] = 5
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[Job.__table__])
+        yield app
+        db.engine.dispose()
+
+
+@pytest.fixture
+def queue(app):
+    queue = JobQueue(app)
+    calls = []
+
+    @queue.task('ok')
+    def ok(**payload):
+        calls.append(payload)
+
+    @queue.task('broken', max_attempts=2)
+    def broken(**payload):
+        raise RuntimeError('broken')
+
+    queue.calls = calls
+    return queue
+
+
+def enqueue(queue, name, **kwargs):
+    with db.engine.begin() as connection:
+        return queue.enqueue(connection, name, **kwargs)
+
+
+def job(job_id):
+    with db.engine.connect() as connection:
+        return connection.execute(db.select(Job.__table__).where(Job.__table__.c.id == job_id)).first()
+
+
+def make_due(job_id, column='run_at'):
+    with db.engine.begin() as connection:
+        connection.execute(
+            Job.__table__.update().where(Job.__table__.c.id == job_id)
+            .values({column: datetime.utcnow() - timedelta(seconds=1)})
+        )
+
+
+def test_runs_a_job_once(queue):
+    job_id = enqueue(queue, 'ok', payload={'post_id': 1})
+    assert queue.run_next()
+    assert not queue.run_next()
+    assert queue.calls == [{'post_id': 1}]
+    assert job(job_id).status == 'done'
+    assert job(job_id).attempts == 1
+
+
+def test_delayed_job_waits_for_its_time(queue):
+    job_id = enqueue(queue, 'ok', delay=60)
+    assert not queue.run_next()
+    make_due(job_id)
+    assert queue.run_next()
+
+
+def test_key_is_deduplicated_while_queued(queue):
+    first = enqueue(queue, 'ok', key='related:1')
+    assert enqueue(queue, 'ok', key='related:1') is None
+    assert enqueue(queue, 'ok', key='related:2') is not None
+
+    with db.engine.begin() as connection:
+        assert queue.claim(connection).id == first
+    # Once running, a new job can queue behind it, but only one
+    second = enqueue(queue, 'ok', key='related:1')
+    assert second not in (None, first)
+    assert enqueue(queue, 'ok', key='related:1') is None
+
+
+def test_failed_job_is_retried_with_backoff_until_exhausted(queue):
+    job_id = enqueue(queue, 'broken')
+    before = datetime.utcnow()
+    assert queue.run_next()
+    retry = job(job_id)
+    assert retry.status == 'queued'
+    assert retry.attempts == 1
+    assert 'RuntimeError: broken' in retry.last_error
+    # Jittered between half and all of the base backoff
+    assert before + timedelta(seconds=2.5) <= retry.run_at <= datetime.utcnow() + timedelta(seconds=5)
+    assert not queue.run_next()
+
+    make_due(job_id)
+    assert queue.run_next()
+    failed = job(job_id)
+    assert failed.status == 'failed'
+    assert failed.attempts == 2
+    assert failed.finished_at is not None
+    make_due(job_id)
+    assert not queue.run_next()
+
+
+def test_retry_is_dropped_when_a_newer_job_with_the_key_is_queued(queue):
+    job_id = enqueue(queue, 'broken', key='feeds')
+    with db.engine.begin() as connection:
+        claimed = queue.claim(connection)
+    newer = enqueue(queue, 'broken', key='feeds')
+    queue._failed(claimed, 'error')
+    assert job(job_id) is None
+    assert job(newer).status == 'queued'
+
+
+def test_expired_lease_is_claimed_again(queue):
+    job_id = enqueue(queue, 'ok')
+    with db.engine.begin() as connection:
+        stale = queue.claim(connection)
+    assert stale.attempts == 1
+    with db.engine.begin() as connection:
+        assert queue.claim(connection) is None
+        # The worker died; once its lease runs out the job is claimed again
+        taken_over = queue.claim(connection, now=stale.locked_until + timedelta(seconds=1))
+    assert taken_over.id == job_id
+    assert taken_over.attempts == 2
+
+    # The first worker finishing late must not touch the job it lost
+    queue._finished(stale)
+    assert job(job_id).status == 'running'
+    queue._finished(taken_over)
+    assert job(job_id).status == 'done'
+
+
+def test_expired_lease_is_picked_up_by_run_next(queue):
+    job_id = enqueue(queue, 'ok')
+    with db.engine.begin() as connection:
+        queue.claim(connection)
+    assert not queue.run_next()
+    make_due(job_id, 'locked_until')
+    assert queue.run_next()
+    assert job(job_id).status == 'done'
+    assert job(job_id).attempts == 2
+
+
+def test_idle_polling_does_not_write(queue):
+    enqueue(queue, 'ok', delay=60)
+    statements = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    try:
+        assert not queue.run_next()
+        assert 0 < queue._idle_wait(queue.max_poll_interval) <= queue.max_poll_interval
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert statements
+    assert all(statement.lstrip().upper().startswith('SELECT') for statement in statements)
+
+
+def test_idle_wait_stops_at_the_next_due_job(queue):
+    assert queue._idle_wait(8.0) == 8.0
+    enqueue(queue, 'ok', delay=3)
+    assert 2.0 < queue._idle_wait(8.0) <= 3.0
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from itertools import count
+from uuid import uuid4
+
+from models import db
+from models.blog_post import BlogPost
+
+_numbers = count()
+
+
+def create_posts(how_many, tag, published_at=None, created_at=None):
+    posts = [
+        BlogPost(
+            title=f'{tag} post {next(_numbers)}', content='Body', status='published' if published_at else 'draft',
+            tags=f'["{tag}"]', published_at=published_at, created_at=created_at
+        )
+        for _ in range(how_many)
+    ]
+    db.session.add_all(posts)
+    db.session.commit()
+    return [post.id for post in posts]
+
+
+def walk(client, tag, per_page):
+    ids, cursor, pages = [], '', 0
+    while cursor is not None:
+        response = client.get(f'/api/posts?tag={tag}&per_page={per_page}&cursor={cursor}')
+        assert response.status_code == 200
+        data = response.get_json()
+        ids.extend(post['id'] for post in data['posts'])
+        cursor = data['next_cursor']
+        pages += 1
+        assert pages <= 100
+    return ids
+
+
+def test_cursor_pages_have_no_duplicates_or_gaps_when_timestamps_tie(blog_app, client):
+    tag = f'tie-{uuid4().hex[:8]}'
+    moment = datetime(2024, 5, 1, 12, 0, 0)
+    with blog_app.app_context():
+        # Published posts sharing published_at and created_at, others sharing only published_at,
+        # and drafts (no published_at) sharing created_at, which list last
+        same = create_posts(7, tag, moment, moment)
+        staggered = create_posts(4, tag, moment, moment - timedelta(hours=1))
+        drafts = create_posts(5, tag, None, moment)
+
+    for per_page in (1, 3, 4, 50):
+        ids = walk(client, tag, per_page)
+        assert len(ids) == len(set(ids))
+        # Ties fall back to the id, newest first, within each block
+        assert ids == sorted(same, reverse=True) + sorted(staggered, reverse=True) + sorted(drafts, reverse=True)
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get('/api/posts?cursor=not-a-cursor').status_code == 400
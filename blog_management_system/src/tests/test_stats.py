@@ -0,0 +1,78 @@
+from uuid import uuid4
+
+from models import db
+from models.blog_stats import VERSION_ROW, BlogStat, compute_stats, posts_version
+
+
+def stored_stats():
+    rows = BlogStat.query.filter(BlogStat.dimension != VERSION_ROW[0], BlogStat.value != 0)
+    return {(row.dimension, row.key): row.value for row in rows}
+
+
+def recounted_stats():
+    return {row: value for row, value in compute_stats(db.session.connection()).items() if value}
+
+
+def assert_stats_match_recount(blog_app, client):
+    with blog_app.app_context():
+        stored, actual = stored_stats(), recounted_stats()
+    assert stored == actual
+    assert client.get('/api/stats').get_json() == {
+        'total_posts': actual.get(('total', 'posts'), 0),
+        'published_posts': actual.get(('status', 'published'), 0),
+        'draft_posts': actual.get(('status', 'draft'), 0),
+        'total_views': actual.get(('total', 'views'), 0)
+    }
+    return stored
+
+
+def test_stats_match_a_full_recount_after_create_update_and_delete(blog_app, client):
+    first, second = f'stats-{uuid4().hex[:8]}', f'stats-{uuid4().hex[:8]}'
+    assert_stats_match_recount(blog_app, client)
+
+    ids = []
+    for n, status in enumerate(('published', 'draft', 'published')):
+        response = client.post('/api/posts', json={
+            'title': f'{first} post {n}', 'content': 'Body', 'category': first, 'status': status
+        })
+        assert response.status_code == 201
+        ids.append(response.get_json()['id'])
+    stats = assert_stats_match_recount(blog_app, client)
+    assert stats[('category', first)] == 3
+
+    # Moving a post to another category and status moves its counts with it
+    response = client.put(f'/api/posts/{ids[0]}', json={'category': second, 'status': 'draft'})
+    assert response.status_code == 200
+    stats = assert_stats_match_recount(blog_app, client)
+    assert stats[('category', first)] == 2
+    assert stats[('category', second)] == 1
+
+    # An edit that leaves category and status alone changes no counts
+    assert client.put(f'/api/posts/{ids[1]}', json={'content': 'Edited'}).status_code == 200
+    assert assert_stats_match_recount(blog_app, client) == stats
+
+    # Publishing a draft moves it between the status counts
+    assert client.put(f'/api/posts/{ids[1]}', json={'status': 'published'}).status_code == 200
+    assert_stats_match_recount(blog_app, client)
+
+    for post_id in ids:
+        assert client.delete(f'/api/posts/{post_id}').status_code == 204
+    stats = assert_stats_match_recount(blog_app, client)
+    assert ('category', first) not in stats
+    assert ('category', second) not in stats
+
+
+def test_every_write_bumps_the_posts_version(blog_app, client):
+    def version():
+        with blog_app.app_context():
+            return posts_version(db.session.connection())
+
+    before = version()
+    post_id = client.post('/api/posts', json={'title': f'version-{uuid4().hex[:8]}', 'content': 'Body'}).get_json()['id']
+    created = version()
+    assert created > before
+    client.put(f'/api/posts/{post_id}', json={'content': 'Edited'})
+    updated = version()
+    assert updated > created
+    client.delete(f'/api/posts/{post_id}')
+    assert version() > updated
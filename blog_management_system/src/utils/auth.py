@@ -0,0 +1,108 @@
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import g, jsonify, request
+import jwt
+
+
+class Auth:
+    """JWT issuing and verification with caches for the hot profile path.
+
+    Verified claims are kept in a bounded LRU keyed by the raw token, so a
+    repeat request skips signature checking; entries are never served past
+    their `exp`. User rows are cached as serialized dicts for
+    AUTH_USER_CACHE_TTL seconds and must be invalidated when a user changes.
+    """
+
+    algorithm = 'HS256'
+
+    def __init__(self, app=None):
+        self.secret_key = 'your-secret-key'
+        self.token_lifetime = timedelta(days=1)
+        self.token_cache_size = 1024
+        self.user_cache_ttl = 30
+        self._claims = OrderedDict()  # token -> claims
+        self._users = {}  # user id -> (expires_at, user dict)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Should be stored in environment variable
+        app.config.setdefault('JWT_SECRET_KEY', os.environ.get('JWT_SECRET_KEY', 'your-secret-key'))
+        app.config.setdefault('AUTH_TOKEN_CACHE_SIZE', int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 1024)))
+        app.config.setdefault('AUTH_USER_CACHE_TTL', float(os.environ.get('AUTH_USER_CACHE_TTL', 30)))
+        self.secret_key = app.config['JWT_SECRET_KEY']
+        self.token_cache_size = app.config['AUTH_TOKEN_CACHE_SIZE']
+        self.user_cache_ttl = app.config['AUTH_USER_CACHE_TTL']
+        app.extensions['auth'] = self
+
+    def issue_token(self, user_id):
+        return jwt.encode(
+            {'user_id': user_id, 'exp': datetime.utcnow() + self.token_lifetime},
+            self.secret_key,
+            algorithm=self.algorithm
+        )
+
+    def verify_token(self, token):
+        """Return the token's claims; raises jwt.InvalidTokenError (or a subclass)"""
+        with self._lock:
+            claims = self._claims.get(token)
+            if claims is not None:
+                if claims['exp'] > time.time():
+                    self._claims.move_to_end(token)
+                    return claims
+                del self._claims[token]
+
+        # Expired tokens fall through to jwt.decode, which raises ExpiredSignatureError
+        claims = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        if 'exp' in claims:
+            with self._lock:
+                self._claims[token] = claims
+                while len(self._claims) > self.token_cache_size:
+                    self._claims.popitem(last=False)
+        return claims
+
+    def get_user(self, user_id, load):
+        """Cached serialized user; `load` fetches the row and returns None if it is gone"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._users.get(user_id)
+            if item is not None and item[0] > now:
+                return item[1]
+        user = load(user_id)
+        if user is None:
+            return None
+        data = user.to_dict()
+        with self._lock:
+            self._users[user_id] = (now + self.user_cache_ttl, data)
+        return data
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def token_required(self, view):
+        """Reject requests without a valid token; the claims are available as g.token_claims"""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            token = request.headers.get('Authorization')
+            if not token:
+                return jsonify({'error': 'Token is missing'}), 401
+            if token.startswith('Bearer '):
+                token = token[len('Bearer '):]
+
+            try:
+                g.token_claims = self.verify_token(token)
+            except jwt.ExpiredSignatureError:
+                return jsonify({'error': 'Token has expired'}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({'error': 'Invalid token'}), 401
+            return view(*args, **kwargs)
+        return wrapper
+
+
+auth = Auth()
@@ -0,0 +1,296 @@
+import os
+import shutil
+import threading
+from datetime import timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+from flask import Response, abort, request, send_file
+from models import db
+from models.blog_post import BlogPost
+from models.jobs import job_queue
+from utils.http_cache import add_validators, is_not_modified, make_etag, not_modified_response
+
+# The sitemap protocol allows at most 50,000 URLs per file
+MAX_SITEMAP_URLS = 50000
+
+SITEMAP_NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+MIMETYPES = {'sitemap': 'application/xml', 'feed': 'application/rss+xml'}
+
+# Stands in for the origin in files generated without SITE_URL; replaced with the
+# request's origin as they are sent, so the Host header never selects what is cached
+ORIGIN_PLACEHOLDER = 'http://site-origin.invalid'
+
+# Superseded versions are removed this long after a new one is written, once
+# requests that resolved the old version have been sent
+PRUNE_DELAY = 60
+
+# What the feed items show
+FEED_FIELDS = ('id', 'slug', 'title', 'excerpt', 'category', 'published_at', 'created_at', 'updated_at')
+
+
+def w3c_datetime(value):
+    """Sitemap lastmod format; timestamps are naive UTC"""
+    return value.replace(microsecond=0).isoformat() + '+00:00'
+
+
+def rfc822_datetime(value):
+    """RSS date format"""
+    return format_datetime(value.replace(tzinfo=timezone.utc))
+
+
+def _with_origin(path, origin):
+    """Lines of a generated file with the placeholder origin replaced"""
+    origin = escape(origin, {'"': '&quot;'})
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            yield line.replace(ORIGIN_PLACEHOLDER, origin)
+
+
+class _AtomicFile:
+    """Text file written next to its target and renamed into place on close"""
+
+    def __init__(self, path):
+        self.path = path
+        self.temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        self.file = open(self.temporary, 'w', encoding='utf-8')
+
+    def write(self, text):
+        self.file.write(text)
+
+    def close(self):
+        self.file.close()
+        os.replace(self.temporary, self.path)
+
+    def discard(self):
+        self.file.close()
+        os.remove(self.temporary)
+
+
+def write_urlsets(directory, entries, max_urls):
+    """Write (loc, lastmod) entries to sitemap-1.xml, sitemap-2.xml, ... of at most max_urls each.
+
+    Returns [(file name, latest lastmod)] per file written.
+    """
+    shards = []
+    current = None
+    count = 0
+    latest = None
+    try:
+        for loc, lastmod in entries:
+            if current is None or count >= max_urls:
+                if current is not None:
+                    current.write('</urlset>\n')
+                    current.close()
+                    shards.append((os.path.basename(current.path), latest))
+                current = _AtomicFile(os.path.join(directory, f'sitemap-{len(shards) + 1}.xml'))
+                current.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NAMESPACE}">\n')
+                count = 0
+                latest = None
+            current.write(f'<url><loc>{escape(loc)}</loc>')
+            if lastmod:
+                current.write(f'<lastmod>{w3c_datetime(lastmod)}</lastmod>')
+                latest = lastmod if latest is None else max(latest, lastmod)
+            current.write('</url>\n')
+            count += 1
+        if current is not None:
+            current.write('</urlset>\n')
+            current.close()
+            shards.append((os.path.basename(current.path), latest))
+    except BaseException:
+        if current is not None and not current.file.closed:
+            current.discard()
+        raise
+    return shards
+
+
+def write_sitemap_index(path, base_url, shards):
+    index = _AtomicFile(path)
+    index.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n')
+    for name, lastmod in shards:
+        index.write(f'<sitemap><loc>{escape(base_url + "/" + name)}</loc>')
+        if lastmod:
+            index.write(f'<lastmod>{w3c_datetime(lastmod)}</lastmod>')
+        index.write('</sitemap>\n')
+    index.write('</sitemapindex>\n')
+    index.close()
+
+
+class SiteFeeds:
+    """/sitemap.xml and /feed.xml, generated from published posts and cached on disk.
+
+    Files live in a directory named after a version of the published set
+    (its row count and latest updated_at), so any publish, unpublish, edit
+    or delete of a published post makes the next request regenerate them,
+    and nothing else does. Conditional requests are answered from that one
+    aggregate query. Sitemaps over SITEMAP_MAX_URLS URLs are split into
+    sitemap-N.xml files listed by a sitemap index. Superseded versions are
+    removed by a background job, never by a request.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.output_dir = None
+        self.base_url = None
+        self.post_path = '/blog/{id}'
+        self.pages = ('/', '/blog')
+        self.max_urls = MAX_SITEMAP_URLS
+        self.feed_size = 50
+        self.feed_title = 'Blog'
+        self.feed_description = 'Latest posts'
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FEEDS_DIR', os.environ.get('FEEDS_DIR', os.path.join(app.instance_path, 'feeds')))
+        # Absolute URLs need the public origin; the request's host is used when unset
+        app.config.setdefault('SITE_URL', os.environ.get('SITE_URL'))
+        app.config.setdefault('SITE_POST_PATH', '/blog/{id}')
+        app.config.setdefault('SITEMAP_PAGES', ('/', '/blog'))
+        app.config.setdefault('SITEMAP_MAX_URLS', int(os.environ.get('SITEMAP_MAX_URLS', MAX_SITEMAP_URLS)))
+        app.config.setdefault('FEED_SIZE', int(os.environ.get('FEED_SIZE', 50)))
+        app.config.setdefault('FEED_TITLE', os.environ.get('FEED_TITLE', 'Blog'))
+        app.config.setdefault('FEED_DESCRIPTION', os.environ.get('FEED_DESCRIPTION', 'Latest posts'))
+        self.app = app
+        self.output_dir = app.config['FEEDS_DIR']
+        self.base_url = app.config['SITE_URL']
+        self.post_path = app.config['SITE_POST_PATH']
+        self.pages = tuple(app.config['SITEMAP_PAGES'])
+        self.max_urls = min(app.config['SITEMAP_MAX_URLS'], MAX_SITEMAP_URLS)
+        self.feed_size = app.config['FEED_SIZE']
+        self.feed_title = app.config['FEED_TITLE']
+        self.feed_description = app.config['FEED_DESCRIPTION']
+        app.extensions['site_feeds'] = self
+
+    def published(self):
+        return BlogPost.query.filter(BlogPost.status == 'published')
+
+    def site_url(self):
+        return (self.base_url or request.url_root).rstrip('/')
+
+    def file_base_url(self):
+        """Origin written into the files: SITE_URL, or a placeholder filled in per request"""
+        return (self.base_url or ORIGIN_PLACEHOLDER).rstrip('/')
+
+    def post_url(self, base_url, post_id, slug):
+        return base_url + self.post_path.format(id=post_id, slug=slug)
+
+    def version(self):
+        """(version, last modified) of the published set as rendered with the current settings"""
+        count, last_modified = BlogPost.fingerprint(self.published())
+        settings = (self.file_base_url(), self.post_path, self.pages, self.max_urls, self.feed_size, self.feed_title)
+        return make_etag(count, last_modified, *settings), last_modified
+
+    def sitemap_response(self, shard=None):
+        name = 'sitemap.xml' if shard is None else f'sitemap-{shard}.xml'
+        return self._response('sitemap', name)
+
+    def feed_response(self):
+        return self._response('feed', 'feed.xml')
+
+    def _response(self, kind, name):
+        origin = self.site_url()
+        version, last_modified = self.version()
+        etag = make_etag(version, name, origin)
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        path = os.path.join(self._generate(kind, version, last_modified), name)
+        if not os.path.exists(path):
+            abort(404)
+        if self.base_url:
+            response = send_file(path, mimetype=MIMETYPES[kind], conditional=False, etag=False, max_age=None)
+        else:
+            response = Response(_with_origin(path, origin), mimetype=MIMETYPES[kind])
+        return add_validators(response, etag, last_modified)
+
+    def _generate(self, kind, version, last_modified):
+        """Directory holding this version's files, writing them if they are missing"""
+        directory = os.path.join(self.output_dir, version)
+        # sitemap.xml and feed.xml are written last, so their presence means the set is complete
+        marker = os.path.join(directory, 'feed.xml' if kind == 'feed' else 'sitemap.xml')
+        if os.path.exists(marker):
+            return directory
+        with self._lock:
+            if os.path.exists(marker):
+                return directory
+            os.makedirs(directory, exist_ok=True)
+            if kind == 'feed':
+                self.write_feed(directory, self.file_base_url(), last_modified)
+            else:
+                self.write_sitemap(directory, self.file_base_url(), last_modified)
+        with db.engine.begin() as connection:
+            job_queue.enqueue(connection, 'feeds.prune', key='feeds.prune', delay=PRUNE_DELAY)
+        return directory
+
+    def write_sitemap(self, directory, base_url, last_modified):
+        """Stream every published post into one sitemap, or shards and an index"""
+        posts = BlogPost.__table__
+        rows = db.session.execute(
+            db.select(posts.c.id, posts.c.slug, posts.c.updated_at)
+            .where(posts.c.status == 'published')
+            .order_by(posts.c.id)
+            # Fetched in batches off one cursor, so memory stays flat however many posts there are
+            .execution_options(yield_per=1000)
+        )
+
+        def entries():
+            for path in self.pages:
+                yield base_url + path, last_modified
+            for post_id, slug, updated_at in rows:
+                yield self.post_url(base_url, post_id, slug), updated_at
+
+        shards = write_urlsets(directory, entries(), self.max_urls)
+        if len(shards) == 1:
+            os.replace(os.path.join(directory, shards[0][0]), os.path.join(directory, 'sitemap.xml'))
+        else:
+            write_sitemap_index(os.path.join(directory, 'sitemap.xml'), base_url, shards)
+
+    def write_feed(self, directory, base_url, last_modified):
+        """RSS 2.0 feed of the latest published posts"""
+        posts = self.published().options(BlogPost.load_fields(FEED_FIELDS)) \
+            .order_by(*BlogPost.listing_order()).limit(self.feed_size)
+        feed = _AtomicFile(os.path.join(directory, 'feed.xml'))
+        try:
+            feed.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            feed.write('<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">\n<channel>\n')
+            feed.write(f'<title>{escape(self.feed_title)}</title>\n')
+            feed.write(f'<link>{escape(base_url + "/")}</link>\n')
+            feed.write(f'<description>{escape(self.feed_description)}</description>\n')
+            feed.write(f'<atom:link href={quoteattr(base_url + "/feed.xml")} rel="self" type="application/rss+xml"/>\n')
+            if last_modified:
+                feed.write(f'<lastBuildDate>{rfc822_datetime(last_modified)}</lastBuildDate>\n')
+            for post in posts:
+                link = escape(self.post_url(base_url, post.id, post.slug))
+                published_at = post.published_at or post.created_at
+                feed.write('<item>')
+                feed.write(f'<title>{escape(post.title)}</title><link>{link}</link>')
+                feed.write(f'<guid isPermaLink="true">{link}</guid>')
+                if published_at:
+                    feed.write(f'<pubDate>{rfc822_datetime(published_at)}</pubDate>')
+                if post.category:
+                    feed.write(f'<category>{escape(post.category)}</category>')
+                if post.summary:
+                    feed.write(f'<description>{escape(post.summary)}</description>')
+                feed.write('</item>\n')
+            feed.write('</channel>\n</rss>\n')
+        except BaseException:
+            feed.discard()
+            raise
+        feed.close()
+
+    def prune(self):
+        """Remove every version but the current one; returns directories removed"""
+        if not os.path.isdir(self.output_dir):
+            return 0
+        current, _ = self.version()
+        removed = 0
+        for name in os.listdir(self.output_dir):
+            if name != current:
+                shutil.rmtree(os.path.join(self.output_dir, name), ignore_errors=True)
+                removed += 1
+        return removed
+
+
+site_feeds = SiteFeeds()
@@ -0,0 +1,68 @@
+import os
+import threading
+from collections import OrderedDict
+from utils.json_provider import RawJSONArray
+
+
+class FragmentCache:
+    """LRU of per-post JSON fragments, so listings are assembled from cached text.
+
+    A fragment is the encoded to_dict() of one post for one set of fields,
+    keyed by (id, updated_at, fields). Every edit bumps updated_at, so
+    entries never need invalidating; stale ones just age out. `views` is
+    written without touching updated_at, so listings that include it also
+    key on its value. Posts with per-request extras (search snippets) are
+    not cached.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_entries = 4096
+        self.hits = 0
+        self.misses = 0
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE_MAX_ENTRIES', int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 4096)))
+        self.app = app
+        self.max_entries = app.config['FRAGMENT_CACHE_MAX_ENTRIES']
+        app.extensions['fragment_cache'] = self
+
+    @staticmethod
+    def key(post, fields):
+        return (post.id, post.updated_at, fields, post.views if 'views' in fields else None)
+
+    def fragment(self, post, fields=None):
+        """Encoded post.to_dict(fields), from the cache when possible"""
+        fields = tuple(fields or post.FIELDS)
+        key = self.key(post, fields)
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+
+        # Always compact; fragments are spliced into responses as they are
+        fragment = self.app.json.dumps(post.to_dict(fields), separators=(',', ':'))
+        if self.max_entries > 0:
+            with self._lock:
+                self._fragments[key] = fragment
+                while len(self._fragments) > self.max_entries:
+                    self._fragments.popitem(last=False)
+        return fragment
+
+    def posts(self, posts, fields=None):
+        """Posts as a RawJSONArray to put in a response in place of a list of dicts"""
+        return RawJSONArray(self.fragment(post, fields) for post in posts)
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+
+fragment_cache = FragmentCache()
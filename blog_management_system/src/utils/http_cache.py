@@ -0,0 +1,42 @@
+import hashlib
+from datetime import timezone
+from flask import current_app, request
+
+
+def make_etag(*parts):
+    """Build a strong ETag value from the given version parts"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def is_not_modified(etag, last_modified=None):
+    """Check the request's validators against the current representation.
+
+    If-None-Match wins over If-Modified-Since when both are sent, per RFC 9110.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        # HTTP dates have second precision; our timestamps are naive UTC
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def not_modified_response(etag, last_modified=None):
+    """Empty 304 carrying the same validators the full response would have"""
+    response = current_app.response_class(status=304)
+    return add_validators(response, etag, last_modified)
+
+
+def request_fingerprint():
+    """Normalized query arguments, so equivalent list requests share an ETag"""
+    return sorted(request.args.items(multi=True))
+
+
+def add_validators(response, etag, last_modified=None):
+    """Attach ETag/Last-Modified and require revalidation before reuse"""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,74 @@
+import json
+import os
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+# Stands in for a RawJSONArray while the rest of the document is encoded
+_PLACEHOLDER = '\x00raw-json:{}\x00'
+
+
+class RawJSONArray:
+    """Already-encoded JSON values that FastJSONProvider writes out as an array, as-is"""
+
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = list(items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when it is installed.
+
+    Output matches the default provider (sorted keys, compact outside debug
+    mode, dates as HTTP dates) except that non-ASCII text is written as
+    UTF-8 rather than escaped. Indented output and custom encoder classes
+    go through the stdlib encoder. JSON_BACKEND selects 'auto' (the
+    default), 'orjson' or 'stdlib'. RawJSONArray values anywhere in the
+    document are spliced in without being decoded or re-encoded.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        app.config.setdefault('JSON_BACKEND', os.environ.get('JSON_BACKEND', 'auto'))
+        backend = app.config['JSON_BACKEND']
+        if backend not in ('auto', 'orjson', 'stdlib'):
+            raise ValueError(f'Unknown JSON_BACKEND: {backend}')
+        if backend == 'orjson' and orjson is None:
+            raise ValueError("JSON_BACKEND is 'orjson' but orjson is not installed")
+        self.backend = 'orjson' if orjson is not None and backend != 'stdlib' else 'stdlib'
+
+    def dumps(self, obj, **kwargs):
+        raw = []
+        fallback = kwargs.pop('default', self.default)
+
+        def default(value):
+            if isinstance(value, RawJSONArray):
+                raw.append(value)
+                return _PLACEHOLDER.format(len(raw) - 1)
+            return fallback(value)
+
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        if self.backend == 'orjson' and kwargs.get('indent') is None and 'cls' not in kwargs:
+            option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            text = orjson.dumps(obj, default=default, option=option).decode()
+        else:
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            text = json.dumps(obj, default=default, sort_keys=sort_keys, **kwargs)
+
+        for index, array in enumerate(raw):
+            text = text.replace(json.dumps(_PLACEHOLDER.format(index)), '[' + ','.join(array.items) + ']', 1)
+        return text
+
+    def loads(self, s, **kwargs):
+        if self.backend == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
@@ -0,0 +1,67 @@
+import os
+import threading
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when too many password operations are already running or waiting"""
+
+
+class PasswordHasher:
+    """Password hashing with backpressure.
+
+    Hashes run on the calling request thread, which waits for them either
+    way; what this bounds is how many run at once. At most
+    PASSWORD_HASH_WORKERS hashes run concurrently (PBKDF2 releases the GIL,
+    so they use that many cores) and PASSWORD_HASH_QUEUE more callers may
+    wait for a turn. Beyond that callers wait up to
+    PASSWORD_HASH_QUEUE_TIMEOUT seconds to be admitted and then get
+    HasherBusy (a 503), so a login burst is shed instead of saturating the
+    CPU for every other request. The PBKDF2 cost is set by
+    PASSWORD_HASH_ITERATIONS; hashes made with another cost are upgraded on
+    the next successful login (see needs_rehash).
+    """
+
+    def __init__(self, app=None):
+        self.method = 'pbkdf2:sha256:600000'
+        self.workers = 4
+        self.queue_timeout = 5.0
+        self._admitted = threading.BoundedSemaphore(4 + 32)
+        self._running = threading.BoundedSemaphore(4)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_ITERATIONS', int(os.environ.get('PASSWORD_HASH_ITERATIONS', 600000)))
+        app.config.setdefault('PASSWORD_HASH_WORKERS', int(os.environ.get('PASSWORD_HASH_WORKERS', 4)))
+        app.config.setdefault('PASSWORD_HASH_QUEUE', int(os.environ.get('PASSWORD_HASH_QUEUE', 32)))
+        app.config.setdefault('PASSWORD_HASH_QUEUE_TIMEOUT', float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0)))
+        self.method = f"pbkdf2:sha256:{app.config['PASSWORD_HASH_ITERATIONS']}"
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.queue_timeout = app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        self._admitted = threading.BoundedSemaphore(self.workers + app.config['PASSWORD_HASH_QUEUE'])
+        self._running = threading.BoundedSemaphore(self.workers)
+        app.extensions['password_hasher'] = self
+
+    def _limited(self, fn, *args):
+        """Run fn on this thread once admitted and given one of the running slots"""
+        if not self._admitted.acquire(timeout=self.queue_timeout):
+            raise HasherBusy('Too many password operations in progress, try again shortly')
+        try:
+            with self._running:
+                return fn(*args)
+        finally:
+            self._admitted.release()
+
+    def hash(self, password):
+        return self._limited(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._limited(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Whether a stored hash was made with a different method or cost"""
+        return pwhash.split('$', 1)[0] != self.method
+
+
+password_hasher = PasswordHasher()
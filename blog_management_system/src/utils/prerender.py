@@ -0,0 +1,254 @@
+import functools
+import json
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from models import db
+from models.blog_post import BlogPost
+from models.related import related_for
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'prerender')
+
+# Fields the post page and index cards use
+POST_FIELDS = (
+    'id', 'title', 'content_html', 'excerpt', 'author', 'category', 'featured_image',
+    'meta_description', 'meta_keywords', 'tags', 'published_at', 'created_at'
+)
+CARD_FIELDS = ('id', 'title', 'excerpt', 'author', 'category', 'featured_image', 'published_at', 'created_at')
+RELATED_FIELDS = ('id', 'title', 'category')
+
+
+def format_date(value):
+    return value.strftime('%B %d, %Y').replace(' 0', ' ') if value else ''
+
+
+def page_url(page):
+    return '/blog' if page == 1 else f'/blog/page/{page}'
+
+
+@functools.lru_cache(maxsize=None)
+def _environment():
+    # Built once per process, so pool workers never need the Flask app
+    environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape())
+    environment.filters['format_date'] = format_date
+    environment.globals['page_url'] = page_url
+    return environment
+
+
+def _write(path, html):
+    # Write next to the target and rename, so readers never see a half-written page
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(html)
+    os.replace(temporary, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def post_context(post, fields):
+    """Plain dict of a post for the templates; picklable for pool workers"""
+    data = {field: post.summary if field == 'excerpt' else getattr(post, field) for field in fields}
+    if 'tags' in data:
+        tags = data['tags']
+        if isinstance(tags, str):
+            try:
+                tags = json.loads(tags)
+            except ValueError:
+                tags = []
+        data['tags'] = tags if isinstance(tags, list) else []
+    return data
+
+
+def post_contexts(posts):
+    """Contexts of post pages, each with the related-posts block filled in"""
+    related = related_for(post.id for post in posts)
+    contexts = []
+    for post in posts:
+        context = post_context(post, POST_FIELDS)
+        context['related'] = [post_context(other, RELATED_FIELDS) for other in related.get(post.id, [])]
+        contexts.append(context)
+    return contexts
+
+
+def render_post_pages(output_dir, posts):
+    """Render and write one page per post dict; returns the number written"""
+    template = _environment().get_template('post.html')
+    for post in posts:
+        _write(os.path.join(output_dir, f"{post['id']}.html"), template.render(post=post))
+    return len(posts)
+
+
+def render_index_pages(output_dir, pages):
+    """Render and write (page, page_count, post dicts) index pages; returns the number written"""
+    template = _environment().get_template('index.html')
+    for page, page_count, posts in pages:
+        _write(index_path(output_dir, page), template.render(page=page, pages=page_count, posts=posts))
+    return len(pages)
+
+
+def index_path(output_dir, page):
+    return os.path.join(output_dir, 'index.html' if page == 1 else os.path.join('page', f'{page}.html'))
+
+
+class StaticRenderer:
+    """Pre-renders published posts and the paginated blog index to static HTML.
+
+    Writes only re-render what they affect: the post's own page, and the
+    index pages from the earliest position the post moved from or to, since
+    everything after it shifts. Writes queue prerender jobs (utils.tasks)
+    that call render() in the worker's thread, so write requests do not
+    wait on rendering and a failed render is retried. The page routes serve
+    these files when present and fall back to the client-side pages
+    otherwise.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.output_dir = None
+        self.per_page = 10
+        self._render_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PRERENDER_DIR', os.environ.get('PRERENDER_DIR', os.path.join(app.static_folder, 'blog')))
+        app.config.setdefault('PRERENDER_PER_PAGE', 10)
+        self.app = app
+        self.output_dir = app.config['PRERENDER_DIR']
+        self.per_page = app.config['PRERENDER_PER_PAGE']
+        app.extensions['static_renderer'] = self
+
+    def published(self):
+        return BlogPost.query.filter(BlogPost.status == 'published')
+
+    @staticmethod
+    def listing_key(post):
+        """Where a post sits in the public listing, or None if it is not listed"""
+        if post.status != 'published':
+            return None
+        return (post.published_at, post.created_at, post.id)
+
+    def page_of(self, key):
+        """Index page that holds (or held) the post with this listing key"""
+        ahead = self.published().filter(db.not_(BlogPost.after_cursor(key)), BlogPost.id != key[2]).count()
+        return ahead // self.per_page + 1
+
+    def affected(self, post_id, before=None, after=None):
+        """(post ids, first shifted index page, index pages) a write affects; before/after are listing keys"""
+        pages = {self.page_of(key) for key in (before, after) if key is not None}
+        if before == after:
+            # Same spot in the listing, so only the page showing its card changes
+            return {post_id}, None, pages
+        # Appearing, disappearing or moving shifts every page after that point
+        return {post_id}, min(pages, default=None), set()
+
+    def render(self, post_ids=(), from_page=None, pages=()):
+        """Render posts, index pages from from_page on and the given pages in the calling thread.
+
+        Returns (post pages, index pages) written; errors propagate to the caller.
+        """
+        if not post_ids and from_page is None and not pages:
+            return 0, 0
+        with self._render_lock:
+            with self.app.app_context():
+                return self._render_posts(post_ids), self._render_index(from_page, pages)
+
+    def _render_posts(self, post_ids):
+        posts = self.published().filter(BlogPost.id.in_(post_ids)).options(BlogPost.load_fields(POST_FIELDS)).all()
+        render_post_pages(self.output_dir, post_contexts(posts))
+        # Posts that were deleted or unpublished lose their page
+        for post_id in set(post_ids) - {post.id for post in posts}:
+            _remove(os.path.join(self.output_dir, f'{post_id}.html'))
+        return len(posts)
+
+    def _render_index(self, from_page, pages):
+        total = self.published().count()
+        page_count = max(math.ceil(total / self.per_page), 1)
+        if from_page is not None:
+            pages = set(pages) | set(range(from_page, page_count + 1))
+            # Pages past the new end are stale once the listing shrinks
+            for stale in self._rendered_page_numbers():
+                if stale > page_count:
+                    _remove(index_path(self.output_dir, stale))
+        pages = sorted(page for page in pages if page <= page_count)
+        query = self.published().options(BlogPost.load_fields(CARD_FIELDS)).order_by(*BlogPost.listing_order())
+        rendered = [
+            (page, page_count, [
+                post_context(post, CARD_FIELDS)
+                for post in query.offset((page - 1) * self.per_page).limit(self.per_page)
+            ])
+            for page in pages
+        ]
+        return render_index_pages(self.output_dir, rendered)
+
+    def _rendered_page_numbers(self):
+        directory = os.path.join(self.output_dir, 'page')
+        if not os.path.isdir(directory):
+            return []
+        return [int(name[:-5]) for name in os.listdir(directory) if name.endswith('.html') and name[:-5].isdigit()]
+
+    def rebuild(self, workers=None, chunk_size=200):
+        """Re-render every page with a process pool; returns (post pages, index pages) written"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        listed = set()
+        with self.app.app_context(), ProcessPoolExecutor(max_workers=workers) as pool:
+            post_jobs = []
+            posts = self.published().options(BlogPost.load_fields(POST_FIELDS)) \
+                .order_by(*BlogPost.listing_order()).yield_per(chunk_size)
+            chunk = []
+            cards = []
+
+            def submit(chunk):
+                contexts = post_contexts(chunk)
+                cards.extend({field: context[field] for field in CARD_FIELDS} for context in contexts)
+                post_jobs.append(pool.submit(render_post_pages, self.output_dir, contexts))
+
+            for post in posts:
+                listed.add(str(post.id))
+                chunk.append(post)
+                if len(chunk) >= chunk_size:
+                    submit(chunk)
+                    chunk = []
+            if chunk:
+                submit(chunk)
+
+            page_count = max(math.ceil(len(cards) / self.per_page), 1)
+            pages = [
+                (page, page_count, cards[(page - 1) * self.per_page:page * self.per_page])
+                for page in range(1, page_count + 1)
+            ]
+            index_jobs = [
+                pool.submit(render_index_pages, self.output_dir, pages[start:start + chunk_size])
+                for start in range(0, len(pages), chunk_size)
+            ]
+            post_pages = sum(job.result() for job in post_jobs)
+            index_pages = sum(job.result() for job in index_jobs)
+
+        # Anything else in the output directory belongs to posts that are gone or unpublished
+        for name in os.listdir(self.output_dir):
+            if name.endswith('.html') and name != 'index.html' and name[:-5] not in listed:
+                _remove(os.path.join(self.output_dir, name))
+        for stale in self._rendered_page_numbers():
+            if stale > page_count:
+                _remove(index_path(self.output_dir, stale))
+        return post_pages, index_pages
+
+    def post_file(self, post_id):
+        """Relative path of a post's pre-rendered page under output_dir, if it exists"""
+        name = f'{post_id}.html'
+        return name if os.path.exists(os.path.join(self.output_dir, name)) else None
+
+    def index_file(self, page):
+        path = index_path(self.output_dir, page)
+        return os.path.relpath(path, self.output_dir) if os.path.exists(path) else None
+
+
+static_renderer = StaticRenderer()
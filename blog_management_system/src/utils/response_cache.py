@@ -0,0 +1,293 @@
+import functools
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, request
+from utils.http_cache import request_fingerprint
+
+
+class CacheEntry:
+    """A serialized response plus whatever the view needs to know on a hit"""
+
+    # Per-request headers such as CORS are added again by after_request hooks
+    STORED_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control')
+
+    def __init__(self, status, headers, body, meta=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.meta = meta or {}
+
+    @classmethod
+    def from_response(cls, response, meta=None):
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() in cls.STORED_HEADERS]
+        return cls(response.status_code, headers, response.get_data(), meta)
+
+    def to_response(self):
+        response = current_app.response_class(self.body, status=self.status, headers=self.headers)
+        return response.make_conditional(request)
+
+    def dumps(self):
+        return json.dumps({
+            'status': self.status,
+            'headers': self.headers,
+            'body': self.body.decode('utf-8'),
+            'meta': self.meta
+        })
+
+    @classmethod
+    def loads(cls, data):
+        data = json.loads(data)
+        return cls(data['status'], [tuple(h) for h in data['headers']], data['body'].encode('utf-8'), data['meta'])
+
+
+class MemoryBackend:
+    """Per-process LRU with a TTL; the default for single-worker deployments"""
+
+    def __init__(self, max_entries=1024, **kwargs):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()  # (namespace, key) -> (expires_at, entry)
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        with self._lock:
+            item = self._entries.get((namespace, key))
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                del self._entries[(namespace, key)]
+                return None
+            self._entries.move_to_end((namespace, key))
+            return entry
+
+    def set(self, namespace, key, entry, ttl):
+        with self._lock:
+            self._entries[(namespace, key)] = (time.monotonic() + ttl, entry)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete_namespace(self, namespace):
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Cache shared by every worker on the box through a local SQLite file.
+
+    Evicts the least recently used entries. Hits record their access time
+    at most once per TOUCH_INTERVAL seconds, so a hot entry does not take
+    the write lock on every read.
+    """
+
+    TOUCH_INTERVAL = 10.0
+
+    def __init__(self, path=None, max_entries=1024, **kwargs):
+        self.path = path or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'response_cache.db')
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS response_cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    entry TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )"""
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS ix_response_cache_accessed ON response_cache (accessed_at)'
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, namespace, key):
+        now = time.time()
+        connection = self._connect()
+        row = connection.execute(
+            'SELECT entry, expires_at, accessed_at FROM response_cache WHERE namespace = ? AND key = ?',
+            (namespace, key)
+        ).fetchone()
+        if row is None or row[1] < now:
+            return None
+        if now - row[2] > self.TOUCH_INTERVAL:
+            connection.execute(
+                'UPDATE response_cache SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                (now, namespace, key)
+            )
+        return CacheEntry.loads(row[0])
+
+    def set(self, namespace, key, entry, ttl):
+        now = time.time()
+        connection = self._connect()
+        connection.execute(
+            'INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?)',
+            (namespace, key, entry.dumps(), now + ttl, now)
+        )
+        # Evict expired entries first, then the least recently used ones
+        connection.execute('DELETE FROM response_cache WHERE expires_at < ?', (now,))
+        evicted = connection.execute(
+            """DELETE FROM response_cache WHERE rowid IN (
+                SELECT rowid FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,)
+        ).rowcount
+        self.evictions += max(evicted, 0)
+
+    def delete_namespace(self, namespace):
+        self._connect().execute('DELETE FROM response_cache WHERE namespace = ?', (namespace,))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM response_cache')
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+
+class NullBackend:
+    """Disables caching without touching the views"""
+
+    evictions = 0
+
+    def __init__(self, **kwargs):
+        pass
+
+    def get(self, namespace, key):
+        return None
+
+    def set(self, namespace, key, entry, ttl):
+        pass
+
+    def delete_namespace(self, namespace):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sqlite': SQLiteBackend,
+    'null': NullBackend,
+}
+
+
+def load_backend(name):
+    """Resolve a backend by short name or by a 'package.module:Class' path"""
+    if name in BACKENDS:
+        return BACKENDS[name]
+    module_name, _, class_name = name.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class ResponseCache:
+    """Caches serialized responses of read endpoints, grouped into namespaces.
+
+    Entries are keyed by request path and normalized query arguments. Write
+    paths invalidate whole namespaces, e.g. every listing or one post.
+    The backend is chosen with RESPONSE_CACHE_BACKEND, so multi-worker
+    deployments can switch to a shared store through configuration alone.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.ttl = 60
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', os.environ.get('RESPONSE_CACHE_BACKEND', 'memory'))
+        app.config.setdefault('RESPONSE_CACHE_TTL', int(os.environ.get('RESPONSE_CACHE_TTL', 60)))
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024)))
+        app.config.setdefault('RESPONSE_CACHE_PATH', os.environ.get('RESPONSE_CACHE_PATH'))
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+        self.backend = load_backend(app.config['RESPONSE_CACHE_BACKEND'])(
+            path=app.config['RESPONSE_CACHE_PATH'],
+            max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES']
+        )
+        app.extensions['response_cache'] = self
+
+    @staticmethod
+    def request_key():
+        return json.dumps([request.path, request_fingerprint()])
+
+    def get(self, namespace):
+        """Look up the cached entry for the current request"""
+        entry = self.backend.get(namespace, self.request_key())
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def set(self, namespace, response, meta=None):
+        """Store a successful response for the current request"""
+        if response.status_code == 200 and not response.direct_passthrough:
+            self.backend.set(namespace, self.request_key(), CacheEntry.from_response(response, meta), self.ttl)
+        return response
+
+    def cached(self, namespace):
+        """Decorator serving a view from the cache under the given namespace"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                entry = self.get(namespace)
+                if entry is not None:
+                    return entry.to_response()
+                response = current_app.make_response(view(*args, **kwargs))
+                return self.set(namespace, response)
+            return wrapper
+        return decorator
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.delete_namespace(namespace)
+            self.invalidations += 1
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,112 @@
+from datetime import datetime
+from models import db
+from models.jobs import job_queue
+from models.related import refresh_related
+from models.trending import trending
+from utils.feeds import site_feeds
+from utils.metrics import Gauge
+from utils.prerender import static_renderer
+from utils.response_cache import response_cache
+
+# Follow-up work of post writes, run by job queue workers
+
+
+@job_queue.task('related.update')
+def update_related_posts(post_ids):
+    with db.engine.begin() as connection:
+        rewritten = refresh_related(connection, post_ids)
+        # Post pages show their related posts, so the ones whose lists moved are rendered again
+        enqueue_posts_prerender(connection, rewritten)
+    response_cache.invalidate('related')
+
+
+# Prerender jobs render in the job's own thread, so a failure fails the job and is retried
+
+@job_queue.task('prerender.post_changed')
+def prerender_post(post_id, before=None, after=None):
+    static_renderer.render(*static_renderer.affected(post_id, _decode_listing_key(before), _decode_listing_key(after)))
+
+
+@job_queue.task('prerender.posts')
+def prerender_posts(post_ids):
+    static_renderer.render(post_ids)
+
+
+@job_queue.task('prerender.index')
+def prerender_index():
+    static_renderer.render(from_page=1)
+
+
+@job_queue.task('feeds.prune')
+def prune_feeds():
+    site_feeds.prune()
+
+
+@job_queue.task('trending.refresh')
+def refresh_trending():
+    # The next refresh is queued first, so the schedule outlives a refresh that keeps failing
+    with db.engine.begin() as connection:
+        schedule_trending_refresh(connection, trending.refresh_interval)
+    trending.refresh_if_stale()
+
+
+def schedule_trending_refresh(connection, delay=0):
+    """Queue a refresh of the trending leaderboards, unless one is queued already"""
+    return job_queue.enqueue(connection, 'trending.refresh', key='trending.refresh', delay=delay)
+
+
+def enqueue_prerender(connection, post_id, before=None, after=None):
+    """Queue re-rendering of a post's pages in the write's transaction; before/after are listing keys"""
+    return job_queue.enqueue(connection, 'prerender.post_changed', {
+        'post_id': post_id, 'before': _encode_listing_key(before), 'after': _encode_listing_key(after)
+    })
+
+
+def enqueue_posts_prerender(connection, post_ids):
+    """Queue re-rendering of the given posts' pages, e.g. after their related posts changed"""
+    post_ids = sorted(post_ids)
+    if post_ids:
+        return job_queue.enqueue(connection, 'prerender.posts', {'post_ids': post_ids})
+
+
+def enqueue_listing_prerender(connection, post_ids):
+    """Queue rendering of new posts and the whole index after a bulk import"""
+    enqueue_posts_prerender(connection, post_ids)
+    # Every index page is rendered from the live listing, so one queued run covers any number of imports
+    return job_queue.enqueue(connection, 'prerender.index', key='prerender.index')
+
+
+def _encode_listing_key(key):
+    if key is None:
+        return None
+    published_at, created_at, post_id = key
+    return [published_at and published_at.isoformat(), created_at and created_at.isoformat(), post_id]
+
+
+def _decode_listing_key(key):
+    if key is None:
+        return None
+    published_at, created_at, post_id = key
+    return (
+        published_at and datetime.fromisoformat(published_at),
+        created_at and datetime.fromisoformat(created_at),
+        post_id
+    )
+
+
+def queue_metrics():
+    """Gauges over the jobs table, for /metrics"""
+    stats = job_queue.stats(db.session.connection())
+    depth = Gauge('job_queue_jobs', 'Jobs in the queue by name and status.', ('name', 'status'))
+    for labels, count in stats['depth'].items():
+        depth.set(labels, count)
+    oldest = Gauge('job_queue_oldest_runnable_seconds', 'How long the oldest runnable job has been waiting.', ('name',))
+    for name, seconds in stats['oldest_runnable'].items():
+        oldest.set((name,), seconds)
+    wait = Gauge('job_queue_wait_seconds', 'Time from runnable to started, jobs finished recently.', ('name', 'quantile'))
+    run = Gauge('job_queue_run_seconds', 'Time from started to finished, jobs finished recently.', ('name', 'quantile'))
+    for gauge, quantiles in ((wait, stats['wait']), (run, stats['run'])):
+        for name, values in quantiles.items():
+            for q, seconds in values.items():
+                gauge.set((name, str(q)), seconds)
+    return depth, oldest, wait, run
@@ -1,9 +1,6 @@
+// <static-manifest>
+// Generated from the static manifest; do not edit by hand
 const CACHE_VERSION = '1.1.7';
-const CACHE_NAMES = {
-  static: `static-cache-${CACHE_VERSION}`,
-  dynamic: `dynamic-cache-${CACHE_VERSION}`,
-  offline: `offline-cache-${CACHE_VERSION}`
-};
 
 // Assets to cache with version tracking
 const ASSETS_TO_CACHE = {
@@ -21,6 +18,13 @@ const ASSETS_TO_CACHE = {
     '/assets/images/blog/google-ads-optimization.jpg'
   ]
 };
+// </static-manifest>
+
+const CACHE_NAMES = {
+  static: `static-cache-${CACHE_VERSION}`,
+  dynamic: `dynamic-cache-${CACHE_VERSION}`,
+  offline: `offline-cache-${CACHE_VERSION}`
+};
 
 // Cache assets with improved error handling
 async function cacheAssets(cacheName, assets) {